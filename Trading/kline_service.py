@@ -0,0 +1,66 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+KLINE_CACHE_TTL = 60  # seconds a rendered chart is served from the cache
+FETCH_WORKERS = 4
+
+
+class KlineService:
+    """
+    Serves K-line charts off the event loop.
+
+    OpenD requests run in a thread pool, and mplfinance renders run in a single dedicated thread
+    because pyplot is not thread-safe. Requests for the same (stock_code, ktype, ema_args) share one
+    fetch and render (single-flight), and the result is cached for a short TTL.
+    """
+    def __init__(self, trader, ttl=KLINE_CACHE_TTL, fetch_workers=FETCH_WORKERS):
+        self.trader = trader
+        self.ttl = ttl
+        self.fetch_executor = ThreadPoolExecutor(max_workers=fetch_workers)
+        self.render_executor = ThreadPoolExecutor(max_workers=1)
+        self.cache = {}  # key -> (expires_at, result)
+        self.inflight = {}  # key -> future of the result
+
+    async def get_chart(self, stock_code, ktype='K_DAY', ema_args=()):
+        """
+        Fetch and render the K-line chart of a stock.
+
+        Parameters:
+        - stock_code (str): Stock code, e.g. 'US.AAPL'.
+        - ktype (str): K-line type, e.g. 'K_DAY'.
+        - ema_args (list of int): Spans of the four EMA channel lines.
+
+        Returns:
+        - tuple: (name, ktype, png bytes), or None if no K-line data was returned.
+        """
+        key = (stock_code, ktype, tuple(ema_args))
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        if key not in self.inflight:
+            self.inflight[key] = asyncio.ensure_future(self._produce(key))
+        return await asyncio.shield(self.inflight[key])
+
+    async def _produce(self, key):
+        stock_code, ktype, ema_args = key
+        loop = asyncio.get_running_loop()
+        try:
+            kline_data_with_time, kline_data_without_time, name, ktype = await loop.run_in_executor(
+                self.fetch_executor, lambda: self.trader.get_kline(stock_code=stock_code, ktype=ktype))
+            result = None
+            if kline_data_with_time:
+                buf = await loop.run_in_executor(
+                    self.render_executor, self.trader.plot_kline,
+                    kline_data_with_time, kline_data_without_time, name, ktype, list(ema_args))
+                result = (name, ktype, buf.getvalue())
+            self.cache[key] = (time.monotonic() + self.ttl, result)
+            self._evict_expired()
+            return result
+        finally:
+            self.inflight.pop(key, None)
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self.cache.items() if expires_at <= now]:
+            del self.cache[key]
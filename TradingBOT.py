@@ -75,13 +75,13 @@ class Trader:
             # ret not OK means an error occurred
             print(f"Error requesting kline data: {data}")
             quote_ctx.close()
-            return ([], [])
+            return (None, None, None, ktype)
         
         if data.empty:
             # data is empty => no rows returned
             print("No kline data returned; the DataFrame is empty.")
             quote_ctx.close()
-            return ([], [])
+            return (None, None, None, ktype)
         print(len(data))
         open_ = data['open']
         close_ = data['close']
@@ -192,7 +192,6 @@ class Trader:
         # 8) Save figure into a PNG buffer (if needed)
 
 
-        plt.show()
         buf = io.BytesIO()
         
 
@@ -1,6 +1,7 @@
 import discord
 from datetime import datetime, timedelta
 from TradingBOT import Trader
+from Trading.kline_service import KlineService
 import logging
 import argparse
 import json
@@ -18,6 +19,7 @@ intents.messages = True
 bot = discord.Client(intents=intents)
 
 trader = Trader()
+kline_service = KlineService(trader)
 
 @bot.event
 async def on_ready():
@@ -46,16 +48,14 @@ async def on_message(message):
                 #history_kline_data = trader.show_history_kl_quota()
                 #print(history_kline_data)
 
-                kline_data_with_time, kline_data_without_time, name, ktype = trader.get_kline(stock_code=stock_code)
+                # Fetch and render off the event loop, so the bot keeps handling other messages
+                chart = await kline_service.get_chart(stock_code, ema_args=args.ema_args)
 
-                if kline_data_with_time is not None:
-                    # Format the response
-                    import pandas as pd
+                if chart is not None:
+                    name, ktype, png = chart
 
-                    buf = trader.plot_kline(kline_data_with_time, kline_data_without_time, name, ktype, args.ema_args)  # Suppose we use the function from above
-
-                    # 4) Create a Discord file from the buffer
-                    file = discord.File(buf, filename="kline_chart.png")
+                    # Create a Discord file from the rendered chart
+                    file = discord.File(io.BytesIO(png), filename="kline_chart.png")
                     
                     await message.channel.send(
                         content=f"股票{name} K线图({ktype})",
@@ -0,0 +1,152 @@
+# alert_batcher.py
+
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+import discord
+from telemetry import REGISTRY
+
+# Discord message limits
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_FIELDS_PER_EMBED = 25
+MAX_CHARS_PER_MESSAGE = 6000  # total of titles, descriptions, field names/values and footers
+MAX_CONCURRENT_CHANNELS = 5  # stay well below the global request rate limit
+DELIVERY_LOG_SIZE = 1000
+
+SEND_SECONDS = REGISTRY.histogram('discord_send_seconds', 'Latency of one Discord message send.')
+BATCH_SECONDS = REGISTRY.histogram('discord_batch_seconds', 'Time to deliver all alert messages of a channel.')
+ALERTS_SENT = REGISTRY.counter('discord_alerts_total', 'Alerts queued for delivery.', ('result',))
+
+FOOTER_TEXT = "Automated Alert"
+FOOTER_ICON = "https://i.imgur.com/rdm3D7P.png"
+
+# Embed title and color per signal strength, strongest first
+STRENGTHS = [
+    ('strong', "📈 **Multiple Buy Signals Triggered!**", 0xFF0000),  # Red for multiple signals
+    ('good', "📈 **Good Buying Options!**", 0xFFA500),  # Orange for good buying options
+    ('buy', "📈 **Buy Signal Triggered!**", 0x00FF00),  # Green by default
+]
+
+
+def signal_strength(signal_status):
+    if sum(signal_status.values()) > 3:
+        return 'strong'
+    if signal_status.get('Good_buying_option'):
+        return 'good'
+    return 'buy'
+
+
+def format_signal_field(stock_symbol, signal_status):
+    """
+    Format the signal status of one stock as an embed field (name, value).
+    """
+    value = " · ".join(f"{timeframe} {'✅' if triggered else '❌'}" for timeframe, triggered in signal_status.items())
+    return f"**{stock_symbol}**", value
+
+
+class AlertBatcher:
+    """
+    Collects the alerts of a scan cycle per channel and delivers them in as few messages as Discord's
+    embed limits allow. Channels are sent concurrently; messages of one channel are sent in order,
+    so each channel's rate-limit bucket is respected (discord.py waits on the bucket when exhausted).
+    """
+    def __init__(self, max_concurrent_channels=MAX_CONCURRENT_CHANNELS):
+        self.pending = {}  # channel id -> (channel, [(symbol, signal_status)])
+        self.semaphore = asyncio.Semaphore(max_concurrent_channels)
+        self.delivery_log = deque(maxlen=DELIVERY_LOG_SIZE)
+
+    def add(self, channel, stock_symbol, signal_status):
+        _, alerts = self.pending.setdefault(channel.id, (channel, []))
+        alerts.append((stock_symbol, signal_status))
+
+    @staticmethod
+    def pack(alerts):
+        """
+        Pack alerts into messages.
+
+        Parameters:
+        - alerts (list): (symbol, signal_status) pairs.
+
+        Returns:
+        - list of (list of discord.Embed, list of str): Embeds and stock symbols of each message.
+        """
+        messages, embeds, symbols, message_chars = [], [], [], 0
+        embed, embed_chars = None, 0
+
+        def close_embed():
+            nonlocal embed, embed_chars, message_chars
+            if embed is not None:
+                embeds.append(embed)
+                message_chars += embed_chars
+            embed, embed_chars = None, 0
+
+        for strength, title, color in STRENGTHS:
+            for symbol, status in alerts:
+                if signal_strength(status) != strength:
+                    continue
+                name, value = format_signal_field(symbol, status)
+                field_chars = len(name) + len(value)
+                if embed is not None and (len(embed.fields) >= MAX_FIELDS_PER_EMBED
+                                          or message_chars + embed_chars + field_chars > MAX_CHARS_PER_MESSAGE):
+                    close_embed()
+                if embed is None:
+                    header_chars = len(title) + len(FOOTER_TEXT)
+                    if embeds and (len(embeds) >= MAX_EMBEDS_PER_MESSAGE
+                                   or message_chars + header_chars + field_chars > MAX_CHARS_PER_MESSAGE):
+                        messages.append((embeds, symbols))
+                        embeds, symbols, message_chars = [], [], 0
+                    embed = discord.Embed(title=title, color=color, timestamp=datetime.utcnow())
+                    embed.set_footer(text=FOOTER_TEXT, icon_url=FOOTER_ICON)
+                    embed_chars = header_chars
+                embed.add_field(name=name, value=value, inline=True)
+                embed_chars += field_chars
+                symbols.append(symbol)
+            # one embed per signal strength
+            close_embed()
+        if embeds:
+            messages.append((embeds, symbols))
+        return messages
+
+    async def _deliver(self, channel, alerts):
+        messages = self.pack(alerts)
+        delivered = []
+        start = time.monotonic()
+        async with self.semaphore:
+            for embeds, symbols in messages:
+                try:
+                    with SEND_SECONDS.time():
+                        await channel.send(embeds=embeds)
+                    delivered.extend(symbols)
+                except Exception as e:
+                    print(f"Failed to send message to channel {channel.id}: {e}")
+        latency = time.monotonic() - start
+        BATCH_SECONDS.observe(latency)
+        ALERTS_SENT.inc(len(delivered), result='delivered')
+        ALERTS_SENT.inc(len(alerts) - len(delivered), result='failed')
+        self.delivery_log.append({
+            'channel_id': channel.id,
+            'alerts': len(alerts),
+            'messages': len(messages),
+            'delivered': len(delivered),
+            'latency': latency,
+            'sent_at': datetime.utcnow(),
+        })
+        print(f"Sent {len(delivered)}/{len(alerts)} buy signals to channel {channel.id} "
+              f"in {len(messages)} messages ({latency:.2f}s).")
+        return channel.id, delivered
+
+    async def flush(self):
+        """
+        Deliver every pending alert.
+
+        Returns:
+        - dict: Stock symbol -> list of channel ids the alert was delivered to.
+        """
+        pending, self.pending = self.pending, {}
+        results = await asyncio.gather(*(self._deliver(channel, alerts) for channel, alerts in pending.values()))
+        delivered = {}
+        for channel_id, symbols in results:
+            for symbol in symbols:
+                delivered.setdefault(symbol, []).append(channel_id)
+        return delivered
@@ -0,0 +1,192 @@
+# alert_store.py
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+from datetime import datetime
+
+ALERT_DB_FILE = 'alert_state.db'
+LEGACY_JSON_FILE = 'last_sent_times.json'
+FLUSH_INTERVAL = 1.0  # seconds between two batched writes
+COMPACT_INTERVAL = 3600  # seconds between two WAL checkpoints
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT NOT NULL,
+    sent_at TEXT NOT NULL,
+    signal_status TEXT NOT NULL,
+    channels TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS alerts_symbol_id ON alerts (symbol, id);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class AlertStateStore:
+    """
+    Append-only alert history in SQLite (WAL mode) with an in-memory index of the latest alert per symbol.
+
+    `record` only updates the index and queues the row; rows are written in batches by the `run_writer`
+    task through a worker thread, so the event loop never blocks on disk I/O. The close of the last
+    scanned bar is kept the same way, so a restarted bot knows whether it missed a bar.
+    """
+    def __init__(self, path=ALERT_DB_FILE, legacy_json=LEGACY_JSON_FILE):
+        """
+        Parameters:
+        - path (str): SQLite database file.
+        - legacy_json (str): last_sent_times.json file imported once when the database is empty.
+        """
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.pending = []
+        self.pending_scan = None
+        self.latest = {}
+        self.last_scanned_bar = None
+        self._load_latest()
+        if not self.latest and legacy_json and os.path.exists(legacy_json):
+            self._import_legacy_json(legacy_json)
+
+    def _load_latest(self):
+        rows = self.conn.execute(
+            "SELECT symbol, sent_at, signal_status FROM alerts "
+            "WHERE id IN (SELECT MAX(id) FROM alerts GROUP BY symbol)"
+        )
+        for symbol, sent_at, signal_status in rows:
+            self.latest[symbol] = {
+                "last_sent_time": datetime.fromisoformat(sent_at),
+                "last_signal_status": json.loads(signal_status)
+            }
+        row = self.conn.execute("SELECT value FROM state WHERE key = 'last_scanned_bar'").fetchone()
+        if row is not None:
+            self.last_scanned_bar = pd.Timestamp(row[0])
+
+    def _import_legacy_json(self, legacy_json):
+        with open(legacy_json, 'r') as f:
+            legacy_data = json.load(f)
+        for symbol, v in legacy_data.items():
+            self.record(symbol, datetime.fromisoformat(v["last_sent_time"]), v["last_signal_status"])
+        self._write_batch(self._take_pending())
+        print(f"Imported {len(legacy_data)} alerts from {legacy_json}.")
+
+    def get(self, symbol):
+        """
+        Return the latest alert of a symbol as {"last_sent_time", "last_signal_status"}, or None.
+        """
+        return self.latest.get(symbol)
+
+    def record(self, symbol, sent_at, signal_status, channel_ids=()):
+        """
+        Record a sent alert. The in-memory index is updated immediately, the row is written on the next flush.
+
+        Parameters:
+        - symbol (str): Stock ticker symbol.
+        - sent_at (datetime): Time the alert was sent.
+        - signal_status (dict): Timeframe -> triggered flag.
+        - channel_ids (iterable of int): Channels the alert was delivered to.
+        """
+        self.latest[symbol] = {
+            "last_sent_time": sent_at,
+            "last_signal_status": signal_status
+        }
+        with self.lock:
+            self.pending.append((symbol, sent_at.isoformat(), json.dumps(signal_status), json.dumps(list(channel_ids))))
+
+    def record_scan(self, bar_close):
+        """
+        Record that the scan of a bar is done. Written on the next flush like the alerts.
+
+        Parameters:
+        - bar_close (pd.Timestamp): Close of the scanned bar (UTC).
+        """
+        self.last_scanned_bar = bar_close
+        with self.lock:
+            self.pending_scan = bar_close.isoformat()
+
+    def _take_pending(self):
+        with self.lock:
+            batch, self.pending = self.pending, []
+            scan, self.pending_scan = self.pending_scan, None
+        return batch, scan
+
+    def _write_batch(self, pending):
+        batch, scan = pending
+        if not batch and scan is None:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO alerts (symbol, sent_at, signal_status, channels) VALUES (?, ?, ?, ?)", batch)
+            if scan is not None:
+                self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('last_scanned_bar', ?)", (scan,))
+
+    async def flush(self):
+        """
+        Write all queued alerts in one transaction from a worker thread.
+        """
+        await asyncio.to_thread(self._write_batch, self._take_pending())
+
+    def compact(self):
+        """
+        Fold the write-ahead log back into the database file and truncate it.
+        """
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.conn.execute("PRAGMA optimize")
+
+    async def run_writer(self, flush_interval=FLUSH_INTERVAL, compact_interval=COMPACT_INTERVAL):
+        """
+        Background task flushing queued alerts every `flush_interval` seconds and compacting the
+        log every `compact_interval` seconds.
+        """
+        last_compact = time.monotonic()
+        while True:
+            await asyncio.sleep(flush_interval)
+            try:
+                await self.flush()
+                if time.monotonic() - last_compact > compact_interval:
+                    await asyncio.to_thread(self.compact)
+                    last_compact = time.monotonic()
+            except Exception as e:
+                print(f"Failed to persist alert state: {e}")
+
+    def history(self, symbol=None, since=None):
+        """
+        Query the full alert history.
+
+        Parameters:
+        - symbol (str): Restrict to one stock symbol.
+        - since (datetime): Restrict to alerts sent at or after this time.
+
+        Returns:
+        - pd.DataFrame: One row per alert with symbol, sent_at, channels and one column per timeframe.
+        """
+        query = "SELECT symbol, sent_at, signal_status, channels FROM alerts WHERE 1=1"
+        params = []
+        if symbol is not None:
+            query += " AND symbol = ?"
+            params.append(symbol)
+        if since is not None:
+            query += " AND sent_at >= ?"
+            params.append(since.isoformat())
+        rows = self.conn.execute(query + " ORDER BY id", params).fetchall()
+        if not rows:
+            return pd.DataFrame(columns=['symbol', 'sent_at', 'channels'])
+        df = pd.DataFrame(rows, columns=['symbol', 'sent_at', 'signal_status', 'channels'])
+        df['sent_at'] = pd.to_datetime(df['sent_at'], format='ISO8601')
+        df['channels'] = df['channels'].map(json.loads)
+        status = pd.DataFrame(df.pop('signal_status').map(json.loads).tolist(), index=df.index)
+        return pd.concat([df, status], axis=1)
+
+    def close(self):
+        self._write_batch(self._take_pending())
+        self.conn.close()
@@ -0,0 +1,139 @@
+# bar_aggregator.py
+
+import threading
+import time
+import pandas as pd
+from datetime import timedelta
+from market_schedule import MarketSessionClock
+
+# Bar length in minutes per timeframe, labelled like the keys of multi_resolution_signal
+TIMEFRAMES = {
+    '30min': 30,
+    '1H': 60,
+    '2H': 120,
+    '3H': 180,
+    '4H': 240,
+}
+MS_PER_DAY = 86_400_000
+
+
+class TickBarAggregator:
+    """
+    Builds OHLCV bars from Finnhub trade messages for many symbols at once.
+
+    Bars are aligned to the session open (09:30 ET), like resample_kline_data, and the last bar of a
+    session is cut at the session close. Trades outside regular trading hours are ignored.
+    A bar is emitted through `on_bar(symbol, timeframe, bar)` as soon as it closes, either because a
+    later trade arrives or because `close_due_bars` is called after the bar close time.
+    """
+    def __init__(self, on_bar, timeframes=TIMEFRAMES, clock=None):
+        """
+        Parameters:
+        - on_bar (callable): Called as on_bar(symbol, timeframe, bar) for every completed bar, where
+          bar is a dict with 't' (bar start, pd.Timestamp in US/Eastern) and 'o', 'h', 'l', 'c', 'v'.
+        - timeframes (dict): Timeframe label -> bar length in minutes.
+        - clock (MarketSessionClock): Session calendar, NYSE by default.
+        """
+        self.on_bar = on_bar
+        self.timeframes = {label: minutes * 60_000 for label, minutes in timeframes.items()}
+        self.clock = clock or MarketSessionClock()
+        self.sessions = {}  # UTC day number -> (open_ms, close_ms)
+        self.bars = {}  # (symbol, timeframe) -> [start_ms, end_ms, o, h, l, c, v]
+        self.closed_until = {}  # (symbol, timeframe) -> end_ms of the last emitted bar
+        self.late_trades = 0
+        self.lock = threading.Lock()
+
+    def _session(self, t_ms):
+        day = t_ms // MS_PER_DAY
+        if day not in self.sessions:
+            start = pd.Timestamp(day * MS_PER_DAY, unit='ms').date()
+            for market_open, market_close in self.clock.sessions(start - timedelta(days=1), start + timedelta(days=7)):
+                self.sessions[market_open.value // 1_000_000 // MS_PER_DAY] = (
+                    market_open.value // 1_000_000, market_close.value // 1_000_000)
+            # mark closed days so they are not looked up again
+            self.sessions.setdefault(day, None)
+        return self.sessions[day]
+
+    def add_trade(self, symbol, price, t_ms, volume):
+        """
+        Fold one trade into the open bars of the symbol.
+
+        Parameters:
+        - symbol (str): Stock ticker symbol.
+        - price (float): Trade price.
+        - t_ms (int): Trade time in milliseconds since epoch (UTC).
+        - volume (float): Trade size.
+        """
+        session = self._session(t_ms)
+        if session is None or not (session[0] <= t_ms < session[1]):
+            return
+        market_open, market_close = session
+        completed = []
+        with self.lock:
+            for timeframe, length in self.timeframes.items():
+                key = (symbol, timeframe)
+                bar = self.bars.get(key)
+                # trades of a bar that was already emitted are dropped, not turned into a new bar
+                if t_ms < (bar[0] if bar is not None else self.closed_until.get(key, 0)):
+                    self.late_trades += 1
+                    continue
+                if bar is None or t_ms >= bar[1]:
+                    if bar is not None:
+                        completed.append((symbol, timeframe, bar))
+                        self.closed_until[key] = bar[1]
+                    start = market_open + (t_ms - market_open) // length * length
+                    bar = [start, min(start + length, market_close), price, price, price, price, 0.0]
+                    self.bars[key] = bar
+                if price > bar[3]:
+                    bar[3] = price
+                if price < bar[4]:
+                    bar[4] = price
+                bar[5] = price
+                bar[6] += volume
+        self._emit(completed)
+
+    def on_trade_message(self, message):
+        """
+        Consume a decoded Finnhub WebSocket message, e.g.
+        {"type": "trade", "data": [{"s": "AAPL", "p": 227.1, "t": 1700000000000, "v": 100}]}.
+        """
+        if message.get('type') != 'trade':
+            return
+        for trade in message.get('data', []):
+            self.add_trade(trade['s'], trade['p'], trade['t'], trade['v'])
+
+    def close_due_bars(self, now_ms=None):
+        """
+        Emit every open bar whose close time has passed, without waiting for the next trade.
+
+        Parameters:
+        - now_ms (int): Current time in milliseconds since epoch, defaults to the wall clock.
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        completed = []
+        with self.lock:
+            for key, bar in list(self.bars.items()):
+                if bar[1] <= now_ms:
+                    completed.append((key[0], key[1], bar))
+                    self.closed_until[key] = bar[1]
+                    del self.bars[key]
+        self._emit(completed)
+
+    def run_close_timer(self, stop_event, interval=0.5):
+        """
+        Call close_due_bars every `interval` seconds until `stop_event` is set.
+        Meant to run in a daemon thread next to the WebSocket client.
+        """
+        while not stop_event.wait(interval):
+            self.close_due_bars()
+
+    def _emit(self, completed):
+        for symbol, timeframe, bar in completed:
+            self.on_bar(symbol, timeframe, {
+                't': pd.Timestamp(bar[0], unit='ms', tz='UTC').tz_convert('US/Eastern'),
+                'o': bar[2],
+                'h': bar[3],
+                'l': bar[4],
+                'c': bar[5],
+                'v': bar[6],
+            })
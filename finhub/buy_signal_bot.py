@@ -7,7 +7,13 @@ from metrics.lingfeng import calc_buy_sell_signals
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 import pytz
+from telemetry import REGISTRY
 LOOKBACK_COUNT=180 # lookback days
+OVERLAP_BARS = 4 # cached bars refetched with every gap fetch to validate the cache against the candle endpoint
+PRICE_TOLERANCE = 1e-3 # relative close difference above which cached bars are stale (splits, corrections)
+
+SIGNAL_COMPUTE_SECONDS = REGISTRY.histogram('signal_compute_seconds', 'Time to compute the Vegas channel and buy/sell signals.', ('timeframe',))
+BAR_CACHE_REQUESTS = REGISTRY.counter('bar_cache_requests_total', 'Reads of the 30-minute bars, served from live bars (hit), cached bars plus a REST gap fetch (gap) or a full REST fetch (miss).', ('result',))
 
 
 
@@ -147,41 +153,169 @@ def remove_first_entry_each_day(df):
     return df_filtered
 
 
+def merge_bars(cached, fresh, tolerance=PRICE_TOLERANCE):
+    """
+    Extend cached bars with freshly fetched ones, trimmed to the lookback window.
+
+    Parameters:
+    - cached (pd.DataFrame): Cached bars indexed by bar time.
+    - fresh (pd.DataFrame): Bars fetched since one of the cached bars, same layout.
+    - tolerance (float): Largest accepted relative difference of the close on overlapping bars.
+
+    Returns:
+    - pd.DataFrame or None: Merged bars, or None if the overlapping bars disagree or do not overlap
+      at all, in which case the cache cannot be trusted and a full fetch is needed.
+    """
+    if fresh.empty:
+        return cached
+    # the last cached bar may still have been forming when it was fetched, so it is not compared
+    overlap = cached.index[:-1].intersection(fresh.index)
+    if len(overlap) == 0:
+        return None
+    old_close = cached.loc[overlap, 'c'].astype(float).to_numpy()
+    new_close = fresh.loc[overlap, 'c'].astype(float).to_numpy()
+    if np.any(np.abs(new_close - old_close) > tolerance * np.abs(old_close)):
+        return None
+    merged = pd.concat([cached[~cached.index.isin(fresh.index)], fresh]).sort_index()
+    return merged[merged.index > merged.index[-1] - timedelta(days=LOOKBACK_COUNT)]
+
+
 class BuySignalDetector:
-    def __init__(self, stock_symbol, engine: FinnhubEngine):
+    def __init__(self, stock_symbol, engine: FinnhubEngine, snapshot_store=None):
         self.engine = engine
         self.stock_symbol = stock_symbol    
         self.visual = True # disable this when serving in real-time
+        self.halfhour_data = None # 30-minute bars, kept current by append_bar while streaming
+        self.day_data = None # daily bars
+        self.live = False
+        self.last_signal = None # output of the latest multi_resolution_signal
+        self.snapshot_store = snapshot_store # DetectorSnapshotStore to warm-start from, loaded on first use
+        self.snapshot_loaded = False
 
 
-    def multi_resolution_signal(self):
+    def load_snapshot(self):
+        """
+        Restore the bars and last signal of this symbol from the snapshot store, once. The restored
+        bars are validated against the candle endpoint by the next gap fetch.
+        """
+        if self.snapshot_loaded or self.snapshot_store is None:
+            return
+        self.snapshot_loaded = True
+        state = self.snapshot_store.load(self.stock_symbol)
+        if state is None:
+            return
+        if self.halfhour_data is None:
+            self.halfhour_data = state.get('30min')
+        if self.day_data is None:
+            self.day_data = state.get('D')
+        if self.last_signal is None:
+            self.last_signal = state.get('signal')
+
+
+    def _fetch_gap(self, cached, resolution):
+        """
+        Fetch the bars since the last OVERLAP_BARS cached bars and merge them into the cache.
+        Returns None if the cache disagrees with the candle endpoint.
+        """
+        since = cached.index[max(0, len(cached) - OVERLAP_BARS - 1)]
+        fresh = self.engine.get_historical_prices(self.stock_symbol,
+                                                  resolution=resolution,
+                                                  since=int(since.timestamp()),
+                                                  )
+        if resolution == 'D':
+            fresh = fresh.set_index('t')
+        return merge_bars(cached, fresh)
+
+
+    def get_halfhour_data(self):
+        """
+        Return the 30-minute bars of the lookback window. Once live bars are streamed in through
+        append_bar, the cached bars are used instead of polling the REST candle endpoint; otherwise
+        cached bars are extended with only the bars since the last fetch. If the stream missed a bar
+        close (e.g. it dropped and reconnected), the detector falls back to polling until the next
+        streamed bar, so the gap is backfilled.
+        """
+        if self.live and self.halfhour_data is not None:
+            last_close = self.halfhour_data.index[-1] + timedelta(minutes=30)
+            if last_close >= pd.Timestamp.now(tz='US/Eastern').floor('30min'):
+                BAR_CACHE_REQUESTS.inc(result='hit')
+                return self.halfhour_data
+            print(f"Live bars of {self.stock_symbol} end at {last_close}, backfilling from the candle endpoint.")
+            self.live = False
+        self.load_snapshot()
+        if self.halfhour_data is not None and not self.halfhour_data.empty:
+            merged = self._fetch_gap(self.halfhour_data, '30')
+            if merged is not None:
+                BAR_CACHE_REQUESTS.inc(result='gap')
+                self.halfhour_data = merged
+                return self.halfhour_data
+            print(f"Cached 30-minute bars of {self.stock_symbol} are stale, refetching.")
+        BAR_CACHE_REQUESTS.inc(result='miss')
         lookback_four_halfhour = LOOKBACK_COUNT * 24 * 60 // 30
-        halfhour_data = self.engine.get_historical_prices(self.stock_symbol, 
+        self.halfhour_data = self.engine.get_historical_prices(self.stock_symbol, 
                                                     resolution='30', 
                                                     count=lookback_four_halfhour,
                                                     )
+        return self.halfhour_data
+
+
+    def get_day_data(self):
+        """
+        Return the daily bars of the lookback window, extending the cached bars with a gap fetch.
+        """
+        self.load_snapshot()
+        if self.day_data is not None and not self.day_data.empty:
+            merged = self._fetch_gap(self.day_data.set_index('t'), 'D')
+            if merged is not None:
+                self.day_data = merged.reset_index()
+                return self.day_data
+            print(f"Cached daily bars of {self.stock_symbol} are stale, refetching.")
+        self.day_data = self.engine.get_historical_prices(self.stock_symbol, 
+                                                          resolution='D', 
+                                                          count=LOOKBACK_COUNT,
+                                                          )
+        return self.day_data
+
+
+    def append_bar(self, bar):
+        """
+        Append a completed 30-minute bar built from the live trade stream.
+
+        Parameters:
+        - bar (dict): Bar with 't' (bar start in US/Eastern) and 'o', 'h', 'l', 'c', 'v'.
+        """
+        if self.halfhour_data is None:
+            # the stream only extends history, it cannot replace it
+            return
+        row = pd.DataFrame({k: [bar[k]] for k in ['o', 'h', 'l', 'c', 'v']},
+                           index=pd.DatetimeIndex([bar['t']], name='t_et'))
+        data = self.halfhour_data[self.halfhour_data.index != bar['t']]
+        data = pd.concat([data, row]).sort_index()
+        self.halfhour_data = data[data.index > bar['t'] - timedelta(days=LOOKBACK_COUNT)]
+        self.live = True
+
+
+    def multi_resolution_signal(self):
+        halfhour_data = self.get_halfhour_data()
 
 
         halfhour_filtered = remove_first_entry_each_day(halfhour_data)
         # halfhour without first row to compute signal
-        halfhour_signal = self.compute_vegas_channel_and_signel(halfhour_filtered, visualize=False)
+        halfhour_signal = self.compute_vegas_channel_and_signel(halfhour_filtered, visualize=False, timeframe='30min')
 
-        day_data = self.engine.get_historical_prices(self.stock_symbol, 
-                                                            resolution='D', 
-                                                            count=LOOKBACK_COUNT,
-                                                            )
+        day_data = self.get_day_data()
 
-        day_signal = self.compute_vegas_channel_and_signel(day_data, visualize=False)
+        day_signal = self.compute_vegas_channel_and_signel(day_data, visualize=False, timeframe='D')
   
         onehour_historical_data = resample_kline_data(halfhour_data, '1h')   
         twohour_historical_data = resample_kline_data(halfhour_data, '2h')
         threehour_historical_data = resample_kline_data(halfhour_data, '3h')
         fourhour_historical_data = resample_kline_data(halfhour_data, '4h')
         
-        onehour_signal = self.compute_vegas_channel_and_signel(onehour_historical_data, visualize=False)
-        twohour_signal = self.compute_vegas_channel_and_signel(twohour_historical_data, visualize=False)
-        threehour_signal = self.compute_vegas_channel_and_signel(threehour_historical_data, visualize=False)
-        fourhour_signal = self.compute_vegas_channel_and_signel(fourhour_historical_data, visualize=False)
+        onehour_signal = self.compute_vegas_channel_and_signel(onehour_historical_data, visualize=False, timeframe='1H')
+        twohour_signal = self.compute_vegas_channel_and_signel(twohour_historical_data, visualize=False, timeframe='2H')
+        threehour_signal = self.compute_vegas_channel_and_signel(threehour_historical_data, visualize=False, timeframe='3H')
+        fourhour_signal = self.compute_vegas_channel_and_signel(fourhour_historical_data, visualize=False, timeframe='4H')
 
         # combine all signals for warning
         resampled_data = {
@@ -193,7 +327,8 @@ class BuySignalDetector:
             'D': day_signal,
         }
 
-        return self.check_buy_signals_past_two_days(resampled_data)
+        self.last_signal = self.check_buy_signals_past_two_days(resampled_data)
+        return self.last_signal
     
 
     def check_buy_signals_past_two_days(self, resampled_data):
@@ -259,7 +394,15 @@ class BuySignalDetector:
 
 
 
-    def compute_vegas_channel_and_signel(self, data, visualize=True):
+    def compute_vegas_channel_and_signel(self, data, visualize=True, timeframe=''):
+        with SIGNAL_COMPUTE_SECONDS.time(timeframe=timeframe):
+            historical_data = self._compute_vegas_channel_and_signel(data)
+        if visualize:
+            self.plot_vegas_channel(historical_data)
+        return historical_data
+
+
+    def _compute_vegas_channel_and_signel(self, data):
         historical_data = data.copy()
         # A:EMA(HIGH,24),COLORBLUE;
         # B:EMA(LOW,23),COLORBLUE;
@@ -289,8 +432,6 @@ class BuySignalDetector:
         historical_data['buy_signal'] = buy_signals
         historical_data['sell_signal'] = sell_signals
 
-        if visualize:
-            self.plot_vegas_channel(historical_data)
         return historical_data
 
 
@@ -1,8 +1,15 @@
 # call_reward_risk.py
 
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from pricing_models.heston_volatility import calibrate_heston_model, create_volatility_surface
+from pricing_models.heston_volatility import calibrate_heston_model_cached, calibrate_heston_model_warm, create_volatility_surface, HestonPricingContext, HestonCalibrationCache
+from pricing_models.implied_vol import chain_implied_volatility
+from pricing_models.heston_surface import calibrate_heston_surface
+from pricing_models.scenario_grid import reward_risk_grid
+from pricing_models.heston_mc import heston_barrier_probabilities
 from engine import FinnhubEngine
 import pandas as pd
 import numpy as np
@@ -25,6 +32,8 @@ SYMBOL = "NVDA"
 UPPER_BOUND = 150
 LOWER_BOUND = 138
 FILTER_THRESHOLD = 0.1 # only consider options within 10% of the current stock price
+CALIBRATION_CACHE_FILE = 'heston_calibration_cache.json' # warm starts for the next run
+CALIBRATION_WORKERS = os.cpu_count() or 1 # expiries calibrated in parallel
 
 SYMBOL = "AAPL"
 UPPER_BOUND = 230
@@ -34,182 +43,419 @@ LOWER_BOUND = 220
 
 # ... [existing imports and setup] ...
 
+def prepare_expiry(options_data, exp_date, current_stock_price):
+    """
+    Extract the calibration inputs of one expiry from the option chain.
+
+    Returns:
+    - dict or None: 'exp_date', 'time_to_maturity', 'strikes', 'market_prices' and 'IV', or None
+      if the expiry has nothing to calibrate on.
+    """
+    # Filter options for the current expiration date
+    filtered_options = [opt for opt in options_data if opt['expirationDate'] == exp_date]
+
+    if not filtered_options:
+        logger.warning(f"No options found for expiration date {exp_date}. Skipping.")
+        return None
+
+    # Separate calls
+    calls = [opt['options']['CALL'] for opt in filtered_options][0]
+    if not calls:
+        logger.warning(f"No call options found for expiration date {exp_date}. Skipping.")
+        return None
+
+    # Calculate time to maturity in years
+    todays_date = ql.Date.todaysDate()
+
+    year, month, day = map(int, exp_date.split("-"))
+    ql_expiration_date = ql.Date(day, month, year)
+    time_to_maturity = ql.Actual365Fixed().yearFraction(todays_date, ql_expiration_date)
+    if time_to_maturity <= 0:
+        logger.warning(f"Expiration date {exp_date} is in the past. Skipping.")
+        return None
+
+    # Solve IV from the current quotes of the whole chain at once; Finnhub's IV is often stale, so it
+    # is only the fallback where the quotes cannot be inverted
+    _, solved_IV = chain_implied_volatility(calls, current_stock_price, time_to_maturity,
+                                            RISK_FREE_RATE, 0, 'call')
+
+    # Extract strikes, market prices, and implied volatilities
+    strikes = []
+    market_prices = []
+    IV = []
+
+    min_strike, max_strike = current_stock_price * 0.8, current_stock_price * 1.2
+    for call, solved_vol in zip(calls, solved_IV):
+        strike_price = call['strike']
+        market_price = call['lastPrice']  # Use last price as estimated option price
+        volume = call['volume']
+        quoted_vol = call.get('impliedVolatility')  # Assuming API provides this as a percentage
+        implied_vol = solved_vol if np.isfinite(solved_vol) else (quoted_vol / 100 if quoted_vol else np.nan)
+        if market_price == 0 or volume < 10 or (strike_price < min_strike or strike_price > max_strike) or not np.isfinite(implied_vol):
+            # Skip options with zero price, low volume, or no usable IV
+            continue
+        strikes.append(strike_price)
+        market_prices.append(market_price)
+        IV.append(implied_vol)
+
+    if not strikes:
+        logger.info(f"No valid call options found for expiration date {exp_date}. Skipping.")
+        return None
+
+    return {
+        'exp_date': exp_date,
+        'time_to_maturity': time_to_maturity,
+        'strikes': strikes,
+        'market_prices': market_prices,
+        'IV': IV,
+    }
+
+
+def stack_surface(tasks, stock_price):
+    """
+    Pad the strikes and IVs of several expiries into rectangular arrays for calibrate_heston_surface.
+    Missing entries get the spot as strike and NaN as IV, which the calibration ignores.
+
+    Returns:
+    - (np.ndarray, np.ndarray, np.ndarray): Strikes and IVs of shape (expiries, max strikes), and maturities.
+    """
+    width = max(len(task['strikes']) for task in tasks)
+    strikes = np.full((len(tasks), width), float(stock_price))
+    IV = np.full((len(tasks), width), np.nan)
+    for i, task in enumerate(tasks):
+        strikes[i, :len(task['strikes'])] = task['strikes']
+        IV[i, :len(task['IV'])] = task['IV']
+    return strikes, IV, np.array([task['time_to_maturity'] for task in tasks])
+
+
+def reward_risk_rows(stock_price, upperbound, lowerbound, params, strike_prices, option_prices, exp_date, scenarios=None):
+    """
+    Price the strikes near the current stock price under the upper and lower bounds (and any extra
+    scenarios) with one Heston pricing context.
+
+    Parameters:
+    - stock_price (float): Current stock price.
+    - upperbound, lowerbound (float): Target and risk stock prices.
+    - params (dict): Calibrated Heston parameters.
+    - strike_prices (array-like): Strike prices.
+    - option_prices (list): Current premiums of the strikes.
+    - exp_date (ql.Date): Expiration date.
+    - scenarios (dict, optional): Extra label -> stock price scenarios.
+
+    Returns:
+    - list: One row per strike: strike, premium, reward price, risk price, reward ratio,
+      risk ratio, reward/risk ratio, followed by the prices of the extra scenarios.
+    """
+    scenarios = scenarios or {}
+    # Skip options that are too far from the current stock price
+    kept = [(strike_price, option_price) for strike_price, option_price in zip(strike_prices, option_prices)
+            if abs(strike_price - stock_price) / stock_price <= FILTER_THRESHOLD]
+    if not kept:
+        return []
+    strikes = [strike_price for strike_price, _ in kept]
+
+    # One Heston process/model/engine for the expiry; every scenario only moves the spot quote
+    context = HestonPricingContext(params, exp_date, RISK_FREE_RATE, q=0)  # Assuming no dividends
+    spots = [upperbound, lowerbound] + list(scenarios.values())
+    scenario_prices = context.price_scenarios(spots, strikes, 'call')
+
+    results = []
+    for i, (strike_price, option_price) in enumerate(kept):
+        reward_price = scenario_prices[0, i]
+        risk_price = scenario_prices[1, i]
+
+        reward_ratio = (reward_price - option_price) / option_price
+        risk_ratio = (option_price - risk_price) / option_price
+        reward_risk_ratio = (reward_price - option_price) / (option_price - risk_price)
+        results.append([strike_price, option_price, reward_price, risk_price, reward_ratio, risk_ratio, reward_risk_ratio]
+                       + scenario_prices[2:, i].tolist())
+    return results
+
+
+def format_reward_risk_table(results, scenarios=None):
+    scenarios = scenarios or {}
+    table = PrettyTable()
+    table.field_names = ["Strike", "Cur Premium", "Reward Price", "Risk Price", "Reward Ratio", "Risk Ratio", "R/R Ratio"] \
+        + [f"{label} ({spot:.2f})" for label, spot in scenarios.items()]
+
+    # Add rows to the table
+    for row in results:
+        table.add_row([f"{row[0]:.2f}", f"{row[1]:.3f}", f"{row[2]:.2f}", f"{row[3]:.2f}", f"{row[4]:.2%}", f"{row[5]:.2%}", f"{row[6]:.2f}"]
+                      + [f"{price:.2f}" for price in row[7:]])
+    return table
+
+
+def evaluate_expiry(task):
+    """
+    Calibrate (unless cached) and price one expiry. Runs in a worker process, so QuantLib's global
+    evaluation date and any failure stay isolated to this expiry.
+
+    Parameters:
+    - task (dict): Output of prepare_expiry plus 'stock_price', 'upperbound', 'lowerbound',
+      'scenarios', 'cached_params' and 'initial_params'.
+
+    Returns:
+    - (dict, list, float): Calibrated parameters, reward/risk rows and calibration seconds.
+    """
+    start = time.perf_counter()
+    params = task['cached_params']
+    if params is None:
+        _, params = calibrate_heston_model_warm(
+            S=task['stock_price'],
+            K_list=task['strikes'],
+            time_to_maturity=task['time_to_maturity'],
+            r=RISK_FREE_RATE,
+            q=0,  # Assuming no dividends
+            IV_list=task['IV'],
+            option_type='call',
+            initial_params=task['initial_params'],
+        )
+    calibration_seconds = time.perf_counter() - start
+
+    year, month, day = map(int, task['exp_date'].split("-"))
+    rows = reward_risk_rows(task['stock_price'], task['upperbound'], task['lowerbound'], params,
+                            task['strikes'], task['market_prices'], ql.Date(day, month, year), task['scenarios'])
+    return params, rows, calibration_seconds
+
+
 class RewardRiskEvaluator:
     def __init__(self, symbol, upperbound, lowerbound):
         self.symbol = symbol
         self.upperbound = upperbound
         self.lowerbound = lowerbound
         self.finnhub = FinnhubEngine()
-        self.vol_surface = None
-        self.heston_model = None
-        self.calibrated_params = None
+        self.calibrated_params = {}  # expiration date -> Heston parameters of the last assess_option_pricing
+        self.calibration_cache = HestonCalibrationCache(CALIBRATION_CACHE_FILE)
+        self.failures = {}  # expiration date -> error of the last assess_option_pricing
+        self.pool = None  # worker processes kept between assess_option_pricing calls
+        self.pool_workers = 0
+
+    def _get_pool(self, max_workers):
+        """
+        Return the worker pool, started on first use and restarted only if `max_workers` changes or
+        a worker died.
+        """
+        if self.pool is None or self.pool_workers != max_workers:
+            self.close()
+            self.pool = ProcessPoolExecutor(max_workers=max_workers)
+            self.pool_workers = max_workers
+        return self.pool
+
+    def close(self):
+        """
+        Shut the worker pool down.
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def assess_option_pricing(self, max_expirations=None, scenarios=None, max_workers=CALIBRATION_WORKERS,
+                              joint_calibration=False):
+        """
+        Calibrate Heston per expiry in a process pool and print the reward/risk table of each expiry.
+        The chain is fetched once; cache lookups and stores stay in this process.
+
+        Parameters:
+        - max_expirations (int, optional): Only evaluate the nearest expirations (all by default).
+        - scenarios (dict, optional): Extra label -> stock price scenarios for every table.
+        - max_workers (int): Number of worker processes, kept alive for the next calls until close().
+        - joint_calibration (bool): Fit one parameter set to all expiries with calibrate_heston_surface
+          instead of one calibration per expiry; the workers then only price.
 
-    def assess_option_pricing(self):
+        Returns:
+        - dict: Expiration date -> reward/risk rows, for every expiry evaluated successfully.
+        """
         current_stock_price = self.get_current_stock_price()
         self.stock_price = current_stock_price
+        self.failures = {}
+        self.calibrated_params = {}
         # Retrieve the full option chain
-        options_data = self.finnhub.get_option_chain(self.symbol, '')
+        options_data = self.finnhub.get_option_chain(self.symbol)
         if not options_data:
             logger.error("No option data found.")
-            return
+            return {}
 
         # Extract unique expiration dates from the options data
         expiration_dates = sorted(list({option['expirationDate'] for option in options_data}))
         logger.info(f"Found {len(expiration_dates)} unique expiration dates.")
+        expiration_dates = expiration_dates[:max_expirations]
 
-        # Select the first four expiration dates
-        next_four_expirations = expiration_dates[:4]
-        logger.info(f"Next four expiration dates: {next_four_expirations}")
-
-        for i, exp_date in enumerate(next_four_expirations):
+        tasks = []
+        for exp_date in expiration_dates:
             logger.info(f"Processing options for expiration date: {exp_date}")
-
-            # Filter options for the current expiration date
-            filtered_options = [opt for opt in options_data if opt['expirationDate'] == exp_date]
-
-            if not filtered_options:
-                logger.warning(f"No options found for expiration date {exp_date}. Skipping.")
+            task = prepare_expiry(options_data, exp_date, current_stock_price)
+            if task is None:
                 continue
-
-            # Separate calls
-            calls = [opt['options']['CALL'] for opt in filtered_options][0]
-            if not calls:
-                logger.warning(f"No call options found for expiration date {exp_date}. Skipping.")
+            task['input_hash'] = self.calibration_cache.input_hash(current_stock_price, task['strikes'], task['IV'])
+            task['cached_params'] = self.calibration_cache.get(self.symbol, exp_date, task['input_hash'])
+            task['initial_params'] = self.calibration_cache.nearest(self.symbol, exp_date)
+            task.update(stock_price=current_stock_price, upperbound=self.upperbound,
+                        lowerbound=self.lowerbound, scenarios=scenarios)
+            tasks.append(task)
+        if not tasks:
+            return {}
+        if joint_calibration:
+            strikes, IV, maturities = stack_surface(tasks, current_stock_price)
+            try:
+                params, info = calibrate_heston_surface(current_stock_price, strikes, maturities, IV, RISK_FREE_RATE,
+                                                        q=0, initial_params=self.calibration_cache.nearest(self.symbol, tasks[0]['exp_date']))
+            except (RuntimeError, ValueError) as e:
+                logger.error(f"Joint calibration failed: {e}")
+                self.failures = {task['exp_date']: str(e) for task in tasks}
+                return {}
+            logger.info(f"Joint Heston parameters for {len(tasks)} expirations: {params} (RMSE {info['rmse']:.2%})")
+            for task in tasks:
+                task['cached_params'] = params
+
+        results = {}
+        start = time.perf_counter()
+        pool = self._get_pool(max_workers)
+        futures = {pool.submit(evaluate_expiry, task): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            exp_date = task['exp_date']
+            try:
+                params, rows, calibration_seconds = future.result()
+            except Exception as e:
+                logger.error(f"Failed to evaluate expiration date {exp_date}: {e}")
+                self.failures[exp_date] = str(e)
                 continue
+            logger.info(f"Calibrated Heston Parameters for {exp_date} in {calibration_seconds:.2f}s: {params}")
+            if task['cached_params'] is None:
+                self.calibration_cache.put(self.symbol, exp_date, task['input_hash'], params)
+            results[exp_date] = rows
+            self.calibrated_params[exp_date] = params
+        if any(isinstance(future.exception(), BrokenProcessPool) for future in futures):
+            self.close()  # a worker died, start a fresh pool on the next call
+        logger.info(f"Evaluated {len(results)}/{len(tasks)} expirations in {time.perf_counter() - start:.2f}s.")
+        self.calibration_cache.save()
+
+        for exp_date in sorted(results):
+            print(f"Expiration {exp_date}")
+            print(format_reward_risk_table(results[exp_date], scenarios))
+        for exp_date, error in sorted(self.failures.items()):
+            print(f"Expiration {exp_date} failed: {error}")
+        return results
+
+
+    def scenario_grid(self, exp_date, target_spots=None, risk_spots=None, horizon_days=(0,), vol_shifts=(0.0,),
+                      model='black_scholes'):
+        """
+        Reward, risk and R/R of every strike of one expiry over a grid of target spots, risk spots,
+        horizons and vol shifts, for heatmaps instead of editing UPPER_BOUND / LOWER_BOUND.
 
-            # Extract strikes, market prices, and implied volatilities
-            strikes = []
-            market_prices = []
-            IV = []
-
-            min_strike, max_strike = current_stock_price * 0.8, current_stock_price * 1.2
-            for call in calls:
-                strike_price = call['strike']
-                market_price = call['lastPrice']  # Use last price as estimated option price
-                volume = call['volume']
-                implied_vol = call.get('impliedVolatility')  # Assuming API provides this as a percentage
-                if market_price == 0 or volume < 10 or (strike_price < min_strike or strike_price > max_strike):
-                    # Skip options with zero price, low volume, or missing IV
-                    continue
-                strikes.append(strike_price)
-                market_prices.append(market_price)
-                IV.append(implied_vol / 100)  # Convert percentage to decimal
-
-            if not strikes:
-                logger.info(f"No valid call options found for expiration date {exp_date}. Skipping.")
-                continue
+        Parameters:
+        - exp_date (str): Expiration date, 'YYYY-MM-DD'.
+        - target_spots (array-like, optional): Target stock prices, [upperbound] by default.
+        - risk_spots (array-like, optional): Risk stock prices, [lowerbound] by default.
+        - horizon_days (array-like): Days from today at which the spot is reached.
+        - vol_shifts (array-like): Additive implied vol shifts.
+        - model (str): 'black_scholes' (chain IVs) or 'heston' (cached or fresh calibration).
 
-            # Calculate time to maturity in years
-            market_prices = np.array(market_prices)
-            strikes = np.array(strikes)
-            todays_date = ql.Date.todaysDate()
-   
-            year, month, day = map(int, exp_date.split("-"))
-            ql_expiration_date = ql.Date(day, month, year)
-            time_to_maturity = ql.Actual365Fixed().yearFraction(todays_date, ql_expiration_date)
-            if time_to_maturity <= 0:
-                logger.warning(f"Expiration date {exp_date} is in the past. Skipping.")
-                continue
+        Returns:
+        - dict or None: Output of reward_risk_grid, or None if the expiry has no usable quotes.
+        """
+        if model not in ('black_scholes', 'heston'):
+            raise ValueError("model must be 'black_scholes' or 'heston'")
+        current_stock_price = self.get_current_stock_price()
+        self.stock_price = current_stock_price
+        task = prepare_expiry(self.finnhub.get_option_chain(self.symbol), exp_date, current_stock_price)
+        if task is None:
+            return None
 
-            # Calibrate Heston model
-            try:
-                self.heston_model, self.calibrated_params = calibrate_heston_model(
-                    S=current_stock_price,
-                    K_list=strikes,
-                    time_to_maturity=time_to_maturity,
-                    r=RISK_FREE_RATE,
-                    q=0,  # Assuming no dividends
-                    IV_list=IV,
-                    option_type='call'
-                )
-                logger.info(f"Calibrated Heston Parameters for {exp_date}: {self.calibrated_params}")
-            except Exception as e:
-                logger.error(f"Failed to calibrate Heston model for {exp_date}: {e}")
-                exit(0)
-                # continue
+        heston_params = None
+        if model == 'heston':
+            _, heston_params = calibrate_heston_model_cached(
+                self.calibration_cache, self.symbol, exp_date,
+                S=current_stock_price,
+                K_list=task['strikes'],
+                time_to_maturity=task['time_to_maturity'],
+                r=RISK_FREE_RATE,
+                q=0,  # Assuming no dividends
+                IV_list=task['IV'],
+                option_type='call'
+            )
+            self.calibration_cache.save()
 
-            # using upper and lowerbound to calculate reward/risk ratio given the calibrated Heston model
-            self.calculate_reward_risk(strikes, market_prices.tolist(), ql_expiration_date)
-            time.sleep(5)  # Avoid rate limiting
+        return reward_risk_grid(
+            task['strikes'], task['market_prices'], task['time_to_maturity'],
+            target_spots if target_spots is not None else [self.upperbound],
+            risk_spots if risk_spots is not None else [self.lowerbound],
+            np.asarray(horizon_days, dtype=np.float64) / 365.0, vol_shifts, RISK_FREE_RATE,
+            ivs=task['IV'], heston_params=heston_params)
 
 
-    def calculate_reward_risk(self, strike_prices, option_prices, exp_date):
+    def barrier_probabilities(self, exp_date, levels=None, **kwargs):
         """
-        Calculate the reward and risk of the call buying strategy based on the
-        calibrated Heston model, using the upper and lower bounds for stock prices.
-        
-        Returns:
-        - dict: A dictionary with reward, risk, and reward/risk ratio.
-        """
-
-        def _estimate_option_price(stock_price, strike_price, risk_free_curve, dividend_curve, v0, kappa, theta, sigma, rho):
-            """
-            Estimate the option price using the calibrated Heston model.
-            """
-            heston_process = ql.HestonProcess(
-                risk_free_curve,
-                dividend_curve,
-                ql.QuoteHandle(ql.SimpleQuote(stock_price)),
-                v0,
-                kappa,
-                theta,
-                sigma,
-                rho
-            )
-            heston_model = ql.HestonModel(heston_process)
-            pricing_engine = ql.AnalyticHestonEngine(heston_model)
-            european_option = ql.EuropeanOption(
-                ql.PlainVanillaPayoff(ql.Option.Call, strike_price),
-                ql.EuropeanExercise(exp_date)
-            )
-            european_option.setPricingEngine(pricing_engine)
-            expected_option_pricing = european_option.NPV()
-            return expected_option_pricing
+        Heston Monte Carlo probabilities of touching the strike ladder of one expiry (plus the upper and
+        lower bounds) before expiry, and of touching the lower bound before the upper bound.
 
+        Parameters:
+        - exp_date (str): Expiration date, 'YYYY-MM-DD'.
+        - levels (array-like, optional): Price levels, the expiry's strikes by default.
+        - **kwargs: Passed to heston_barrier_probabilities (n_paths, seed, max_workers, ...).
 
-        if not self.heston_model or not self.calibrated_params:
-            logger.error("Heston model is not calibrated. Please calibrate before computing reward/risk.")
+        Returns:
+        - dict or None: Output of heston_barrier_probabilities plus 'lower_bound_first', or None if the
+          expiry has no usable quotes.
+        """
+        current_stock_price = self.get_current_stock_price()
+        self.stock_price = current_stock_price
+        task = prepare_expiry(self.finnhub.get_option_chain(self.symbol), exp_date, current_stock_price)
+        if task is None:
             return None
+        _, params = calibrate_heston_model_cached(
+            self.calibration_cache, self.symbol, exp_date,
+            S=current_stock_price,
+            K_list=task['strikes'],
+            time_to_maturity=task['time_to_maturity'],
+            r=RISK_FREE_RATE,
+            q=0,  # Assuming no dividends
+            IV_list=task['IV'],
+            option_type='call'
+        )
+        self.calibration_cache.save()
 
-        # Extract calibrated parameters
-        kappa = self.calibrated_params['kappa']
-        theta = self.calibrated_params['theta']
-        sigma = self.calibrated_params['sigma']
-        rho = self.calibrated_params['rho']
-        v0 = self.calibrated_params['v0']
-        
-        # Initialize QuantLib Heston Process with calibrated parameters
-        todays_date = ql.Date.todaysDate()
-        ql.Settings.instance().evaluationDate = todays_date
+        levels = task['strikes'] if levels is None else levels
+        levels = np.unique(np.concatenate([np.asarray(levels, dtype=np.float64), [self.upperbound, self.lowerbound]]))
+        result = heston_barrier_probabilities(current_stock_price, levels, task['time_to_maturity'],
+                                              RISK_FREE_RATE, 0, params, **kwargs)
+        lower = np.flatnonzero(result['lower_barriers'] == self.lowerbound)
+        upper = np.flatnonzero(result['upper_barriers'] == self.upperbound)
+        if len(lower) and len(upper):
+            result['lower_bound_first'] = float(result['lower_first'][lower[0], upper[0]])
+            logger.info(f"P(touch {self.lowerbound} before {self.upperbound} by {exp_date}) = {result['lower_bound_first']:.2%}")
+        return result
 
-        risk_free_curve = ql.YieldTermStructureHandle(
-            ql.FlatForward(todays_date, RISK_FREE_RATE, ql.Actual365Fixed())
-        )
-        dividend_curve = ql.YieldTermStructureHandle(
-            ql.FlatForward(todays_date, 0, ql.Actual365Fixed())  # Assuming no dividends
-        )
-        # upperbound based Heston process
-        results = []
-        for strike_price, option_price in zip(strike_prices, option_prices):
-            if abs(strike_price - self.stock_price) / self.stock_price > FILTER_THRESHOLD:
-                # Skip options that are too far from the current stock price
-                continue
-            reward_price = _estimate_option_price(self.upperbound, strike_price, risk_free_curve, dividend_curve, v0, kappa, theta, sigma, rho)
-            risk_price = _estimate_option_price(self.lowerbound, strike_price, risk_free_curve, dividend_curve, v0, kappa, theta, sigma, rho)
-            
-            reward_ratio = (reward_price - option_price) / option_price
-            risk_ratio = (option_price - risk_price) / option_price
-            # print all stats
-            reward_risk_ratio = (reward_price - option_price) / (option_price - risk_price)
-            results.append([strike_price, option_price, reward_price, risk_price, reward_ratio, risk_ratio, reward_risk_ratio])
 
-        table = PrettyTable()
-        table.field_names = ["Strike", "Cur Premium", "Reward Price", "Risk Price", "Reward Ratio", "Risk Ratio", "R/R Ratio"]
+    def calculate_reward_risk(self, strike_prices, option_prices, exp_date, scenarios=None):
+        """
+        Calculate the reward and risk of the call buying strategy based on the Heston parameters
+        calibrated for the expiry by assess_option_pricing, using the upper and lower bounds for
+        stock prices.
+
+        Parameters:
+        - strike_prices (array-like): Strike prices.
+        - option_prices (list): Current premiums of the strikes.
+        - exp_date (str or ql.Date): Expiration date ('YYYY-MM-DD').
+        - scenarios (dict, optional): Extra label -> stock price scenarios, priced in the same batch
+          and shown as extra columns.
+        
+        Returns:
+        - list: Rows of reward_risk_rows.
+        """
+        if isinstance(exp_date, ql.Date):
+            exp_date = f"{exp_date.year():04d}-{exp_date.month():02d}-{exp_date.dayOfMonth():02d}"
+        params = self.calibrated_params.get(exp_date)
+        if params is None:
+            logger.error(f"Heston model is not calibrated for {exp_date}. Please calibrate before computing reward/risk.")
+            return None
 
-        # Add rows to the table
-        for row in results:
-            table.add_row([f"{row[0]:.2f}", f"{row[1]:.3f}", f"{row[2]:.2f}", f"{row[3]:.2f}", f"{row[4]:.2%}", f"{row[5]:.2%}", f"{row[6]:.2f}"])
-        print(table)
+        year, month, day = map(int, exp_date.split("-"))
+        results = reward_risk_rows(self.stock_price, self.upperbound, self.lowerbound, params,
+                                   strike_prices, option_prices, ql.Date(day, month, year), scenarios)
+        print(format_reward_risk_table(results, scenarios))
+        return results
 
 
     def compute_calibration_error(self, market_prices, model_prices):
@@ -245,4 +491,7 @@ class RewardRiskEvaluator:
 # Example usage
 if __name__ == "__main__":
     evaluator = RewardRiskEvaluator(SYMBOL, UPPER_BOUND, LOWER_BOUND)
-    evaluator.assess_option_pricing()
\ No newline at end of file
+    try:
+        evaluator.assess_option_pricing()
+    finally:
+        evaluator.close()
\ No newline at end of file
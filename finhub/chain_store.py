@@ -0,0 +1,398 @@
+# chain_store.py
+
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+CHAIN_STORE_DIR = 'chain_store'
+KEYFRAME_INTERVAL = 50  # snapshots per chunk; each chunk starts with a full keyframe
+FIELDS = ['volume', 'openInterest', 'impliedVolatility', 'bid', 'ask', 'lastPrice']
+LISTED = len(FIELDS)  # column flagging whether the contract is in the snapshot (1) or not (NaN)
+
+
+def contract_id(symbol, expiry, side, strike, contract=None):
+    """
+    Stable ID of a contract: Finnhub's contract name when present, else the OCC-style symbol.
+    """
+    if contract and contract.get('contractName'):
+        return contract['contractName']
+    return f"{symbol}{expiry[2:4]}{expiry[5:7]}{expiry[8:10]}{side[0]}{int(round(strike * 1000)):08d}"
+
+
+def _same(a, b):
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+class ChainSnapshotStore:
+    """
+    Intraday history of option chains, stored as changes between snapshots.
+
+    Every chunk has its own contract table: it starts with the contracts listed in the keyframe, so
+    expired contracts drop out, and contracts first seen later in the chunk are appended. Every
+    snapshot is a dense (contracts x fields) matrix in memory, but only the cells that changed since
+    the previous snapshot are written, as columnar (snapshot, contract, field, value) arrays. Every
+    KEYFRAME_INTERVAL snapshots a new chunk starts with a full keyframe, so reconstructing a timestamp
+    never replays more than one chunk. Chunks are compressed npz files replaced atomically on flush().
+    """
+    def __init__(self, root=CHAIN_STORE_DIR, keyframe_interval=KEYFRAME_INTERVAL):
+        self.root = root
+        self.keyframe_interval = keyframe_interval
+        self.lock = threading.Lock()
+        self.state = {}  # symbol -> in-memory state of the open chunk
+
+    def _dir(self, symbol):
+        return os.path.join(self.root, symbol)
+
+    def _chunk_starts(self, symbol):
+        directory = self._dir(symbol)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(name[6:-4]) for name in os.listdir(directory)
+                      if name.startswith('chunk_') and name.endswith('.npz'))
+
+    def _chunk_path(self, symbol, start):
+        return os.path.join(self._dir(symbol), f"chunk_{start}.npz")
+
+    def _load_chunk(self, symbol, start):
+        with np.load(self._chunk_path(symbol, start)) as archive:
+            chunk = {key: archive[key] for key in archive.files}
+        chunk['contracts'] = json.loads(str(chunk['contracts']))
+        return chunk
+
+    @staticmethod
+    def _replay(chunk, upto, n_contracts):
+        """
+        Dense matrix of a chunk after its snapshot `upto` (0 is the keyframe).
+        """
+        dense = np.full((n_contracts, LISTED + 1), np.nan)
+        keyframe = chunk['keyframe']
+        dense[:len(keyframe)] = keyframe
+        selected = chunk['delta_snapshot'] <= upto
+        contracts, fields = chunk['delta_contract'][selected], chunk['delta_field'][selected]
+        values = chunk['delta_value'][selected]
+        # the latest change of each cell wins
+        cells = contracts.astype(np.int64) * (LISTED + 1) + fields
+        _, last = np.unique(cells[::-1], return_index=True)
+        last = len(cells) - 1 - last
+        dense[contracts[last], fields[last]] = values[last]
+        return dense
+
+    def _open_state(self, symbol):
+        state = self.state.get(symbol)
+        if state is not None:
+            return state
+        state = {
+            'contracts': [],
+            'index': {},
+            'current': np.full((0, LISTED + 1), np.nan),
+            'chunk': None,
+            'dirty': False,
+        }
+        starts = self._chunk_starts(symbol)
+        if starts:
+            # continue the last chunk where the previous run stopped
+            chunk = self._load_chunk(symbol, starts[-1])
+            state['contracts'] = chunk['contracts']
+            state['index'] = {c['id']: i for i, c in enumerate(chunk['contracts'])}
+            state['current'] = self._replay(chunk, len(chunk['times']) - 1, len(chunk['contracts']))
+            state['chunk'] = {
+                'start': starts[-1],
+                'times': chunk['times'].tolist(),
+                'contracts': chunk['contracts'],
+                'keyframe': chunk['keyframe'],
+                'deltas': [(chunk['delta_snapshot'], chunk['delta_contract'], chunk['delta_field'], chunk['delta_value'])],
+            }
+        self.state[symbol] = state
+        return state
+
+    def _dense(self, symbol, state, option_chain_data):
+        """
+        Dense matrix of a chain, registering contracts seen for the first time.
+        """
+        rows, values = [], []
+        for chain in option_chain_data:
+            expiry = chain.get('expirationDate')
+            for side in ('CALL', 'PUT'):
+                for contract in (chain.get('options') or {}).get(side) or []:
+                    strike = contract.get('strike')
+                    if strike is None:
+                        continue
+                    cid = contract_id(symbol, expiry, side, strike, contract)
+                    index = state['index'].get(cid)
+                    if index is None:
+                        index = len(state['contracts'])
+                        state['index'][cid] = index
+                        state['contracts'].append({'id': cid, 'expiry': expiry, 'side': side, 'strike': strike})
+                    rows.append(index)
+                    values.append([contract.get(field) for field in FIELDS] + [1.0])
+        dense = np.full((len(state['contracts']), LISTED + 1), np.nan)
+        if rows:
+            dense[np.array(rows)] = np.array(values, dtype=np.float64)
+        return dense
+
+    def append(self, symbol, option_chain_data, timestamp=None):
+        """
+        Add a snapshot of a symbol's chain. Call flush() to write it.
+
+        A snapshot in the same second as the last one replaces it, e.g. when a command refetches a chain
+        the sweep just recorded.
+
+        Parameters:
+        - symbol (str): Stock ticker symbol.
+        - option_chain_data (list): Option chains as returned by FinnhubEngine.get_option_chain.
+        - timestamp (int, optional): Epoch seconds of the snapshot, now by default.
+
+        Returns:
+        - int: Number of cells stored (the whole keyframe for a new chunk, else the changed cells).
+        """
+        timestamp = int(timestamp if timestamp is not None else time.time())
+        with self.lock:
+            state = self._open_state(symbol)
+            chunk = state['chunk']
+            replace = chunk is not None and timestamp == chunk['times'][-1]
+            if chunk is not None and timestamp < chunk['times'][-1]:
+                raise ValueError(f"Snapshot at {timestamp} is before the last one of {symbol}.")
+            dense = self._dense(symbol, state, option_chain_data)
+
+            if chunk is None or (replace and len(chunk['times']) == 1) or \
+                    (not replace and len(chunk['times']) >= self.keyframe_interval):
+                if chunk is not None and not replace:
+                    self._write_chunk(symbol, state)
+                # the new chunk's contract table only keeps the contracts listed in its keyframe
+                listed = dense[:, LISTED] == 1
+                state['contracts'] = [c for c, keep in zip(state['contracts'], listed) if keep]
+                state['index'] = {c['id']: i for i, c in enumerate(state['contracts'])}
+                dense = dense[listed]
+                state['chunk'] = {'start': timestamp, 'times': [timestamp], 'contracts': state['contracts'],
+                                  'keyframe': dense, 'deltas': []}
+                stored = int(np.isfinite(dense).sum())
+            else:
+                if replace:
+                    # drop the changes of the replaced snapshot and diff against the one before it
+                    arrays = self._chunk_arrays(chunk)
+                    last = len(chunk['times']) - 1
+                    previous = self._replay(arrays, last - 1, len(dense))
+                    keep = arrays['delta_snapshot'] < last
+                    chunk['deltas'] = [tuple(a[keep] for a in chunk['deltas'][0])]
+                    chunk['times'].pop()
+                else:
+                    previous = np.full_like(dense, np.nan)
+                    previous[:len(state['current'])] = state['current']
+                contracts, fields = np.nonzero(~_same(dense, previous))
+                chunk['deltas'].append((np.full(len(contracts), len(chunk['times']), dtype=np.int32),
+                                        contracts.astype(np.int32), fields.astype(np.int8), dense[contracts, fields]))
+                chunk['times'].append(timestamp)
+                stored = len(contracts)
+            state['current'] = dense
+            state['dirty'] = True
+            return stored
+
+    @staticmethod
+    def _chunk_arrays(chunk):
+        """
+        Columnar arrays of an in-memory chunk; its delta batches are merged into one.
+        """
+        deltas = chunk['deltas'] or [(np.zeros(0, np.int32), np.zeros(0, np.int32), np.zeros(0, np.int8), np.zeros(0))]
+        arrays = {
+            'times': np.array(chunk['times'], dtype=np.int64),
+            'contracts': chunk['contracts'],
+            'keyframe': chunk['keyframe'],
+            'delta_snapshot': np.concatenate([d[0] for d in deltas]),
+            'delta_contract': np.concatenate([d[1] for d in deltas]),
+            'delta_field': np.concatenate([d[2] for d in deltas]),
+            'delta_value': np.concatenate([d[3] for d in deltas]),
+        }
+        chunk['deltas'] = [(arrays['delta_snapshot'], arrays['delta_contract'], arrays['delta_field'], arrays['delta_value'])]
+        return arrays
+
+    def _write_chunk(self, symbol, state):
+        chunk = state['chunk']
+        os.makedirs(self._dir(symbol), exist_ok=True)
+        arrays = self._chunk_arrays(chunk)
+        arrays['contracts'] = np.array(json.dumps(chunk['contracts']))
+        path = self._chunk_path(symbol, chunk['start'])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def flush(self, symbol=None):
+        """
+        Write the open chunk of one symbol (or of every symbol with new snapshots).
+
+        Returns:
+        - int: Number of symbols written.
+        """
+        with self.lock:
+            symbols = [symbol] if symbol else list(self.state)
+            written = 0
+            for sym in symbols:
+                state = self.state.get(sym)
+                if state and state['dirty'] and state['chunk'] is not None:
+                    self._write_chunk(sym, state)
+                    state['dirty'] = False
+                    written += 1
+            return written
+
+    def _chunk(self, symbol, start):
+        state = self.state.get(symbol)
+        if state and state['chunk'] is not None and state['chunk']['start'] == start:
+            chunk = self._chunk_arrays(state['chunk'])
+            chunk['contracts'] = list(chunk['contracts'])  # the open chunk keeps growing
+            return chunk
+        return self._load_chunk(symbol, start)
+
+    def _starts(self, symbol):
+        state = self.state.get(symbol)
+        starts = set(self._chunk_starts(symbol))
+        if state and state['chunk'] is not None:
+            starts.add(state['chunk']['start'])
+        return sorted(starts)
+
+    def chain_at(self, symbol, timestamp):
+        """
+        Reconstruct the chain of the last snapshot at or before `timestamp`.
+
+        Returns:
+        - pd.DataFrame or None: One row per listed contract with 'id', 'expiry', 'side', 'strike' and
+          FIELDS, plus the snapshot time in df.attrs['time']. None before the first snapshot.
+        """
+        with self.lock:
+            starts = self._starts(symbol)
+            i = np.searchsorted(starts, timestamp, side='right') - 1
+            if i < 0:
+                return None
+            chunk = self._chunk(symbol, starts[i])
+        contracts = chunk['contracts']
+        j = int(np.searchsorted(chunk['times'], timestamp, side='right') - 1)
+        dense = self._replay(chunk, j, len(contracts))
+        listed = np.flatnonzero(dense[:, LISTED] == 1)
+        df = pd.DataFrame([contracts[k] for k in listed])
+        for f, field in enumerate(FIELDS):
+            df[field] = dense[listed, f]
+        df.attrs['time'] = int(chunk['times'][j])
+        return df
+
+    def contract_series(self, symbol, contract, start=None, end=None):
+        """
+        Time series of one contract's fields over every snapshot in [start, end].
+
+        Parameters:
+        - contract (str): Contract ID (see contract_id).
+        - start, end (int, optional): Epoch seconds bounds.
+
+        Returns:
+        - pd.DataFrame: FIELDS indexed by snapshot time (UTC); NaN where the contract was not listed.
+          Chunks whose contract table lacks the contract are skipped; KeyError if none has it.
+        """
+        with self.lock:
+            starts = self._starts(symbol)
+            # chunks overlapping [start, end]
+            first = max(int(np.searchsorted(starts, start, side='right')) - 1, 0) if start is not None else 0
+            last = int(np.searchsorted(starts, end, side='right')) if end is not None else len(starts)
+            chunks = [self._chunk(symbol, s) for s in starts[first:last]]
+
+        frames = []
+        for chunk in chunks:
+            index = next((i for i, c in enumerate(chunk['contracts']) if c['id'] == contract), None)
+            if index is None:
+                continue
+            n = len(chunk['times'])
+            values = np.full((n, LISTED + 1), np.nan)
+            changed = np.zeros((n, LISTED + 1), dtype=bool)
+            if index < len(chunk['keyframe']):
+                values[0] = chunk['keyframe'][index]
+            changed[0] = True
+            mine = chunk['delta_contract'] == index
+            values[chunk['delta_snapshot'][mine], chunk['delta_field'][mine]] = chunk['delta_value'][mine]
+            changed[chunk['delta_snapshot'][mine], chunk['delta_field'][mine]] = True
+            # carry every field forward from the snapshot of its last change
+            last_change = np.maximum.accumulate(np.where(changed, np.arange(n)[:, None], 0), axis=0)
+            values = np.take_along_axis(values, last_change, axis=0)
+            values[values[:, LISTED] != 1, :LISTED] = np.nan
+            frames.append(pd.DataFrame(values[:, :LISTED], columns=FIELDS,
+                                       index=pd.to_datetime(chunk['times'], unit='s', utc=True)))
+        if not frames:
+            raise KeyError(f"Unknown contract {contract} for {symbol} in the requested range.")
+        series = pd.concat(frames)
+        lo = pd.Timestamp(start, unit='s', tz='UTC') if start is not None else series.index.min()
+        hi = pd.Timestamp(end, unit='s', tz='UTC') if end is not None else series.index.max()
+        return series[(series.index >= lo) & (series.index <= hi)]
+
+
+if __name__ == "__main__":
+    # Size and round-trip check on a synthetic trading day: python chain_store.py
+    import shutil
+    import tempfile
+
+    rng = np.random.default_rng(9)
+    expiries = [f"2025-0{m}-17" for m in range(1, 9)]
+    strikes = np.arange(100.0, 300.0, 2.5)
+    n = len(expiries) * 2 * len(strikes)
+    state = np.column_stack([rng.integers(0, 500, n), rng.integers(0, 20000, n), rng.uniform(20, 80, n),
+                             rng.uniform(1, 20, n), np.zeros(n), np.zeros(n)]).astype(np.float64)
+
+    def make_chain(values, first=0):
+        chains, k = [], first * 2 * len(strikes)
+        for expiry in expiries[first:]:
+            options = {}
+            for side in ('CALL', 'PUT'):
+                options[side] = []
+                for strike in strikes:
+                    v = values[k]
+                    options[side].append({'strike': strike, 'volume': v[0], 'openInterest': v[1],
+                                          'impliedVolatility': round(v[2], 2), 'bid': round(v[3], 2),
+                                          'ask': round(v[3] + 0.05, 2), 'lastPrice': round(v[3] + 0.02, 2)})
+                    k += 1
+            chains.append({'expirationDate': expiry, 'options': options})
+        return chains
+
+    root = tempfile.mkdtemp()
+    try:
+        store = ChainSnapshotStore(root)
+        snapshots, json_bytes = [], 0
+        t0 = 1_736_000_000
+        for step in range(78):  # every 5 minutes over a session
+            active = rng.random(n) < 0.15  # a few contracts trade between polls
+            state[active, 0] += rng.integers(1, 50, active.sum())
+            state[active, 2] += rng.normal(0, 0.5, active.sum())
+            state[active, 3] = np.maximum(state[active, 3] + rng.normal(0, 0.1, active.sum()), 0.01)
+            chain = make_chain(state, first=int(step >= KEYFRAME_INTERVAL))  # the first expiry expires with the 2nd chunk
+            json_bytes += len(json.dumps(chain))
+            store.append('TEST', chain, t0 + 300 * step)
+            snapshots.append(chain)
+        # a refetch in the same second replaces the last snapshot
+        state[:, 0] += 1
+        snapshots[-1] = make_chain(state, first=1)
+        store.append('TEST', snapshots[-1], t0 + 300 * 77)
+        store.flush()
+        stored_bytes = sum(os.path.getsize(os.path.join(root, 'TEST', f)) for f in os.listdir(os.path.join(root, 'TEST')))
+        print(f"{len(snapshots)} snapshots of {n} contracts: JSON {json_bytes / 1e6:.1f} MB, store {stored_bytes / 1e3:.0f} kB "
+              f"({json_bytes / stored_bytes:.0f}x)")
+
+        reopened = ChainSnapshotStore(root)
+        start = time.perf_counter()
+        df = reopened.chain_at('TEST', t0 + 300 * 60 + 10)
+        elapsed = time.perf_counter() - start
+        expected = [c for chain in snapshots[60] for side in ('CALL', 'PUT') for c in chain['options'][side]]
+        ok = np.allclose(df[FIELDS].to_numpy(), np.array([[c[f] for f in FIELDS] for c in expected], dtype=np.float64))
+        print(f"chain at a timestamp in {elapsed * 1000:.1f} ms, matches the snapshot: {ok}")
+        last = reopened.chain_at('TEST', t0 + 300 * 77)
+        print(f"same-second snapshot replaced: {bool((last['volume'].to_numpy() == state[2 * len(strikes):, 0]).all())}, "
+              f"contract table of the last chunk: {len(reopened._chunk('TEST', t0 + 300 * KEYFRAME_INTERVAL)['contracts'])} "
+              f"of {n} contracts (expired expiry pruned)")
+
+        cid = df['id'].iloc[100]
+        start = time.perf_counter()
+        series = reopened.contract_series('TEST', cid)
+        elapsed = time.perf_counter() - start
+        expected = np.array([[c[f] for f in FIELDS] for c in
+                             ({contract_id('TEST', chain['expirationDate'], side, c['strike'], c): c
+                               for chain in snap for side in ('CALL', 'PUT') for c in chain['options'][side]}[cid]
+                              for snap in snapshots)], dtype=np.float64)
+        print(f"series of {len(series)} snapshots in {elapsed * 1000:.1f} ms, matches: {np.allclose(series.to_numpy(), expected)}")
+    finally:
+        shutil.rmtree(root)
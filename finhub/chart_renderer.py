@@ -0,0 +1,139 @@
+# chart_renderer.py
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from telemetry import REGISTRY
+
+CHART_CACHE_DIR = 'figures/cache'
+CHART_CACHE_MAX_FILES = 500  # least recently used PNGs beyond this count are deleted
+CHART_CACHE_MAX_AGE = 24 * 3600  # seconds since last use after which a PNG is deleted
+RENDER_WORKERS = 2
+
+CHART_CACHE_REQUESTS = REGISTRY.counter('chart_cache_requests_total', 'Chart requests served from the cache (hit) or rendered (miss).', ('result',))
+RENDER_SECONDS = REGISTRY.histogram('chart_render_seconds', 'Time to render a chart in the process pool.', ('kind',))
+
+# Resolution presets: Discord previews are small, so the default trades pixels for render time and upload size
+RESOLUTION_PRESETS = {
+    'discord': {'dpi': 100, 'width': 10},
+    'standard': {'dpi': 150, 'width': 12},
+    'print': {'dpi': 300, 'width': 12},
+}
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render_option_chain(symbol, option_chain_data, output_path, dpi, width):
+    # runs in a worker process, which keeps its figure templates between renders
+    from put_call_ratio import plot_option_chain
+    tmp_path = f"{output_path}.{os.getpid()}.tmp.png"
+    plot_option_chain(symbol, option_chain_data, tmp_path, dpi=dpi, width=width)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class ChartRenderer:
+    """
+    Renders matplotlib charts in a small process pool so the bot's event loop is never blocked.
+
+    PNGs are cached on disk under a hash of the input data and plot parameters, so the same data is
+    rendered once while fresh data always produces a new image. Concurrent requests for the same
+    chart share a single render. Since fresh data never hits old entries, the cache is evicted after
+    every render: PNGs unused for `max_age` seconds go first, then the least recently used ones
+    beyond `max_files`.
+    """
+    def __init__(self, cache_dir=CHART_CACHE_DIR, max_workers=RENDER_WORKERS, max_files=CHART_CACHE_MAX_FILES,
+                 max_age=CHART_CACHE_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self.max_age = max_age
+        os.makedirs(cache_dir, exist_ok=True)
+        self.evict()
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker)
+        self.inflight = {}  # cache key -> future of the render
+
+    @staticmethod
+    def cache_key(kind, symbol, data, params):
+        """
+        Hash the chart kind, symbol, input data and plot parameters into a cache key.
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps([kind, symbol, params], sort_keys=True).encode())
+        digest.update(json.dumps(data, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    async def render_option_chain(self, symbol, option_chain_data, preset='discord'):
+        """
+        Render the option volume chart of `plot_option_chain` and return the PNG path.
+
+        Parameters:
+        - symbol (str): Stock ticker symbol.
+        - option_chain_data (list): Option chains to plot.
+        - preset (str): Key of RESOLUTION_PRESETS.
+
+        Returns:
+        - str: Path of the cached PNG.
+        """
+        params = RESOLUTION_PRESETS[preset]
+        key = self.cache_key('option_chain', symbol, option_chain_data, params)
+        output_path = os.path.join(self.cache_dir, f"{symbol}_{key[:24]}.png")
+        if os.path.exists(output_path):
+            CHART_CACHE_REQUESTS.inc(result='hit')
+            try:
+                os.utime(output_path)  # the modification time is the last use for eviction
+            except FileNotFoundError:  # evicted in the meantime
+                pass
+            else:
+                return output_path
+        if key in self.inflight:
+            CHART_CACHE_REQUESTS.inc(result='hit')
+            return await asyncio.shield(self.inflight[key])
+
+        CHART_CACHE_REQUESTS.inc(result='miss')
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, _render_option_chain, symbol, option_chain_data,
+                                      output_path, params['dpi'], params['width'])
+        self.inflight[key] = future
+        try:
+            with RENDER_SECONDS.time(kind='option_chain'):
+                path = await asyncio.shield(future)
+        finally:
+            self.inflight.pop(key, None)
+        await asyncio.to_thread(self.evict)
+        return path
+
+    def evict(self, now=None):
+        """
+        Delete the cached PNGs unused for more than `max_age` seconds, then the least recently used
+        ones beyond `max_files`.
+
+        Returns:
+        - int: Number of files deleted.
+        """
+        now = time.time() if now is None else now
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                # skip renders still being written by a worker
+                if entry.is_file() and entry.name.endswith('.png') and not entry.name.endswith('.tmp.png'):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except FileNotFoundError:
+                        pass
+        entries.sort(reverse=True)
+        stale = [path for i, (mtime, path) in enumerate(entries) if i >= self.max_files or now - mtime > self.max_age]
+        for path in stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(stale)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,159 @@
+# detector_snapshot.py
+
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_FILE = 'detector_snapshot.npz'
+SNAPSHOT_VERSION = 1
+BAR_COLUMNS = ['o', 'h', 'l', 'c', 'v']
+META_KEY = '__meta__'
+
+
+def _key(symbol, timeframe, part):
+    return f"{symbol}|{timeframe}|{part}"
+
+
+def bars_to_arrays(df, timeframe):
+    """
+    Convert bars to (epoch seconds, float64 OHLCV matrix).
+
+    Parameters:
+    - df (pd.DataFrame): 30-minute bars indexed by 't_et', or daily bars with a 't' column.
+    - timeframe (str): '30min' or 'D'.
+    """
+    times = df.index if timeframe == '30min' else pd.DatetimeIndex(df['t'])
+    seconds = times.tz_convert('UTC').tz_localize(None).to_numpy().astype('datetime64[s]').astype(np.int64)
+    return seconds, df[BAR_COLUMNS].to_numpy(dtype=np.float64)
+
+
+def arrays_to_bars(times, ohlcv, timeframe):
+    """
+    Inverse of bars_to_arrays, rebuilding the layout returned by FinnhubEngine.get_historical_prices.
+    """
+    times = pd.DatetimeIndex(pd.to_datetime(times, unit='s', utc=True))
+    if timeframe == '30min':
+        return pd.DataFrame(ohlcv, columns=BAR_COLUMNS, index=times.tz_convert('US/Eastern').rename('t_et'))
+    df = pd.DataFrame(ohlcv, columns=BAR_COLUMNS)
+    df.insert(0, 't', times)
+    return df
+
+
+class DetectorSnapshotStore:
+    """
+    Compressed npz snapshot of the bars and last signal of every detector, so a restarted bot only
+    fetches the bars closed since the snapshot instead of the whole lookback window.
+
+    Each symbol and timeframe is stored as its own pair of arrays; npz members are only decompressed
+    when read, so detectors load their state lazily on first use. Indicators are not stored: they are
+    recomputed from the bars in milliseconds, which also keeps them consistent with the validated bars.
+    """
+    def __init__(self, path=SNAPSHOT_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.archive = None
+        self.meta = None
+
+    def _open(self):
+        if self.meta is None:
+            self.meta = {'version': SNAPSHOT_VERSION, 'saved_at': None, 'symbols': {}}
+            if os.path.exists(self.path):
+                try:
+                    archive = np.load(self.path)
+                    meta = json.loads(archive[META_KEY].tobytes().decode())
+                    if meta.get('version') == SNAPSHOT_VERSION:
+                        self.archive, self.meta = archive, meta
+                    else:
+                        archive.close()
+                        print(f"Ignoring snapshot {self.path} of version {meta.get('version')}.")
+                except Exception as e:
+                    print(f"Failed to open snapshot {self.path}: {e}")
+        return self.archive
+
+    def saved_at(self):
+        """
+        Return the epoch time of the snapshot, or None if there is none.
+        """
+        with self.lock:
+            self._open()
+            return self.meta['saved_at']
+
+    def last_signals(self):
+        """
+        Return a dict symbol -> last signal status stored in the snapshot.
+        """
+        with self.lock:
+            self._open()
+            return {symbol: info['signal'] for symbol, info in self.meta['symbols'].items() if info.get('signal')}
+
+    def load(self, symbol):
+        """
+        Load the state of one symbol.
+
+        Returns:
+        - dict or None: '30min' and 'D' bars (only those present) and 'signal', or None if the
+          symbol is not in the snapshot.
+        """
+        with self.lock:
+            archive = self._open()
+            info = self.meta['symbols'].get(symbol)
+            if archive is None or info is None:
+                return None
+            state = {'signal': info.get('signal')}
+            for timeframe in info['timeframes']:
+                state[timeframe] = arrays_to_bars(archive[_key(symbol, timeframe, 't')],
+                                                  archive[_key(symbol, timeframe, 'ohlcv')], timeframe)
+            return state
+
+    def save(self, detectors):
+        """
+        Write the state of every detector to the snapshot. Symbols whose detector has not loaded its
+        state yet keep their previous snapshot. The file is replaced atomically.
+
+        Parameters:
+        - detectors (dict): Stock symbol -> BuySignalDetector.
+
+        Returns:
+        - int: Number of symbols in the snapshot.
+        """
+        with self.lock:
+            archive = self._open()
+            arrays, symbols = {}, {}
+            for symbol, detector in detectors.items():
+                frames = {'30min': detector.halfhour_data, 'D': detector.day_data}
+                frames = {tf: df for tf, df in frames.items() if df is not None and not df.empty}
+                if not frames and archive is not None and symbol in self.meta['symbols']:
+                    # not loaded since the restart: carry the stored arrays over
+                    info = self.meta['symbols'][symbol]
+                    for timeframe in info['timeframes']:
+                        for part in ('t', 'ohlcv'):
+                            arrays[_key(symbol, timeframe, part)] = archive[_key(symbol, timeframe, part)]
+                    symbols[symbol] = info
+                    continue
+                for timeframe, df in frames.items():
+                    times, ohlcv = bars_to_arrays(df, timeframe)
+                    arrays[_key(symbol, timeframe, 't')] = times
+                    arrays[_key(symbol, timeframe, 'ohlcv')] = ohlcv
+                if frames or detector.last_signal:
+                    symbols[symbol] = {'timeframes': list(frames), 'signal': detector.last_signal}
+
+            meta = {'version': SNAPSHOT_VERSION, 'saved_at': time.time(), 'symbols': symbols}
+            arrays[META_KEY] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            if archive is not None:
+                archive.close()
+            os.replace(tmp_path, self.path)
+            self.archive, self.meta = np.load(self.path), meta
+            return len(symbols)
+
+    def close(self):
+        with self.lock:
+            if self.archive is not None:
+                self.archive.close()
+            self.archive = None
+            self.meta = None
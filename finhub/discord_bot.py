@@ -3,20 +3,45 @@ import pandas as pd
 import numpy as np
 from engine import FinnhubEngine
 import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import discord
 from discord.ext import commands, tasks
 import asyncio
 from dotenv import load_dotenv
-from put_call_ratio import analyze_option_chain  # import the new plotting function
+from chart_renderer import ChartRenderer, RESOLUTION_PRESETS
+from option_flow import option_flow_metrics
+from chain_store import ChainSnapshotStore, CHAIN_STORE_DIR
+from unusual_activity import UnusualActivityScanner, format_hit
+from gamma_exposure import gamma_exposure, chain_gamma_exposure
 from buy_signal_bot import BuySignalDetector
+from watchlist import stocks
+from scan_scheduler import ScanScheduler
+from shard import ShardBroker, ShardCoordinator
+from market_schedule import MarketSessionClock
+from bar_aggregator import TickBarAggregator
+from trader import stream_trades
+from alert_store import AlertStateStore
+from detector_snapshot import DetectorSnapshotStore, SNAPSHOT_FILE
+from alert_batcher import AlertBatcher
+from telemetry import REGISTRY, METRICS_HOST, METRICS_PORT
 import os
-import json
+import threading
 
 # API Key
 load_dotenv()
 # Discord Bot Token
 DISCORD_BOT_TOKEN = os.getenv("DISCORD_TOKEN") # Ensure this is kept secure
+# Build 30-minute bars from the Finnhub trade WebSocket instead of polling REST candles
+STREAM_TRADES = os.getenv("STREAM_TRADES", "0") == "1"
+# Broker database of the scanning workers (see shard.py); when set, this process only merges their results
+SHARD_BROKER = os.getenv("SHARD_BROKER")
+# Bars and last signals of every detector, saved after each scan so a restart only fetches the gap
+DETECTOR_SNAPSHOT = os.getenv("DETECTOR_SNAPSHOT", SNAPSHOT_FILE)
+# Intraday history of every option chain the bot fetches, stored as deltas (see chain_store.py)
+CHAIN_STORE = os.getenv("CHAIN_STORE", CHAIN_STORE_DIR)
+# Sweep the option chains of the whole watchlist for unusual activity after each scan (see unusual_activity.py);
+# off with SHARD_BROKER, where a single-key sweep of the whole watchlist would undo the sharding
+UNUSUAL_ACTIVITY = os.getenv("UNUSUAL_ACTIVITY", "1") == "1" and not SHARD_BROKER
 
 # Initialize the Discord bot
 intents = discord.Intents.default()
@@ -31,34 +56,6 @@ detector = BuySignalDetector(symbol, engine)
 
 
 
-# initialize signal detector for different stocks
-stocks = {
-    "semi_conductor": ["AMD", "SMTC", "SOXX", "ARM", "AMAT", "LRCX", "QCOM", "INTC", "TSM", "ASML", "ALAB", "AVGO", "MU", "AAOI", "SMCI"],
-    "crypto": ["BTDR", "COIN", "RIOT", "CLSK", "MSTR", "MARA"],
-    "big_tech":["NFLX", "NVDA", "ORCL", "TSLL", "TSLA", "MSFT", "AMZN", "META", "AAPL", "GOOG", "DELL", "IBM"],
-    "saas": ["CRM", "MDB", "ZM", "SNOW", "NOW", "WDAY", "SHOP", "CRWD", "DDOG", "TWLO", "SAP", "UBER", "APP", "DOCU", "ANET"],
-    "ai_software": ["AFRM",  "ADBE", "PANW", "PLTR", "CRDO", "INTA", "CLS"],
-    "social": ['SNAP', 'RDDT', "PINS", "RBLX", "DIS", "LYV"],
-    'robo': ["SERV", "ISRG", "TER"],
-    "spy_qqq_iwm": ["IWM", "SPY", "QQQ"],
-    "finance": ["DPST", "GS", "V", "WFC", "PYPL", "MS", "JPM", "BAC", "MA", "AXP", "UPST", "SOFI"],
-    "bio_med": ["WBA", "JNJ", "UNH", "LLY", "MRNA", "PFE", "AMGN", "WAY",  "HIMS"],
-    "vol": ["UVXY"],
-    "tlt_tmf": ["TLT", "TMF"],
-    "defense": ["LMT", "NOC", "RTX", "GD"],
-    "nuclear": ['OKLO', 'SMR', 'LTBR', 'NEE', 'NNE'],
-    "energy": ["CAT", "CEG", "LNG", "GEV", "VRT", "VST", "FSLR", "KOLD", "XOM", "OXY", "GE"],
-    "space": ["DXYZ", "RKLB", "ASTS", "LUNR"],
-    "small_ai": ["SOUN", "AI", "BBAI", "TEM", "CFLT"],
-    "short_eft": ['SOXS', 'SQQQ'],
-    "food": ["MCD", "WEN", "SBUX", "DPZ", "WING", "KO", "PEP", "COST", "WMT"],
-    "drone": ["AVAV", "BA", "LMT", "NOC", "RCAT", "ACHR", "PDYN"],
-    "sports": ["NKE", "UAA", "DKNG", "LULU", "ADDYY"],
-    "fashion": ['EL', 'LVMUY', 'LRLCY', 'ELF', "TPR", "RL"],
-    "travel": ["AAL", "ABNB", "RCL", "CCL", "TCOM", "EXPE", "DAL", "UAL", "LUV"],
-    "auto_drive": ["RIVN", "TSLA", "UBER", "LYFT"],
-    "CN": ["BABA", "TCEHY", "JD", "BIDU", "NTES", "PDD", "BILI", "JD", "FXI", "YINN", "YANG"]
-}
 # compute the number of stocks monitored
 print("Number of stocks monitored: ", sum([len(stock_list) for stock_list in stocks.values()]))
 # testing purpose
@@ -97,150 +94,256 @@ channel2id = {
 
 id2channel = {v: k for k, v in channel2id.items()}
 
+snapshot_store = DetectorSnapshotStore(DETECTOR_SNAPSHOT)
 detector_dict = {}
 for _, stock_list in stocks.items():
     for stock in stock_list:
-        detector = BuySignalDetector(stock, engine)
+        detector = BuySignalDetector(stock, engine, snapshot_store=snapshot_store)
         detector_dict[stock] = detector
 
 
+def on_live_bar(stock_symbol, timeframe, bar):
+    # detectors resample higher timeframes from the 30-minute bars themselves
+    if timeframe == '30min' and stock_symbol in detector_dict:
+        detector_dict[stock_symbol].append_bar(bar)
+
+
+bar_aggregator = TickBarAggregator(on_live_bar)
+trade_stream = None
+metrics_server = None
+
 
 @bot.event
 async def on_ready():
+    global trade_stream, alert_writer, metrics_server
     print(f'Logged in as {bot.user} (ID: {bot.user.id})')
     print('------')
+    if metrics_server is None:
+        metrics_server = REGISTRY.serve()
+    if STREAM_TRADES and trade_stream is None:
+        trade_stream = threading.Thread(target=stream_trades, args=(list(detector_dict), bar_aggregator), daemon=True)
+        trade_stream.start()
+        print("Started trade stream for live bars.")
+    if alert_writer is None:
+        alert_writer = asyncio.create_task(alert_store.run_writer())
+    if not flush_chain_store_loop.is_running():
+        flush_chain_store_loop.start()
     if not send_buy_signal_message.is_running():
         send_buy_signal_message.start()
-        print("Started background task to send buy signals every hour.")
-
-
-# Initialize a dictionary to track the last sent time for each stock
-last_sent_times_file = 'last_sent_times.json'
-
-# Load existing tracking data if available
-if os.path.exists(last_sent_times_file):
-    with open(last_sent_times_file, 'r') as f:
-        last_sent_data = json.load(f)
-    # Convert string timestamps back to datetime objects
-    last_sent_data = {
-        k: {
-            "last_sent_time": datetime.fromisoformat(v["last_sent_time"]),
-            "last_signal_status": v["last_signal_status"]
-        } for k, v in last_sent_data.items()
-    }
+        print("Started background task to send buy signals after each bar close.")
+
+
+# Track the last alert sent for each stock, with the full alert history on disk
+alert_store = AlertStateStore()
+alert_writer = None
+
+
+def should_send_alert(stock_symbol, signal_status, now):
+    """
+    Decide whether a triggered signal status should be sent, based on the last alert of the stock.
+    """
+    last_sent_info = alert_store.get(stock_symbol)
+    if not last_sent_info:
+        # No previous record, send message
+        print(f"No previous message sent for {stock_symbol}. Preparing to send message.")
+        return True
+
+    last_sent_time = last_sent_info["last_sent_time"]
+    last_signal_status = last_sent_info["last_signal_status"]
+
+    # Check if signal status has changed
+    if (signal_status != last_signal_status) and (sum(signal_status.values()) > sum(last_signal_status.values())):
+        print(f"Signal status changed for {stock_symbol}. Preparing to send message.")
+        return True
+    # Check if a message was sent within the last 24 hours
+    if (now - last_sent_time) > timedelta(days=0.5):
+        print(f"24 hours passed since last message for {stock_symbol}. Preparing to send message.")
+        return True
+    print(f"Message for {stock_symbol} was sent less than a day ago and no signal change. Skipping.")
+    return False
+
+
+async def dispatch_buy_signal(stock_symbol, signal_status, channels):
+    """
+    Queue the signal of one stock for every channel subscribed to it, delivered at the end of the cycle.
+    """
+    if not any(signal_status.values()):
+        return
+    now = datetime.utcnow()
+    if not should_send_alert(stock_symbol, signal_status, now):
+        return
+
+    for chan in channels:
+        alert_batcher.add(chan, stock_symbol, signal_status)
+    queued_alerts[stock_symbol] = (now, signal_status)
+
+
+if SHARD_BROKER:
+    scheduler = ShardCoordinator(ShardBroker(SHARD_BROKER), stocks)
+    print("Sharded scanning: unusual activity sweeps are off.")
 else:
-    last_sent_data = {}
+    scheduler = ScanScheduler(detector_dict, stocks)
+    # prioritize the first cycle after a restart with the signals of the snapshot
+    scheduler.last_status.update(snapshot_store.last_signals())
+alert_batcher = AlertBatcher()
+queued_alerts = {}  # stock symbol -> (decision time, signal status) of the alerts queued this cycle
+chart_renderer = ChartRenderer()
+chain_store = ChainSnapshotStore(CHAIN_STORE)
+market_clock = MarketSessionClock()
+unusual_scanner = UnusualActivityScanner(engine, stocks)
+unusual_sweep = None
+watchlist_gex = None  # gamma_exposure of the whole watchlist, refreshed with every unusual activity sweep
+
+
+def monitored_channels():
+    # Only consider specific channels
+    sector_channels = {}
+    for chan in bot.get_all_channels():
+        if chan.id in id2channel:
+            sector_channels.setdefault(id2channel[chan.id], []).append(chan)
+        else:
+            print(f"Channel {chan.id} is not in the monitored list.")
+    return sector_channels
+
+
+async def run_buy_signal_scan():
+    sector_channels = monitored_channels()
+    bar_close = market_clock.previous_bar_close(datetime.now(timezone.utc))
 
-# Function to save tracking data to a file
-def save_last_sent_data():
-    with open(last_sent_times_file, 'w') as f:
-        # Convert datetime objects to ISO format strings for JSON serialization
-        json.dump({
-            k: {
-                "last_sent_time": v["last_sent_time"].isoformat(),
-                "last_signal_status": v["last_signal_status"]
-            } for k, v in last_sent_data.items()
-        }, f, indent=4)
+    try:
+        await scheduler.run_cycle(sector_channels, dispatch_buy_signal)
+        if bar_close is not None:
+            alert_store.record_scan(bar_close)
+    except Exception as e:
+        print(f"Error occurred: {e}")
 
+    # Deliver the alerts of the cycle in as few messages as possible per channel
+    delivered = await alert_batcher.flush()
+    for stock_symbol, channel_ids in delivered.items():
+        now, signal_status = queued_alerts[stock_symbol]
+        # Update the last sent time and signal status for the stock, persisted by the writer task
+        alert_store.record(stock_symbol, now, signal_status, channel_ids)
+    queued_alerts.clear()
 
+    if not SHARD_BROKER:
+        try:
+            saved = await asyncio.to_thread(snapshot_store.save, detector_dict)
+            print(f"Saved detector snapshot of {saved} symbols.")
+        except Exception as e:
+            print(f"Failed to save detector snapshot: {e}")
 
 
-@tasks.loop(minutes=30)  # Run the detector every 1 hour
+@tasks.loop()  # paced by market_clock: one scan right after each bar close of an open session
 async def send_buy_signal_message():
+    scan_time = market_clock.next_scan_time(datetime.now(timezone.utc))
+    print(f"Next buy signal scan at {scan_time}.")
+    await discord.utils.sleep_until(scan_time)
+    await run_buy_signal_scan()
+    start_unusual_activity_sweep()
+
+
+@send_buy_signal_message.before_loop
+async def catch_up_buy_signal_scan():
     await bot.wait_until_ready()
-    channels = bot.get_all_channels()
+    # One catch-up scan if a bar closed since the last scan, i.e. while the bot was down
+    last_bar_close = market_clock.previous_bar_close(datetime.now(timezone.utc))
+    last_scanned_bar = alert_store.last_scanned_bar
+    if last_bar_close is not None and (last_scanned_bar is None or last_bar_close > last_scanned_bar):
+        print(f"Running catch-up scan for the bar closed at {last_bar_close}.")
+        await run_buy_signal_scan()
+
 
+async def run_unusual_activity_sweep():
     try:
+        hits = await unusual_scanner.sweep(on_chain=record_chain)
+    except Exception as e:
+        print(f"Unusual activity sweep failed: {e}")
+        return
+    await flush_chain_store()
+    await refresh_watchlist_gex()
+    routed = unusual_scanner.hits_by_sector(unusual_scanner.new_hits(hits))
+    for sector, channels in monitored_channels().items():
+        if sector not in routed:
+            continue
+        embed = discord.Embed(title="🔍 **Unusual Options Activity**", color=0x8A2BE2,
+                              description="\n".join(format_hit(row) for _, row in routed[sector].iterrows()))
+        embed.set_footer(text=f"Flow since the last sweep, its z-score and premium, volume vs OI, {datetime.now().strftime('%Y-%m-%d %H:%M')}")
         for chan in channels:
-            # Only consider specific channels
-            if chan.id in channel2id.values():
-                cur_sector = id2channel[chan.id]
-                print("Assessing buy signal for sector: ", cur_sector)
-                for stock_symbol in stocks[cur_sector]:
-                    print(f"Assessing buy signal for stock: {stock_symbol}")
-                    detector: BuySignalDetector = detector_dict[stock_symbol]
-                    # Assess buy signals for the current stock
-                    signal_status = await asyncio.to_thread(detector.multi_resolution_signal)
-                    # signal_status = detector.multi_resolution_signal()
-                    await asyncio.sleep(10)
-                    if any(signal_status.values()):
-                        now = datetime.utcnow()
-                        last_sent_info = last_sent_data.get(stock_symbol)
-
-                        send_message = False
-                        if last_sent_info:
-                            last_sent_time = last_sent_info["last_sent_time"]
-                            last_signal_status = last_sent_info["last_signal_status"]
-
-                            # Check if signal status has changed
-                            if (signal_status != last_signal_status) and (sum(signal_status.values() > sum(last_signal_status.values()))):
-                                send_message = True
-                                print(f"Signal status changed for {stock_symbol}. Preparing to send message.")
-                            else:
-                                # Check if a message was sent within the last 24 hours
-                                if (now - last_sent_time) > timedelta(days=0.5):
-                                    send_message = True
-                                    print(f"24 hours passed since last message for {stock_symbol}. Preparing to send message.")
-                                else:
-                                    print(f"Message for {stock_symbol} was sent less than a day ago and no signal change. Skipping.")
-                        else:
-                            # No previous record, send message
-                            send_message = True
-                            print(f"No previous message sent for {stock_symbol}. Preparing to send message.")
-                    
-                        if send_message:
-                            # Determine embed color based on signal strength
-                            color = 0x00FF00  # Green by default
-                            if signal_status.get('Good_buying_option'):
-                                color = 0xFFA500  # Orange for good buying options
-                            if sum(signal_status.values()) > 3:
-                                color = 0xFF0000  # Red for multiple signals
-
-                            # Create an Embed object
-                            embed = discord.Embed(
-                                title="📈 **Buy Signal Triggered!**",
-                                description=f"**{stock_symbol}** has triggered a buy signal.",
-                                color=color,
-                                timestamp=datetime.utcnow()
-                            )
-
-                            # Add a field for each timeframe's signal status
-                            for timeframe, triggered in signal_status.items():
-                                status = "✅ Yes" if triggered else "❌ No"
-                                embed.add_field(
-                                    name=timeframe,
-                                    value=status,
-                                    inline=True
-                                )
-
-                            # Add a footer for additional context
-                            embed.set_footer(text="Automated Alert", icon_url="https://i.imgur.com/rdm3D7P.png")
-
-                            try:
-                                await chan.send(embed=embed)
-                                print(f"Buy signal message sent to channel {chan.id} for stock {stock_symbol}!")
-                                msg_sent = True
-                                # Update the last sent time and signal status for the stock
-                                last_sent_data[stock_symbol] = {
-                                    "last_sent_time": now,
-                                    "last_signal_status": signal_status
-                                }
-                                save_last_sent_data()  # Persist the update
-                            except Exception as e:
-                                print(f"Failed to send message to channel {chan.id}: {e}")
-            else:
-                print(f"Channel {chan.id} is not in the monitored list.")
+            try:
+                await chan.send(embed=embed)
+            except Exception as e:
+                print(f"Failed to send unusual activity to channel {chan.id}: {e}")
+
+
+async def refresh_watchlist_gex():
+    # the detectors' latest 30-minute closes serve as spots, so the refresh costs no extra requests;
+    # the few symbols without bars get a quote. Skipped with SHARD_BROKER, where no detector has bars.
+    global watchlist_gex
+    flat = unusual_scanner.last_flat
+    if flat is None or SHARD_BROKER:
+        return
+    spots = {}
+    for stock_symbol in flat['symbols']:
+        detector = detector_dict.get(stock_symbol)
+        if detector is not None and detector.halfhour_data is not None and len(detector.halfhour_data):
+            spots[stock_symbol] = float(detector.halfhour_data['c'].iloc[-1])
+    semaphore = asyncio.Semaphore(unusual_scanner.concurrency)
+
+    async def fetch_spot(stock_symbol):
+        async with semaphore:
+            try:
+                spot = (await asyncio.to_thread(engine.get_stock_quote, stock_symbol)).get('c')
+            except Exception as e:
+                print(f"Failed to fetch the quote of {stock_symbol}: {e}")
+                return
+        if spot:
+            spots[stock_symbol] = float(spot)
+
+    await asyncio.gather(*(fetch_spot(s) for s in flat['symbols'] if s not in spots))
+    for stock_symbol in flat['symbols']:
+        if stock_symbol not in spots:
+            print(f"No spot for {stock_symbol}, left out of the watchlist gamma exposure.")
+    try:
+        watchlist_gex = await asyncio.to_thread(gamma_exposure, flat, spots)
+    except Exception as e:
+        print(f"Failed to compute the watchlist gamma exposure: {e}")
+
+
+def start_unusual_activity_sweep():
+    # runs in the background so a slow sweep never delays the next bar close scan
+    global unusual_sweep
+    if UNUSUAL_ACTIVITY and (unusual_sweep is None or unusual_sweep.done()):
+        unusual_sweep = asyncio.create_task(run_unusual_activity_sweep())
 
+
+def record_chain(symbol, option_chain_data):
+    # keep the fetched chain in the intraday history instead of throwing it away; written by flush_chain_store
+    try:
+        chain_store.append(symbol, option_chain_data)
     except Exception as e:
-        print(f"Error occurred: {e}")
+        print(f"Failed to store the option chain of {symbol}: {e}")
+
+
+async def flush_chain_store():
+    try:
+        written = await asyncio.to_thread(chain_store.flush)
+    except Exception as e:
+        print(f"Failed to write the option chain history: {e}")
+        return
+    if written:
+        print(f"Wrote the option chain history of {written} symbols.")
+
 
+@tasks.loop(minutes=5)  # chains recorded outside a sweep, e.g. by !gex, are written at most 5 minutes later
+async def flush_chain_store_loop():
+    await flush_chain_store()
 
 
 @bot.command()
-async def plot_options(ctx, symbol: str, expiration: str):
+async def plot_options(ctx, symbol: str, expiration: str, preset: str = 'discord'):
     """
     Discord command to generate the options plot for a given stock symbol and expiration date.
-    Usage: !plot_options NVDA 2025-02-15
+    Usage: !plot_options NVDA 2025-02-15 [discord|standard|print]
     """
     # Validate the expiration date format.
     try:
@@ -250,17 +353,151 @@ async def plot_options(ctx, symbol: str, expiration: str):
     except ValueError:
         await ctx.send("Expiration date must be in **YYYY-MM-DD** format. Please try again.")
         return
+    if preset not in RESOLUTION_PRESETS:
+        await ctx.send(f"Unknown preset {preset}. Choose one of: {', '.join(RESOLUTION_PRESETS)}.")
+        return
 
     await ctx.send(f"Generating options plot for {symbol} with expiration {dt}...")
-    output_file_name = f"{symbol}_{dt}.png"
-    
-    # Generate the plot if the file doesn't already exist.
-    if not os.path.exists(output_file_name):
-        analyze_option_chain(symbol, expiration, output_file_name)
     try:
+        option_chain_data = await asyncio.to_thread(engine.get_option_chain, symbol)
+        await asyncio.to_thread(record_chain, symbol, option_chain_data)
+        # plot the chains starting at the requested expiration
+        option_chain_data = [chain for chain in option_chain_data if chain.get('expirationDate', '') >= expiration]
+        if not option_chain_data:
+            await ctx.send(f"No option chains found for {symbol} from {expiration}.")
+            return
+        output_file_name = await chart_renderer.render_option_chain(symbol, option_chain_data, preset)
         await ctx.send(file=discord.File(output_file_name))
     except Exception as e:
         await ctx.send(f"Error sending the plot: {e}")
 
+@bot.command()
+async def flow(ctx, symbol: str, expirations: int = 5):
+    """
+    Discord command to show the option flow metrics of a symbol without rendering a chart.
+    Usage: !flow NVDA [number of expirations]
+    """
+    try:
+        option_chain_data = await asyncio.to_thread(engine.get_option_chain, symbol)
+        await asyncio.to_thread(record_chain, symbol, option_chain_data)
+        metrics = option_flow_metrics(option_chain_data)
+    except Exception as e:
+        await ctx.send(f"Error computing the option flow of {symbol}: {e}")
+        return
+    if metrics['expiries'].empty:
+        await ctx.send(f"No option chains found for {symbol}.")
+        return
+
+    aggregate = metrics['aggregate']
+    lines = [f"**{symbol} option flow** (all {len(metrics['expiries'])} expirations): "
+             f"P/C volume {aggregate['pc_volume_ratio']:.2f}, P/C OI {aggregate['pc_oi_ratio']:.2f}, "
+             f"max pain {aggregate['max_pain']:g}, call wall {aggregate['call_wall']:g}, put wall {aggregate['put_wall']:g}"]
+    for _, row in metrics['expiries'].head(expirations).iterrows():
+        lines.append(f"{row['expirationDate']}: P/C vol {row['pc_volume_ratio']:.2f}, P/C OI {row['pc_oi_ratio']:.2f}, "
+                     f"max pain {row['max_pain']:g}, walls {row['call_wall']:g}/{row['put_wall']:g}, "
+                     f"mean strikes {row['call_mean_strike']:.1f}/{row['put_mean_strike']:.1f}")
+    await ctx.send("\n".join(lines))
+
+@bot.command()
+async def unusual(ctx, count: int = 10):
+    """
+    Discord command to show the top unusual option contracts of the last watchlist sweep.
+    Usage: !unusual [number of contracts]
+    """
+    scores = unusual_scanner.last_scores
+    if not UNUSUAL_ACTIVITY:
+        await ctx.send("Unusual activity sweeps are turned off.")
+        return
+    if scores is None:
+        await ctx.send("No unusual activity sweep has run yet.")
+        return
+    hits = scores[scores['hit'].to_numpy()].sort_values('flow_premium', ascending=False).head(count)
+    if hits.empty:
+        await ctx.send("No unusual option activity in the last sweep.")
+        return
+    await ctx.send("\n".join(format_hit(row) for _, row in hits.iterrows()))
+
+def _format_gex(value):
+    return f"{value / 1e6:+,.1f}M"
+
+
+@bot.command()
+async def gex(ctx, symbol: str = None, strikes: int = 5):
+    """
+    Discord command to show the dealer gamma exposure of a symbol, or the watchlist symbols trading
+    closest to their zero-gamma flip.
+    Usage: !gex [NVDA] [number of strikes]
+    """
+    if symbol is None:
+        if watchlist_gex is None:
+            await ctx.send("No watchlist gamma exposure computed yet.")
+            return
+        table = watchlist_gex['symbols'].dropna(subset=['zero_gamma'])
+        table = table.assign(distance=(table['spot'] / table['zero_gamma'] - 1).abs()).sort_values('distance').head(10)
+        lines = ["**Closest to the zero-gamma flip** ($ per 1% move)"]
+        for _, row in table.iterrows():
+            lines.append(f"**{row['symbol']}** {row['spot']:.2f}: flip {row['zero_gamma']:.2f}, net GEX {_format_gex(row['net_gex'])}")
+        await ctx.send("\n".join(lines))
+        return
+
+    try:
+        option_chain_data = await asyncio.to_thread(engine.get_option_chain, symbol)
+        await asyncio.to_thread(record_chain, symbol, option_chain_data)
+        spot = (await asyncio.to_thread(engine.get_stock_quote, symbol))['c']
+        result = await asyncio.to_thread(chain_gamma_exposure, symbol, option_chain_data, spot)
+    except Exception as e:
+        await ctx.send(f"Error computing the gamma exposure of {symbol}: {e}")
+        return
+    if result['strikes'].empty:
+        await ctx.send(f"No open interest found for {symbol}.")
+        return
+
+    row = result['symbols'].iloc[0]
+    flip = f"{row['zero_gamma']:.2f}" if np.isfinite(row['zero_gamma']) else "outside ±20%"
+    lines = [f"**{symbol} gamma exposure** at {spot:.2f} ($ per 1% move): net {_format_gex(row['net_gex'])} "
+             f"(calls {_format_gex(row['call_gex'])}, puts {_format_gex(row['put_gex'])}), zero-gamma flip {flip}, "
+             f"call wall {row['call_wall']:g}, put wall {row['put_wall']:g}"]
+    top = result['strikes'].reindex(result['strikes']['net_gex'].abs().sort_values(ascending=False).index).head(strikes)
+    lines += [f"{r['strike']:g}: {_format_gex(r['net_gex'])}" for _, r in top.iterrows()]
+    await ctx.send("\n".join(lines))
+
+def _mean_ms(histogram, **labels):
+    count, total = histogram.summary(**labels)
+    return f"{total / count * 1000:.0f} ms (n={count})" if count else "n/a"
+
+
+def _hit_rate(counter):
+    hits, total = counter.total(result='hit'), counter.total()
+    return f"{hits / total:.0%} of {total}" if total else "n/a"
+
+
+@bot.command()
+async def stats(ctx):
+    """
+    Discord command to show where the scanner spends its time.
+    Usage: !stats
+    """
+    metrics = REGISTRY.metrics
+    last_cycle = metrics['scan_last_cycle_seconds'].get()
+    lines = [
+        f"**Last scan cycle:** {last_cycle:.1f} s" if last_cycle is not None else "**Last scan cycle:** n/a",
+        f"**Symbol evaluation:** {_mean_ms(metrics['scan_symbol_seconds'])}",
+        f"**Finnhub fetch:** {_mean_ms(metrics['finnhub_fetch_seconds'])}, "
+        f"{metrics['finnhub_fetch_bytes_total'].total() / 1e6:.1f} MB, "
+        f"{metrics['finnhub_fetch_errors_total'].total()} errors",
+        f"**Rate limit wait:** {_mean_ms(metrics['finnhub_rate_limit_wait_seconds'])}",
+    ]
+    for timeframe in ['30min', '1H', '2H', '3H', '4H', 'D']:
+        lines.append(f"**Signal compute {timeframe}:** {_mean_ms(metrics['signal_compute_seconds'], timeframe=timeframe)}")
+    lines += [
+        f"**Bar cache hit rate:** {_hit_rate(metrics['bar_cache_requests_total'])}",
+        f"**Chart cache hit rate:** {_hit_rate(metrics['chart_cache_requests_total'])}",
+        f"**Discord send:** {_mean_ms(metrics['discord_send_seconds'])}",
+        f"**Unusual activity sweep:** {_mean_ms(metrics['uoa_sweep_seconds'])}, "
+        f"scoring {_mean_ms(metrics['uoa_score_seconds'])}",
+        f"Prometheus metrics: http://{METRICS_HOST}:{METRICS_PORT}/metrics",
+    ]
+    await ctx.send("\n".join(lines))
+
 # Run the bot
 bot.run(DISCORD_BOT_TOKEN)
\ No newline at end of file
@@ -4,10 +4,19 @@ import os
 import time
 import pandas as pd
 import pytz
+import threading
 from datetime import datetime, time as dt_time
+from telemetry import REGISTRY
 # Finnhub API Key
 load_dotenv()
 API_KEY = os.getenv("FIN_TOKEN")
+# Shared request budget of the API key (free tier allows 60 calls per minute)
+API_CALLS_PER_MINUTE = int(os.getenv("FIN_CALLS_PER_MINUTE", 60))
+
+FETCH_SECONDS = REGISTRY.histogram('finnhub_fetch_seconds', 'Latency of Finnhub API requests.', ('endpoint', 'symbol'))
+FETCH_BYTES = REGISTRY.counter('finnhub_fetch_bytes_total', 'Bytes received from the Finnhub API.', ('endpoint', 'symbol'))
+FETCH_ERRORS = REGISTRY.counter('finnhub_fetch_errors_total', 'Failed Finnhub API requests.', ('endpoint',))
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.histogram('finnhub_rate_limit_wait_seconds', 'Time spent waiting for the shared request budget.')
 
 # Finnhub Option Chain Endpoint
 
@@ -16,11 +25,65 @@ QUOTE_URL = "https://finnhub.io/api/v1/quote"
 HISTORICAL_PRICE_URL = "https://finnhub.io/api/v1/stock/candle"
 
 
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every request issued through a FinnhubEngine,
+    so concurrent detectors stay within the API budget of one key.
+    """
+    def __init__(self, calls_per_minute=API_CALLS_PER_MINUTE):
+        self.capacity = calls_per_minute
+        self.tokens = float(calls_per_minute)
+        self.fill_rate = calls_per_minute / 60.0
+        self.timestamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a request token is available and consume it.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.fill_rate)
+                self.timestamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.fill_rate
+            time.sleep(wait)
+
+
 class FinnhubEngine:
-    def __init__(self, api_key=API_KEY):
+    def __init__(self, api_key=API_KEY, rate_limiter=None):
         self.api_key = api_key
         self.session = requests.Session()
         self.session.params = {'token': self.api_key}
+        self.rate_limiter = rate_limiter or RateLimiter()
+
+    def _get(self, url, params):
+        """
+        Issue a GET request against the Finnhub API under the shared rate limit.
+
+        Parameters:
+        - url (str): Endpoint URL.
+        - params (dict): Query parameters.
+
+        Returns:
+        - dict: Decoded JSON response.
+        """
+        endpoint = url.rsplit('/', 1)[-1]
+        symbol = params.get('symbol', '')
+        with RATE_LIMIT_WAIT_SECONDS.time():
+            self.rate_limiter.acquire()
+        try:
+            with FETCH_SECONDS.time(endpoint=endpoint, symbol=symbol):
+                response = self.session.get(url, params=params)
+                response.raise_for_status()
+        except Exception:
+            FETCH_ERRORS.inc(endpoint=endpoint)
+            raise
+        FETCH_BYTES.inc(len(response.content), endpoint=endpoint, symbol=symbol)
+        return response.json()
 
     def get_stock_quote(self, symbol):
         """
@@ -33,11 +96,9 @@ class FinnhubEngine:
         - dict: Real-time quote data.
         """
         params = {'symbol': symbol}
-        response = self.session.get(QUOTE_URL, params=params)
-        response.raise_for_status()
-        return response.json()
+        return self._get(QUOTE_URL, params)
     
-    def get_historical_prices(self, symbol, resolution='D', count=100):
+    def get_historical_prices(self, symbol, resolution='D', count=100, since=None):
         """
         Retrieve historical stock prices.
         
@@ -45,6 +106,8 @@ class FinnhubEngine:
         - symbol (str): Stock ticker symbol.
         - resolution (str): Time resolution (1, 5, 15, 30, 60, D, W, M).
         - count (int): Number of data points.
+        - since (int, optional): Start timestamp in epoch seconds. When given, only the bars since
+          this time are requested and `count` is ignored.
         
         Returns:
         - pd.DataFrame: Historical price data.
@@ -59,6 +122,8 @@ class FinnhubEngine:
             elif resolution == 'M':
                 delta = count * 2629746  # 1 month in seconds (approximate)
             start_time = end_time - delta
+            if since is not None:
+                start_time = int(since)
         else:
             # For intra-day data, calculate based on resolution
             # Assuming 'count' represents the number of intervals
@@ -70,12 +135,16 @@ class FinnhubEngine:
             # need to request in for loop of 2week interval
             two_week_interval = 604800 * 4
             total_intervals = (count * int(resolution) * 60) // two_week_interval + 1
+            if since is not None:
+                total_intervals = max(0, end_time - int(since)) // two_week_interval + 1
             data_frames = []
             for i in range(total_intervals):
                 # Calculate the start and end times for each interval
                 start_time = end_time - two_week_interval
                 if start_time < 0:
                     start_time = 0  # Ensure start_time is not negative
+                if since is not None:
+                    start_time = max(start_time, int(since))
 
                 params = {
                     'symbol': symbol,
@@ -85,11 +154,11 @@ class FinnhubEngine:
                     'token': self.api_key
                 }
 
-                response = self.session.get(HISTORICAL_PRICE_URL, params=params)
-                response.raise_for_status()
-                data = response.json()
+                data = self._get(HISTORICAL_PRICE_URL, params)
 
-                if data['s'] != 'ok':
+                if since is not None and data['s'] == 'no_data':
+                    data = {k: [] for k in 'tohlcv'}  # nothing new in this window
+                elif data['s'] != 'ok':
                     raise ValueError(f"Error fetching historical data: {data.get('s')}")
 
                 df = pd.DataFrame({
@@ -110,6 +179,10 @@ class FinnhubEngine:
 
                 # Respect API rate limits
                 # time.sleep(1)  # Adjust based on your subscription's rate limit
+            if not data_frames:
+                # nothing traded in the requested range (e.g. a gap over a weekend)
+                return pd.DataFrame(columns=['o', 'h', 'l', 'c', 'v'],
+                                    index=pd.DatetimeIndex([], tz='US/Eastern', name='t_et'))
             df = pd.concat(data_frames).sort_values('t_et')            
         else:
             params = {
@@ -119,10 +192,10 @@ class FinnhubEngine:
                 'to': end_time,
                 'token': self.api_key
             }
-            response = self.session.get(HISTORICAL_PRICE_URL, params=params)
-            response.raise_for_status()
-            data = response.json()
-            if data['s'] != 'ok':
+            data = self._get(HISTORICAL_PRICE_URL, params)
+            if since is not None and data['s'] == 'no_data':
+                data = {k: [] for k in 'tohlcv'}  # nothing new since the given start time
+            elif data['s'] != 'ok':
                 raise ValueError(f"Error fetching historical data: {data.get('s')}")
 
             df = pd.DataFrame({
@@ -195,9 +268,7 @@ class FinnhubEngine:
         - dict: Option chain data.
         """
         params = {'symbol': symbol, 'expiration': expiration}
-        response = self.session.get(OPTION_CHAIN_URL, params=params)
-        response.raise_for_status()
-        data = response.json()['data']
+        data = self._get(OPTION_CHAIN_URL, params)['data']
         filtered_data = [option for option in data if option.get('expirationDate') == expiration]
         return filtered_data
     
@@ -212,9 +283,7 @@ class FinnhubEngine:
         - dict: Option chain data.
         """
         params = {'symbol': symbol}
-        response = self.session.get(OPTION_CHAIN_URL, params=params)
-        response.raise_for_status()
-        data = response.json()['data']
+        data = self._get(OPTION_CHAIN_URL, params)['data']
         return data
         
     
@@ -0,0 +1,192 @@
+# gamma_exposure.py
+
+from datetime import date
+import numpy as np
+import pandas as pd
+from pricing_models.greeks import black_scholes_greeks, norm_pdf
+from pricing_models.implied_vol import implied_volatility, quote_prices
+from unusual_activity import normalize_chains
+
+RISK_FREE_RATE = 0.0463  # same rate as call_reward_risk.py
+CONTRACT_SIZE = 100
+MIN_DAYS = 0.25  # contracts expiring today keep about the rest of a session to expiry
+SPOT_GRID = np.linspace(0.8, 1.2, 161)  # spot levels, relative to the spot, searched for the zero-gamma flip
+CHUNK_CONTRACTS = 20_000  # contracts per block of the spot grid evaluation (a block holds contracts x grid floats)
+
+
+def _group_sum(keys, values):
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    return unique, [np.bincount(inverse, weights=v, minlength=len(unique)) for v in values]
+
+
+def zero_gamma_level(levels, profile, spots):
+    """
+    Spot level where the total GEX of each symbol changes sign, closest to its spot.
+
+    Parameters:
+    - levels (np.ndarray): Increasing spot levels of shape (symbols, G).
+    - profile (np.ndarray): Total GEX at those levels, shape (symbols, G).
+    - spots (np.ndarray): Current spots of shape (symbols,).
+
+    Returns:
+    - np.ndarray: Flip level per symbol, linearly interpolated between grid levels (NaN without a sign change).
+    """
+    p0, p1 = profile[:, :-1], profile[:, 1:]
+    l0, l1 = levels[:, :-1], levels[:, 1:]
+    crosses = (np.sign(p0) * np.sign(p1) < 0) | ((p0 == 0) & (p1 != 0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        flip = np.where(crosses, l0 - p0 * (l1 - l0) / (p1 - p0), np.nan)
+    distance = np.where(crosses, np.abs(flip - spots[:, None]), np.inf)
+    # rows without a crossing pick a NaN entry
+    return flip[np.arange(len(spots)), np.argmin(distance, axis=1)]
+
+
+def gamma_exposure(flat, spots, today=None, r=RISK_FREE_RATE, q=0.0, grid=SPOT_GRID):
+    """
+    Dealer gamma exposure (GEX) of every symbol of a set of chains, by strike, by expiry and over a
+    grid of spot levels.
+
+    Dealers are assumed long the calls and short the puts their customers trade, so call open
+    interest adds gamma and put open interest subtracts it. GEX is in dollars of delta change per 1%
+    spot move: gamma * open interest * CONTRACT_SIZE * S^2 * 0.01. Implied vols come from the chain,
+    or are solved from the quotes where the chain has none.
+
+    Over the spot grid the Black-Scholes dollar gamma of a contract at S' = S * g is
+    S' * w * pdf(a + b * log(g)) with a = d1 at the current spot and b = 1 / (sigma * sqrt(T)), so the
+    profile of the whole watchlist is one broadcast (contracts x grid) pdf evaluation per block.
+
+    Parameters:
+    - flat (dict): Contracts of one or more symbols, the output of unusual_activity.normalize_chains.
+    - spots (dict): Symbol -> spot price. Symbols without a spot are skipped.
+    - today (date, optional): Valuation date, today by default.
+    - r (float): Risk-free interest rate.
+    - q (float): Dividend yield.
+    - grid (np.ndarray): Increasing spot levels relative to the spot.
+
+    Returns:
+    - dict:
+      'symbols' (pd.DataFrame, one row per symbol with a spot): 'spot', 'call_gex', 'put_gex',
+        'net_gex', 'zero_gamma' (flip level nearest to the spot, NaN if the profile keeps its sign over
+        the grid), 'call_wall' / 'put_wall' (strike with the largest call / put GEX).
+      'strikes' (pd.DataFrame): 'symbol', 'strike', 'call_gex', 'put_gex', 'net_gex', sorted by symbol and strike.
+      'expiries' (pd.DataFrame): 'symbol', 'expirationDate', 'call_gex', 'put_gex', 'net_gex'.
+      'levels' and 'profile' (np.ndarray): Spot levels and net GEX at them, shape (symbols, len(grid)).
+    """
+    today = np.datetime64(today or date.today(), 'D')
+    symbols = np.array(flat['symbols'], dtype=object)
+    symbol_spots = np.array([float(spots.get(s) or np.nan) for s in symbols])
+    S = symbol_spots[flat['symbol']] if len(symbols) else np.zeros(0)
+    expiry = np.array(flat['expiry'], dtype='datetime64[D]')
+    days = (expiry - today).astype(np.float64)
+    T = np.maximum(days, MIN_DAYS) / 365.0
+
+    keep = np.isfinite(S) & (S > 0) & (days >= 0) & (flat['open_interest'] > 0) & (flat['strike'] > 0)
+    sigma = flat['iv'] / 100
+    missing = keep & ~(sigma > 0)
+    if np.any(missing):
+        prices = quote_prices(flat['bid'][missing], flat['ask'][missing], flat['last'][missing])
+        sigma[missing] = implied_volatility(prices, S[missing], flat['strike'][missing], T[missing], r, q,
+                                            flat['is_call'][missing])
+    keep &= sigma > 0
+
+    sym, S, K, T, sigma = flat['symbol'][keep], S[keep], flat['strike'][keep], T[keep], sigma[keep]
+    is_call, oi, expiry = flat['is_call'][keep], flat['open_interest'][keep], expiry[keep]
+    sign = np.where(is_call, 1.0, -1.0)
+    gamma = black_scholes_greeks(S, K, T, sigma, r, q, is_call)['gamma']
+    gex = sign * gamma * oi * CONTRACT_SIZE * S ** 2 * 0.01
+    call_gex, put_gex = np.where(is_call, gex, 0.0), np.where(is_call, 0.0, gex)
+
+    listed = np.flatnonzero(np.isfinite(symbol_spots) & (symbol_spots > 0))
+    position = np.full(len(symbols), -1)
+    position[listed] = np.arange(len(listed))
+    row = position[sym]
+
+    # signed dollar gamma by (symbol, strike) and (symbol, expiry)
+    keys, (strike_call, strike_put) = _group_sum(np.stack([row.astype(np.float64), K], axis=1), (call_gex, put_gex))
+    strikes = pd.DataFrame({'symbol': symbols[listed][keys[:, 0].astype(np.int64)] if len(keys) else [],
+                            'strike': keys[:, 1], 'call_gex': strike_call, 'put_gex': strike_put,
+                            'net_gex': strike_call + strike_put})
+    expiry_days = expiry.astype(np.int64).astype(np.float64)
+    keys, (expiry_call, expiry_put) = _group_sum(np.stack([row.astype(np.float64), expiry_days], axis=1), (call_gex, put_gex))
+    expiries = pd.DataFrame({'symbol': symbols[listed][keys[:, 0].astype(np.int64)] if len(keys) else [],
+                             'expirationDate': keys[:, 1].astype('datetime64[D]').astype(str),
+                             'call_gex': expiry_call, 'put_gex': expiry_put, 'net_gex': expiry_call + expiry_put})
+
+    # net GEX over the spot grid, in blocks of whole symbols (contracts are grouped by symbol)
+    vol_sqrt_t = sigma * np.sqrt(T)
+    b = 1.0 / vol_sqrt_t
+    a = (np.log(S / K) + (r - q) * T) * b + 0.5 * vol_sqrt_t
+    weight = sign * oi * CONTRACT_SIZE * 0.01 * np.exp(-q * T) * b
+    log_grid = np.log(grid)
+    profile = np.zeros((len(listed), len(grid)))
+    starts = np.flatnonzero(np.r_[True, row[1:] != row[:-1]]) if len(row) else np.zeros(0, dtype=np.int64)
+    bounds = np.append(starts, len(row))
+    block_start = 0
+    while block_start < len(starts):
+        block_end = max(np.searchsorted(bounds, bounds[block_start] + CHUNK_CONTRACTS, side='right') - 1, block_start + 1)
+        lo, hi = bounds[block_start], bounds[block_end]
+        dollar_gamma = weight[lo:hi, None] * norm_pdf(a[lo:hi, None] + b[lo:hi, None] * log_grid[None, :])
+        profile[row[starts[block_start:block_end]]] = np.add.reduceat(dollar_gamma, starts[block_start:block_end] - lo, axis=0)
+        block_start = block_end
+    levels = symbol_spots[listed][:, None] * grid[None, :]
+    profile *= levels
+
+    totals = pd.DataFrame({'symbol': symbols[listed], 'spot': symbol_spots[listed],
+                           'call_gex': np.bincount(row, weights=call_gex, minlength=len(listed)),
+                           'put_gex': np.bincount(row, weights=put_gex, minlength=len(listed))})
+    totals['net_gex'] = totals['call_gex'] + totals['put_gex']
+    totals['zero_gamma'] = zero_gamma_level(levels, profile, symbol_spots[listed])
+    by_symbol = strikes.groupby('symbol', sort=False)
+    for side, pick in (('call', 'idxmax'), ('put', 'idxmin')):
+        walls = strikes.loc[getattr(by_symbol[f'{side}_gex'], pick)()].set_index('symbol')['strike']
+        totals[f'{side}_wall'] = totals['symbol'].map(walls)
+    return {'symbols': totals, 'strikes': strikes, 'expiries': expiries, 'levels': levels, 'profile': profile}
+
+
+def chain_gamma_exposure(symbol, option_chain_data, spot, today=None, r=RISK_FREE_RATE, q=0.0, grid=SPOT_GRID):
+    """
+    GEX profile of a single symbol's chain (see gamma_exposure).
+    """
+    return gamma_exposure(normalize_chains({symbol: option_chain_data}), {symbol: spot}, today, r, q, grid)
+
+
+if __name__ == "__main__":
+    # Timing on a synthetic watchlist and a brute-force check of the profile: python gamma_exposure.py
+    import time
+    from watchlist import stocks
+
+    rng = np.random.default_rng(9)
+    today = date(2025, 1, 2)
+    expiries = [f"2025-{m:02d}-{d:02d}" for m in (1, 2, 3) for d in (3, 10, 17, 24)]
+    symbols = sorted({s for stock_list in stocks.values() for s in stock_list})
+    spots = {s: float(rng.uniform(20, 600)) for s in symbols}
+    chains = {}
+    for s in symbols:
+        chain = []
+        for expiry in expiries:
+            options = {side: [{'strike': float(k), 'openInterest': int(rng.integers(0, 20000)),
+                               'volume': int(rng.integers(0, 5000)),
+                               'impliedVolatility': float(30 + 40 * abs(np.log(k / spots[s])))}
+                              for k in np.round(np.linspace(0.6, 1.4, 80) * spots[s], 1)] for side in ('CALL', 'PUT')}
+            chain.append({'expirationDate': expiry, 'options': options})
+        chains[s] = chain
+
+    flat = normalize_chains(chains)
+    start = time.perf_counter()
+    result = gamma_exposure(flat, spots, today)
+    elapsed = time.perf_counter() - start
+    print(f"{len(flat['strike'])} contracts of {len(symbols)} symbols, {len(SPOT_GRID)} spot levels, in {elapsed:.2f} s")
+    print(f"symbols with a zero-gamma flip on the grid: {int(result['symbols']['zero_gamma'].notna().sum())}")
+
+    # the profile at the spot is the total, and every level matches repricing the chain at that spot
+    middle = np.argmin(np.abs(SPOT_GRID - 1.0))
+    print(f"profile at spot vs net GEX: max relative error "
+          f"{np.max(np.abs(result['profile'][:, middle] / result['symbols']['net_gex'] - 1)):.1e}")
+    symbol = symbols[0]
+    row = result['symbols'].index[result['symbols']['symbol'] == symbol][0]
+    brute = np.array([chain_gamma_exposure(symbol, chains[symbol], level, today)['symbols']['net_gex'][0]
+                      for level in result['levels'][row]])
+    print(f"{symbol} profile vs repricing at each level: max relative error "
+          f"{np.max(np.abs(result['profile'][row] - brute) / np.abs(brute).max()):.1e}")
+    print(result['symbols'].head().to_string())
@@ -0,0 +1,101 @@
+# market_schedule.py
+
+import pandas as pd
+import pandas_market_calendars as mcal
+from datetime import timedelta
+
+BAR_MINUTES = 30  # resolution of the bars the scanner computes on
+SCAN_DELAY_SECONDS = 5  # grace period for the data provider to publish a closed bar
+SCHEDULE_LOOKBACK_DAYS = 7
+SCHEDULE_LOOKAHEAD_DAYS = 21
+
+
+class MarketSessionClock:
+    """
+    Bar-close calendar of an exchange, built from pandas_market_calendars.
+    Closed sessions (weekends, holidays) have no bar closes and half-days end at their early close.
+    """
+    def __init__(self, calendar_name='NYSE', bar_minutes=BAR_MINUTES, scan_delay_seconds=SCAN_DELAY_SECONDS):
+        self.calendar = mcal.get_calendar(calendar_name)
+        self.bar_length = pd.Timedelta(minutes=bar_minutes)
+        self.scan_delay = pd.Timedelta(seconds=scan_delay_seconds)
+        self._closes = pd.DatetimeIndex([], tz='UTC')
+        self._window = None  # (start, end) dates covered by self._closes
+
+    def sessions(self, start_date, end_date):
+        """
+        Return the open and close of every session between two dates.
+
+        Parameters:
+        - start_date, end_date (date-like): Inclusive date range.
+
+        Returns:
+        - list of (pd.Timestamp, pd.Timestamp): Session open and close times in UTC.
+        """
+        schedule = self.calendar.schedule(start_date=start_date, end_date=end_date)
+        return list(zip(schedule['market_open'], schedule['market_close']))
+
+    def bar_closes(self, start_date, end_date):
+        """
+        Compute every bar close of the sessions between two dates.
+
+        Parameters:
+        - start_date, end_date (date-like): Inclusive date range.
+
+        Returns:
+        - pd.DatetimeIndex: Sorted bar close times in UTC. The last bar of each session closes at
+          the session close, even when it is shorter than a full bar (e.g. on half-days).
+        """
+        closes = []
+        for market_open, market_close in self.sessions(start_date, end_date):
+            session_closes = pd.date_range(market_open + self.bar_length, market_close, freq=self.bar_length)
+            closes.extend(session_closes)
+            if len(session_closes) == 0 or session_closes[-1] != market_close:
+                closes.append(market_close)
+        return pd.DatetimeIndex(closes).tz_convert('UTC')
+
+    def _ensure_window(self, now):
+        today = now.date()
+        if self._window is not None:
+            start, end = self._window
+            # keep at least two days of bar closes ahead of now
+            if start <= today and today + timedelta(days=2) <= end:
+                return
+        start = today - timedelta(days=SCHEDULE_LOOKBACK_DAYS)
+        end = today + timedelta(days=SCHEDULE_LOOKAHEAD_DAYS)
+        self._closes = self.bar_closes(start, end)
+        self._window = (start, end)
+
+    def previous_bar_close(self, now):
+        """
+        Return the most recent bar close at or before `now` (UTC), or None if there is none
+        within the lookback window.
+        """
+        now = pd.Timestamp(now).tz_convert('UTC')
+        self._ensure_window(now)
+        idx = self._closes.searchsorted(now, side='right')
+        return self._closes[idx - 1] if idx > 0 else None
+
+    def next_scan_time(self, now):
+        """
+        Return the time of the next scan: shortly after the first bar close whose scan is still
+        ahead of `now` (UTC). Bar closes missed while the bot was busy or down are not replayed.
+        """
+        now = pd.Timestamp(now).tz_convert('UTC')
+        self._ensure_window(now)
+        idx = self._closes.searchsorted(now - self.scan_delay, side='right')
+        while idx >= len(self._closes):
+            # no session within the lookahead window (e.g. long exchange closure), extend it
+            self._window = (self._window[0], self._window[1] + timedelta(days=SCHEDULE_LOOKAHEAD_DAYS))
+            self._closes = self.bar_closes(*self._window)
+            idx = self._closes.searchsorted(now - self.scan_delay, side='right')
+        return (self._closes[idx] + self.scan_delay).to_pydatetime()
+
+
+if __name__ == "__main__":
+    clock = MarketSessionClock()
+    now = pd.Timestamp.now(tz='UTC')
+    print("Previous bar close:", clock.previous_bar_close(now))
+    print("Next scan time:", clock.next_scan_time(now))
+    # Black Friday half-day closes at 13:00 ET
+    print(clock.bar_closes('2024-11-29', '2024-11-29').tz_convert('US/Eastern'))
@@ -0,0 +1,211 @@
+# option_flow.py
+
+import numpy as np
+import pandas as pd
+
+VOLUME_FILTER = 0.05  # strikes below this fraction of the expiry's max volume are ignored in mean strikes
+FIELDS = ['strike', 'volume', 'openInterest']
+
+
+def flatten_chain(option_chain_data):
+    """
+    Flatten every expiry and side of a Finnhub option chain into flat arrays, one entry per contract.
+
+    Parameters:
+    - option_chain_data (list): Option chains as returned by FinnhubEngine.get_option_chain.
+
+    Returns:
+    - dict: 'expiries' (list of str) and arrays 'expiry' (index into expiries), 'is_call', 'strike',
+      'volume' and 'open_interest'. Missing volumes and open interest count as 0; contracts without a
+      strike are dropped.
+    """
+    expiries, rows = [], []
+    for chain in option_chain_data:
+        options = chain.get('options') or {}
+        index = len(expiries)
+        expiries.append(chain.get('expirationDate'))
+        for side, is_call in (('CALL', 1.0), ('PUT', 0.0)):
+            for contract in options.get(side) or []:
+                rows.append((index, is_call, *(contract.get(field) for field in FIELDS)))
+
+    values = np.array(rows, dtype=np.float64).reshape(-1, 2 + len(FIELDS))  # None -> NaN
+    values = values[np.isfinite(values[:, 2])]
+    return {
+        'expiries': expiries,
+        'expiry': values[:, 0].astype(np.int64),
+        'is_call': values[:, 1] > 0,
+        'strike': values[:, 2],
+        'volume': np.nan_to_num(values[:, 3]),
+        'open_interest': np.nan_to_num(values[:, 4]),
+    }
+
+
+def _segment_cumsum(values, starts):
+    """
+    Inclusive cumulative sum restarting at every segment start of a sorted array.
+    """
+    total = np.cumsum(values)
+    offsets = np.repeat(total[starts] - values[starts], np.diff(np.append(starts, len(values))))
+    return total - offsets
+
+
+def strike_table(flat):
+    """
+    Aggregate contracts into one row per (expiry, strike) with call and put volume and open interest.
+
+    Returns:
+    - pd.DataFrame: Rows sorted by expiry then strike, with columns 'expiry', 'strike', 'call_volume',
+      'put_volume', 'call_oi', 'put_oi', and 'call_active' / 'put_active' flags marking strikes at or
+      above VOLUME_FILTER times the max volume of their expiry and side.
+    """
+    keys = np.stack([flat['expiry'].astype(np.float64), flat['strike']], axis=1)
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    n, is_call = len(unique), flat['is_call']
+    table = pd.DataFrame({
+        'expiry': unique[:, 0].astype(np.int64),
+        'strike': unique[:, 1],
+        'call_volume': np.bincount(inverse, weights=flat['volume'] * is_call, minlength=n),
+        'put_volume': np.bincount(inverse, weights=flat['volume'] * ~is_call, minlength=n),
+        'call_oi': np.bincount(inverse, weights=flat['open_interest'] * is_call, minlength=n),
+        'put_oi': np.bincount(inverse, weights=flat['open_interest'] * ~is_call, minlength=n),
+    })
+    n_expiries = len(flat['expiries'])
+    for side in ('call', 'put'):
+        max_volume = np.zeros(n_expiries)
+        np.maximum.at(max_volume, table['expiry'].to_numpy(), table[f'{side}_volume'].to_numpy())
+        table[f'{side}_active'] = table[f'{side}_volume'].to_numpy() >= VOLUME_FILTER * max_volume[table['expiry'].to_numpy()]
+    return table
+
+
+def max_pain(strikes, call_oi, put_oi, groups):
+    """
+    Max-pain strike of every group: the candidate strike minimizing the payout to option holders,
+    sum(call_oi * max(P - K, 0)) + sum(put_oi * max(K - P, 0)), over the strikes of the group.
+
+    With the rows sorted by (group, strike), both sums are prefix sums, so every candidate of every
+    group is evaluated in O(n) after the O(n log n) sort.
+
+    Parameters:
+    - strikes, call_oi, put_oi (np.ndarray): One row per distinct (group, strike), sorted by group then strike.
+    - groups (np.ndarray): Group index of each row (e.g. the expiry), non-decreasing.
+
+    Returns:
+    - (np.ndarray, np.ndarray): Max-pain strike per group index (NaN for empty groups) and the pain of
+      every row.
+    """
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    lengths = np.diff(np.append(starts, len(groups)))
+    call_cum = _segment_cumsum(call_oi, starts)
+    call_strike_cum = _segment_cumsum(call_oi * strikes, starts)
+    put_cum = _segment_cumsum(put_oi, starts)
+    put_strike_cum = _segment_cumsum(put_oi * strikes, starts)
+    put_total = np.repeat(put_cum[starts + lengths - 1], lengths)
+    put_strike_total = np.repeat(put_strike_cum[starts + lengths - 1], lengths)
+
+    # calls with K <= P pay P - K, puts with K > P pay K - P (rows at K = P pay nothing)
+    pain = (strikes * call_cum - call_strike_cum) + ((put_strike_total - put_strike_cum) - strikes * (put_total - put_cum))
+    order = np.lexsort((pain, groups))
+    first = order[np.searchsorted(groups[order], groups[starts])]
+    result = np.full(groups.max() + 1 if len(groups) else 0, np.nan)
+    result[groups[starts]] = strikes[first]
+    return result, pain
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), np.nan)
+
+
+def option_flow_metrics(option_chain_data):
+    """
+    Per-expiry and aggregate option flow metrics of a whole option chain, computed without plotting.
+
+    Parameters:
+    - option_chain_data (list): Option chains as returned by FinnhubEngine.get_option_chain.
+
+    Returns:
+    - dict:
+      'expiries' (pd.DataFrame, one row per expiration date): call/put volume and open interest,
+        'pc_volume_ratio', 'pc_oi_ratio', volume-weighted 'call_mean_strike' / 'put_mean_strike' over
+        the active strikes, 'max_pain', and the OI walls 'call_wall' / 'put_wall' (strike with the
+        largest call / put open interest).
+      'strikes' (pd.DataFrame): Output of strike_table, with 'expirationDate' and 'pain'.
+      'aggregate' (dict): The same metrics over all expiries together.
+    """
+    flat = flatten_chain(option_chain_data)
+    table = strike_table(flat)
+    n = len(flat['expiries'])
+    expiry = table['expiry'].to_numpy()
+    strikes = table['strike'].to_numpy()
+    columns = {name: table[name].to_numpy() for name in ('call_volume', 'put_volume', 'call_oi', 'put_oi')}
+
+    def per_expiry(values):
+        return np.bincount(expiry, weights=values, minlength=n)
+
+    totals = {name: per_expiry(values) for name, values in columns.items()}
+    metrics = pd.DataFrame({'expirationDate': flat['expiries'], **totals})
+    metrics['pc_volume_ratio'] = _ratio(totals['put_volume'], totals['call_volume'])
+    metrics['pc_oi_ratio'] = _ratio(totals['put_oi'], totals['call_oi'])
+    for side in ('call', 'put'):
+        active_volume = columns[f'{side}_volume'] * table[f'{side}_active'].to_numpy()
+        metrics[f'{side}_mean_strike'] = _ratio(per_expiry(active_volume * strikes), per_expiry(active_volume))
+
+    metrics['max_pain'], pain = max_pain(strikes, columns['call_oi'], columns['put_oi'], expiry) if len(table) \
+        else (np.full(n, np.nan), np.zeros(0))
+    for side in ('call', 'put'):
+        # strike with the largest open interest per expiry: sort by (expiry, OI) and take the last row
+        oi = columns[f'{side}_oi']
+        wall = np.full(n, np.nan)
+        if len(table):
+            order = np.lexsort((oi, expiry))
+            last = order[np.r_[expiry[order][1:] != expiry[order][:-1], True]]
+            wall[expiry[last]] = np.where(oi[last] > 0, strikes[last], np.nan)
+        metrics[f'{side}_wall'] = wall
+
+    table['expirationDate'] = np.array(flat['expiries'], dtype=object)[expiry] if n else []
+    table['pain'] = pain
+
+    # all expiries together: aggregate by strike only
+    unique_strikes, inverse = np.unique(strikes, return_inverse=True)
+    by_strike = {name: np.bincount(inverse, weights=values, minlength=len(unique_strikes))
+                 for name, values in columns.items()}
+    aggregate = {name: float(values.sum()) for name, values in columns.items()}
+    aggregate['pc_volume_ratio'] = float(_ratio(aggregate['put_volume'], aggregate['call_volume']))
+    aggregate['pc_oi_ratio'] = float(_ratio(aggregate['put_oi'], aggregate['call_oi']))
+    if len(unique_strikes):
+        groups = np.zeros(len(unique_strikes), dtype=np.int64)
+        aggregate['max_pain'] = float(max_pain(unique_strikes, by_strike['call_oi'], by_strike['put_oi'], groups)[0][0])
+        aggregate['call_wall'] = float(unique_strikes[np.argmax(by_strike['call_oi'])])
+        aggregate['put_wall'] = float(unique_strikes[np.argmax(by_strike['put_oi'])])
+    return {'expiries': metrics, 'strikes': table, 'aggregate': aggregate}
+
+
+if __name__ == "__main__":
+    # Check against brute force on a synthetic chain: python option_flow.py
+    import time
+
+    rng = np.random.default_rng(5)
+    chains = []
+    for e in range(20):
+        strikes = np.arange(100, 300, 2.5)
+        options = {side: [{'strike': float(k), 'volume': int(rng.integers(0, 5000)), 'openInterest': int(rng.integers(0, 20000))}
+                          for k in strikes if rng.random() < 0.9] for side in ('CALL', 'PUT')}
+        chains.append({'expirationDate': f"2025-{e // 4 + 1:02d}-{e % 4 * 7 + 1:02d}", 'options': options})
+
+    start = time.perf_counter()
+    result = option_flow_metrics(chains)
+    elapsed = time.perf_counter() - start
+    contracts = sum(len(c['options'][s]) for c in chains for s in ('CALL', 'PUT'))
+    print(f"{contracts} contracts over {len(chains)} expiries in {elapsed * 1000:.1f} ms")
+
+    errors = []
+    for e, chain in enumerate(chains):
+        calls, puts = chain['options']['CALL'], chain['options']['PUT']
+        candidates = sorted({c['strike'] for c in calls + puts})
+        pains = [sum(c['openInterest'] * max(p - c['strike'], 0) for c in calls)
+                 + sum(c['openInterest'] * max(c['strike'] - p, 0) for c in puts) for p in candidates]
+        errors.append(candidates[int(np.argmin(pains))] - result['expiries']['max_pain'][e])
+    print(f"max pain matches brute force: {not np.any(errors)}")
+    print(result['expiries'].head().to_string())
+    print(result['aggregate'])
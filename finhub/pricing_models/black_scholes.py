@@ -2,6 +2,7 @@
 
 import numpy as np
 from scipy.stats import norm
+from pricing_models.greeks import black_scholes_greeks
 
 def black_scholes_price(S, K, T, r, sigma, option_type='call', q=0):
     """
@@ -78,8 +79,9 @@ def calculate_reward_ratio(S, S_low, K, T, r, sigma, option_type='call', current
     Returns:
     - Tuple of (Reward/Risk ratio, Reward ratio, Risk ratio)
     """
-    probability_ITM = black_scholes_probability_ITM(S, K, T, r, sigma, option_type, q=0)
-    probability_ITM_low = black_scholes_probability_ITM(S_low, K, T, r, sigma, option_type, q=0)
+    # both spots in one pass of the greeks engine
+    S, S_low = np.broadcast_arrays(np.asarray(S, dtype=np.float64), np.asarray(S_low, dtype=np.float64))
+    probability_ITM, probability_ITM_low = black_scholes_greeks(np.stack([S, S_low]), K, T, sigma, r, 0, option_type)['prob_itm']
     
     reward = (probability_ITM - probability_ITM_low) * 100  # Example scaling
     risk = probability_ITM_low * 100  # Example scaling
@@ -0,0 +1,148 @@
+# greeks.py
+
+import numpy as np
+from scipy.special import erfc
+
+SQRT_2 = np.sqrt(2.0)
+INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+
+def norm_cdf(x):
+    """
+    Standard normal CDF through the complementary error function, which stays accurate deep in the
+    lower tail and avoids the per-call overhead of scipy.stats.norm.
+    """
+    return 0.5 * erfc(-np.asarray(x, dtype=np.float64) / SQRT_2)
+
+
+def norm_pdf(x):
+    x = np.asarray(x, dtype=np.float64)
+    return INV_SQRT_2PI * np.exp(-0.5 * x * x)
+
+
+def call_flags(option_type):
+    """
+    Convert option types to a boolean array (True for calls).
+
+    Parameters:
+    - option_type (str, bool or array-like): 'call'/'put' strings or booleans.
+    """
+    flags = np.asarray(option_type)
+    if flags.dtype.kind in ('U', 'S', 'O'):
+        lowered = np.char.lower(flags.astype(str))
+        if not np.all((lowered == 'call') | (lowered == 'put')):
+            raise ValueError("option_type must be 'call' or 'put'")
+        return lowered == 'call'
+    return flags.astype(bool)
+
+
+def black_scholes_greeks(S, K, T, sigma, r=0.0, q=0.0, option_type='call'):
+    """
+    Price and greeks of European options under Black-Scholes in one vectorized pass. All inputs
+    broadcast against each other, so a whole chain (or several chains) is priced in a single call.
+
+    Parameters:
+    - S (float or np.ndarray): Spot prices.
+    - K (float or np.ndarray): Strike prices.
+    - T (float or np.ndarray): Times to maturity in years.
+    - sigma (float or np.ndarray): Volatilities.
+    - r (float or np.ndarray): Risk-free rates (continuous).
+    - q (float or np.ndarray): Dividend yields (continuous).
+    - option_type (str, bool or array-like): 'call'/'put' or booleans (True for calls).
+
+    Returns:
+    - dict: 'price', 'delta', 'gamma', 'vega', 'theta', 'rho' and 'prob_itm' arrays. Vega and rho
+      are per unit of volatility/rate, theta is per year. Expired contracts and zero volatility get
+      their intrinsic value on the forward.
+    """
+    S, K, T, sigma, r, q = np.broadcast_arrays(*(np.asarray(x, dtype=np.float64) for x in (S, K, T, sigma, r, q)))
+    phi = np.where(call_flags(option_type), 1.0, -1.0)
+
+    sqrt_t = np.sqrt(np.maximum(T, 0.0))
+    vol_sqrt_t = sigma * sqrt_t
+    degenerate = vol_sqrt_t <= 0
+    safe_vol = np.where(degenerate, 1.0, vol_sqrt_t)
+
+    disc_q = np.exp(-q * T)
+    disc_r = np.exp(-r * T)
+    s_disc = S * disc_q
+    k_disc = K * disc_r
+
+    d1 = (np.log(S / K) + (r - q) * T) / safe_vol + 0.5 * safe_vol
+    d2 = d1 - safe_vol
+    n_d1 = norm_cdf(phi * d1)
+    n_d2 = norm_cdf(phi * d2)
+    pdf_d1 = norm_pdf(d1)
+
+    price = phi * (s_disc * n_d1 - k_disc * n_d2)
+    delta = phi * disc_q * n_d1
+    gamma = disc_q * pdf_d1 / (S * safe_vol)
+    vega = s_disc * pdf_d1 * sqrt_t
+    theta = (-s_disc * pdf_d1 * sigma / (2.0 * np.where(degenerate, 1.0, sqrt_t))
+             - phi * r * k_disc * n_d2 + phi * q * s_disc * n_d1)
+    rho = phi * K * T * disc_r * n_d2
+
+    if np.any(degenerate):
+        itm = (phi * (s_disc - k_disc) > 0).astype(np.float64)
+        price = np.where(degenerate, itm * phi * (s_disc - k_disc), price)
+        delta = np.where(degenerate, itm * phi * disc_q, delta)
+        theta = np.where(degenerate, itm * phi * (q * s_disc - r * k_disc), theta)
+        rho = np.where(degenerate, itm * phi * K * T * disc_r, rho)
+        gamma = np.where(degenerate, 0.0, gamma)
+        vega = np.where(degenerate, 0.0, vega)
+        n_d2 = np.where(degenerate, itm, n_d2)
+
+    return {
+        'price': price,
+        'delta': delta,
+        'gamma': gamma,
+        'vega': vega,
+        'theta': theta,
+        'rho': rho,
+        'prob_itm': n_d2,
+    }
+
+
+if __name__ == "__main__":
+    # Accuracy and speed check, run from finhub/: python -m pricing_models.greeks
+    import time
+    from pricing_models.black_scholes import black_scholes_price, black_scholes_probability_ITM
+
+    rng = np.random.default_rng(7)
+    n = 50_000
+    S = rng.uniform(50, 500, n)
+    K = S * rng.uniform(0.5, 1.5, n)
+    T = rng.uniform(1 / 365, 2.0, n)
+    sigma = rng.uniform(0.05, 1.5, n)
+    r, q = 0.0463, 0.01
+    is_call = rng.random(n) < 0.5
+
+    start = time.perf_counter()
+    greeks = black_scholes_greeks(S, K, T, sigma, r, q, is_call)
+    elapsed = time.perf_counter() - start
+    print(f"{n} contracts in {elapsed * 1000:.1f} ms")
+
+    for option_type, mask in (('call', is_call), ('put', ~is_call)):
+        price = black_scholes_price(S[mask], K[mask], T[mask], r, sigma[mask], option_type, q)
+        prob = black_scholes_probability_ITM(S[mask], K[mask], T[mask], r, sigma[mask], option_type, q)
+        print(f"{option_type}: max price error {np.max(np.abs(greeks['price'][mask] - price)):.2e}, "
+              f"max prob ITM error {np.max(np.abs(greeks['prob_itm'][mask] - prob)):.2e}")
+
+    # greeks against central finite differences of the reference price
+    def ref(S_, T_, sigma_, r_):
+        call = black_scholes_price(S_, K, T_, r_, sigma_, 'call', q)
+        put = black_scholes_price(S_, K, T_, r_, sigma_, 'put', q)
+        return np.where(is_call, call, put)
+
+    h = 1e-4
+    h_t = 1e-6  # short expiries make theta very curved in T
+    finite_differences = {
+        'delta': (ref(S * (1 + h), T, sigma, r) - ref(S * (1 - h), T, sigma, r)) / (2 * h * S),
+        'gamma': (ref(S * (1 + h), T, sigma, r) - 2 * ref(S, T, sigma, r) + ref(S * (1 - h), T, sigma, r)) / (h * S) ** 2,
+        'vega': (ref(S, T, sigma + h, r) - ref(S, T, sigma - h, r)) / (2 * h),
+        'theta': -(ref(S, T + h_t, sigma, r) - ref(S, T - h_t, sigma, r)) / (2 * h_t),
+        'rho': (ref(S, T, sigma, r + h) - ref(S, T, sigma, r - h)) / (2 * h),
+    }
+    for name, estimate in finite_differences.items():
+        scale = np.maximum(np.abs(estimate), 1.0)
+        print(f"{name}: max scaled error vs finite differences {np.max(np.abs(greeks[name] - estimate) / scale):.2e}")
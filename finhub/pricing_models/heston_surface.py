@@ -0,0 +1,171 @@
+# heston_surface.py
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from scipy.optimize import least_squares
+from pricing_models.greeks import black_scholes_greeks
+from pricing_models.heston_fft import heston_fft_prices
+from pricing_models.heston_volatility import DEFAULT_HESTON_PARAMS, CALIBRATION_TOLERANCE
+
+logger = logging.getLogger(__name__)
+
+PARAM_NAMES = ['v0', 'kappa', 'theta', 'sigma', 'rho']
+LOWER_BOUNDS = np.array([1e-4, 1e-3, 1e-4, 1e-3, -0.999])
+UPPER_BOUNDS = np.array([4.0, 20.0, 4.0, 5.0, 0.999])
+JACOBIAN_STEP = 1e-6  # relative finite-difference bump of each parameter
+SURFACE_MAX_EVALUATIONS = 200
+
+
+def _surface_prices(x, S, strikes, maturities, r, q, option_type):
+    """
+    Heston prices of the whole surface for parameter vectors x of shape (P, 5).
+
+    Returns:
+    - np.ndarray: Prices of shape (P, len(maturities), len(strikes)).
+    """
+    v0, kappa, theta, sigma, rho = (x[:, i, None] for i in range(5))
+    return heston_fft_prices(S, strikes, maturities[None, :], r, q, v0, kappa, theta, sigma, rho, option_type)
+
+
+def _jacobian_columns(x, base, group, steps, S, strikes, maturities, r, q, option_type, market_prices):
+    """
+    Forward-difference Jacobian columns of the relative price residuals for the parameters in
+    `group`, with every bump priced in one batch.
+
+    Parameters:
+    - base (np.ndarray): Relative prices (model / market) at x.
+
+    Returns:
+    - np.ndarray: Columns of shape (number of quotes, len(group)).
+    """
+    points = np.tile(x, (len(group), 1))
+    points[np.arange(len(group)), group] += steps
+    prices = _surface_prices(points, S, strikes, maturities, r, q, option_type) / market_prices
+    return ((prices - base).reshape(len(group), -1) / steps[:, None]).T
+
+
+def calibrate_heston_surface(S, strikes, maturities, IV, r, q=0.0, option_type='call', initial_params=None,
+                             jacobian='batch', max_workers=1, max_evaluations=SURFACE_MAX_EVALUATIONS,
+                             tolerance=CALIBRATION_TOLERANCE):
+    """
+    Fit one set of Heston parameters to a whole implied volatility surface.
+
+    Every residual evaluation prices all maturities with one batched Carr-Madan FFT, and the
+    Jacobian bumps all five parameters in the same batch (or split across threads, which numpy's
+    FFT and ufuncs run without the GIL). Residuals are relative price errors, as the QuantLib
+    helpers of calibrate_heston_model use.
+
+    Parameters:
+    - S (float): Current stock price.
+    - strikes (np.ndarray): Strikes of shape (M,), or (len(maturities), M) for a strike grid per expiry.
+    - maturities (np.ndarray): Times to maturity in years.
+    - IV (np.ndarray): Implied volatilities of shape (len(maturities), M). NaN entries are ignored.
+    - r (float): Risk-free interest rate.
+    - q (float): Dividend yield.
+    - option_type (str): 'call' or 'put'.
+    - initial_params (dict, optional): Starting parameters, DEFAULT_HESTON_PARAMS when not given.
+    - jacobian (str): 'batch' for the batched finite-difference Jacobian, or '2-point' to let scipy
+      bump one parameter at a time.
+    - max_workers (int): Threads sharing the Jacobian columns when jacobian is 'batch'.
+    - max_evaluations (int): Maximum number of residual evaluations.
+    - tolerance (float): ftol, xtol and gtol of the least squares solver.
+
+    Returns:
+    - calibrated_params (dict): Dictionary containing calibrated parameters.
+    - info (dict): 'rmse' of the relative price errors, 'evaluations' and 'seconds'.
+    """
+    maturities = np.asarray(maturities, dtype=np.float64)
+    strikes = np.asarray(strikes, dtype=np.float64)
+    IV = np.asarray(IV, dtype=np.float64)
+    market_prices = black_scholes_greeks(S, strikes, maturities[:, None], IV, r, q, option_type)['price']
+    valid = np.isfinite(market_prices) & (market_prices > 0)
+    # ignored quotes get a unit price so they divide cleanly, and a zero residual
+    market_prices = np.where(valid, market_prices, 1.0)
+
+    last = {}  # the Jacobian is evaluated at the point of the last residuals
+
+    def relative_prices(x):
+        if last.get('x') is None or not np.array_equal(last['x'], x):
+            last['x'] = x.copy()
+            last['prices'] = _surface_prices(x[None, :], S, strikes, maturities, r, q, option_type)[0] / market_prices
+        return last['prices']
+
+    def residuals(x):
+        return np.where(valid, relative_prices(x) - 1.0, 0.0).ravel()
+
+    def batch_jacobian(x):
+        steps = JACOBIAN_STEP * np.maximum(np.abs(x), 1e-2)
+        # bump towards the inside of the bounds
+        steps = np.where(x + steps > UPPER_BOUNDS, -steps, steps)
+        groups = np.array_split(np.arange(len(x)), max(1, min(max_workers, len(x))))
+        args = (S, strikes, maturities, r, q, option_type, market_prices)
+        base = relative_prices(x)
+        if len(groups) == 1:
+            columns = _jacobian_columns(x, base, groups[0], steps, *args)
+        else:
+            with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+                columns = np.hstack(list(pool.map(
+                    lambda group: _jacobian_columns(x, base, group, steps[group], *args), groups)))
+        return np.where(valid.ravel()[:, None], columns, 0.0)
+
+    guess = initial_params or DEFAULT_HESTON_PARAMS
+    x0 = np.clip([guess[name] for name in PARAM_NAMES], LOWER_BOUNDS, UPPER_BOUNDS)
+
+    logger.info(f"Starting joint Heston calibration on {int(valid.sum())} quotes over {len(maturities)} expiries...")
+    start = time.perf_counter()
+    result = least_squares(residuals, x0, jac=batch_jacobian if jacobian == 'batch' else jacobian,
+                           bounds=(LOWER_BOUNDS, UPPER_BOUNDS), method='trf', x_scale='jac',
+                           ftol=tolerance, xtol=tolerance, gtol=tolerance, max_nfev=max_evaluations)
+    seconds = time.perf_counter() - start
+    if result.status < 0:
+        logger.error(f"Joint calibration failed: {result.message}")
+        raise RuntimeError(f"Joint calibration failed: {result.message}")
+    if result.status == 0:
+        logger.warning(f"Joint calibration stopped after {result.nfev} evaluations without converging.")
+
+    calibrated_params = dict(zip(PARAM_NAMES, result.x.tolist()))
+    info = {
+        'rmse': float(np.sqrt(np.sum(result.fun ** 2) / valid.sum())),
+        'evaluations': int(result.nfev),
+        'seconds': seconds,
+    }
+    logger.info(f"Joint calibration finished in {seconds:.3f}s ({info['evaluations']} evaluations), "
+                f"relative price RMSE {info['rmse']:.4%}.")
+    return calibrated_params, info
+
+
+if __name__ == "__main__":
+    # Benchmark on the fixture surface against per-slice calibration, run from finhub/:
+    # python -m pricing_models.heston_surface
+    import os
+    from pricing_models import surface_fixture as fixture
+    from pricing_models.heston_volatility import calibrate_heston_model
+    from pricing_models.implied_vol import implied_volatility
+
+    S, r, q = fixture.SPOT, fixture.RISK_FREE_RATE, fixture.DIVIDEND_RATE
+    strikes, IV, maturities = fixture.STRIKES, fixture.IMPLIED_VOLS, fixture.maturities()
+    market = black_scholes_greeks(S, strikes, maturities[:, None], IV, r, q, 'call')['price']
+
+    def report(label, seconds, model_prices):
+        model_iv = implied_volatility(model_prices, S, strikes, maturities[:, None], r, q, 'call')
+        price_error = model_prices / market - 1.0
+        print(f"{label:>24}: {seconds:7.3f}s, relative price RMSE {np.sqrt(np.mean(price_error ** 2)):.3%}, "
+              f"IV RMSE {np.sqrt(np.nanmean((model_iv - IV) ** 2)) * 1e4:6.1f} bp")
+
+    # one QuantLib calibration per expiry, each fitting its own parameters
+    start = time.perf_counter()
+    slice_params = [calibrate_heston_model(S, strikes, T, r, q, iv, 'call')[1] for T, iv in zip(maturities, IV)]
+    slice_seconds = time.perf_counter() - start
+    stacked = {name: np.array([p[name] for p in slice_params])[:, None] for name in PARAM_NAMES}
+    slice_prices = heston_fft_prices(S, strikes, maturities[:, None], r, q, stacked['v0'], stacked['kappa'],
+                                     stacked['theta'], stacked['sigma'], stacked['rho'])[:, 0]
+    report(f"per-slice ({len(maturities)} fits)", slice_seconds, slice_prices)
+
+    for jacobian, workers in (('2-point', 1), ('batch', 1), ('batch', os.cpu_count() or 1)):
+        params, info = calibrate_heston_surface(S, strikes, maturities, IV, r, q, jacobian=jacobian, max_workers=workers)
+        joint_prices = _surface_prices(np.array([[params[name] for name in PARAM_NAMES]]),
+                                       S, strikes, maturities, r, q, 'call')[0]
+        report(f"joint {jacobian} x{workers}", info['seconds'], joint_prices)
+    print("joint parameters: " + ", ".join(f"{name} = {value:.4f}" for name, value in params.items()))
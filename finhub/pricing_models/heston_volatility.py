@@ -3,12 +3,27 @@
 import QuantLib as ql
 import numpy as np
 from scipy.interpolate import interp1d
+from pricing_models.vol_surface import group_mean
+import hashlib
+import json
 import logging
+import os
+import time
 
 # Setup logging for this module
 logging.basicConfig(level=logging.INFO)  # Set to DEBUG for detailed logs
 logger = logging.getLogger(__name__)
 
+# Default guess of a cold calibration
+DEFAULT_HESTON_PARAMS = {'v0': 0.04, 'kappa': 1.5, 'theta': 0.04, 'sigma': 0.3, 'rho': -0.5}
+# Levenberg-Marquardt budgets: a warm start from nearby parameters needs far fewer iterations
+COLD_MAX_ITERATIONS = 1000
+WARM_MAX_ITERATIONS = 100
+MAX_STATIONARY_ITERATIONS = 100
+CALIBRATION_TOLERANCE = 1.0e-8
+# Calibration cache entries not refreshed for this long are dropped
+CACHE_MAX_AGE = 7 * 24 * 3600
+
 def create_volatility_surface(strikes, volatilities):
     """
     Create an interpolation function for implied volatility based on strike prices.
@@ -20,31 +35,33 @@ def create_volatility_surface(strikes, volatilities):
     Returns:
     - interp_func: A callable interpolation function for implied volatility.
     """
-    # Sort the strikes and volatilities
-    sorted_indices = np.argsort(strikes)
-    sorted_strikes = np.array(strikes)[sorted_indices]
-    sorted_vols = np.array(volatilities)[sorted_indices]
-    
-    # Handle duplicate strikes by averaging volatilities
-    unique_strikes, inverse_indices = np.unique(sorted_strikes, return_inverse=True)
-    averaged_vols = np.array([sorted_vols[inverse_indices == i].mean() for i in range(len(unique_strikes))])
+    # Handle duplicate strikes by averaging volatilities (sorted by strike)
+    unique_strikes, averaged_vols = group_mean(strikes, volatilities)
     
     # Create an interpolation function
     interp_func = interp1d(unique_strikes, averaged_vols, kind='cubic', fill_value="extrapolate")
     return interp_func
 
-def calibrate_heston_model(S, K_list, time_to_maturity, r, q, IV_list, option_type='call'):
+def calibrate_heston_model(S, K_list, time_to_maturity, r, q, IV_list, option_type='call',
+                           initial_params=None, max_iterations=COLD_MAX_ITERATIONS,
+                           max_stationary_iterations=MAX_STATIONARY_ITERATIONS,
+                           tolerance=CALIBRATION_TOLERANCE):
     """
     Calibrates the Heston model parameters to fit market option prices.
     
     Parameters:
     - S (float): Current stock price.
     - K_list (list of float): List of strike prices.
-    - exp_date (ql.Date): Expiration date.
+    - time_to_maturity (float): Time to maturity in years.
     - r (float): Risk-free interest rate.
     - q (float): Dividend yield.
-    - option_prices (list or np.ndarray): Array of option prices corresponding to K_list.
+    - IV_list (list or np.ndarray): Implied volatilities corresponding to K_list.
     - option_type (str): 'call' or 'put'.
+    - initial_params (dict, optional): Starting 'v0', 'kappa', 'theta', 'sigma' and 'rho', e.g. the
+      result of a previous calibration. DEFAULT_HESTON_PARAMS when not given.
+    - max_iterations (int): Iteration budget of Levenberg-Marquardt.
+    - max_stationary_iterations (int): Stop after this many iterations without improvement.
+    - tolerance (float): Root, function and gradient epsilon of the end criteria.
     
     Returns:
     - heston_model (HestonModel): The calibrated Heston model.
@@ -58,12 +75,12 @@ def calibrate_heston_model(S, K_list, time_to_maturity, r, q, IV_list, option_ty
     logger.info(f"Today's Date set to: {todays_date}")
     
     # Initial guesses for Heston parameters
-    initial_vol = 0.2
-    v0 = initial_vol ** 2
-    kappa = 1.5
-    theta = initial_vol ** 2
-    sigma = 0.3
-    rho = -0.5
+    guess = initial_params or DEFAULT_HESTON_PARAMS
+    v0 = guess['v0']
+    kappa = guess['kappa']
+    theta = guess['theta']
+    sigma = guess['sigma']
+    rho = guess['rho']
     # v0 = 0.01; kappa = 0.2; theta = 0.02; rho = -0.75; sigma = 0.5;
 
     # Create Yield Term Structures
@@ -117,12 +134,16 @@ def calibrate_heston_model(S, K_list, time_to_maturity, r, q, IV_list, option_ty
     
     # Calibrate the model using the helpers
     optimization_method = ql.LevenbergMarquardt()
-    end_criteria = ql.EndCriteria(1000, 100, 1.0e-8,1.0e-8, 1.0e-8)
+    # QuantLib requires fewer stationary iterations than iterations
+    max_stationary_iterations = min(max_stationary_iterations, max_iterations - 1)
+    end_criteria = ql.EndCriteria(max_iterations, max_stationary_iterations, tolerance, tolerance, tolerance)
     
     try:
         logger.info("Starting calibration process...")
+        start = time.perf_counter()
         heston_model.calibrate(option_helpers, optimization_method, end_criteria)
-        logger.info("Calibration successful.")
+        logger.info(f"Calibration successful in {time.perf_counter() - start:.3f}s "
+                    f"({'warm' if initial_params else 'cold'} start).")
     except Exception as e:
         logger.error(f"Calibration failed: {e}")
         raise RuntimeError(f"Calibration failed: {e}")
@@ -161,4 +182,227 @@ def calibrate_heston_model(S, K_list, time_to_maturity, r, q, IV_list, option_ty
     # print ("-"*70)
     print ("Average Abs Error (%%) : %5.3f" % (avg))
     
-    return heston_model, calibrated_params
\ No newline at end of file
+    return heston_model, calibrated_params
+
+class HestonPricingContext:
+    """
+    Prices European options of one expiry under calibrated Heston parameters.
+
+    The process, model and engine are built once and the spot is a SimpleQuote, so repricing under
+    another spot scenario only moves the quote. Options are created once per (strike, type) and
+    reused by every scenario.
+    """
+    def __init__(self, params, exp_date, r, q=0, todays_date=None):
+        """
+        Parameters:
+        - params (dict): Calibrated 'v0', 'kappa', 'theta', 'sigma' and 'rho'.
+        - exp_date (ql.Date): Expiration date.
+        - r (float): Risk-free interest rate.
+        - q (float): Dividend yield.
+        - todays_date (ql.Date, optional): Evaluation date, today by default.
+        """
+        todays_date = todays_date or ql.Date.todaysDate()
+        ql.Settings.instance().evaluationDate = todays_date
+        self.exp_date = exp_date
+        self.spot_quote = ql.SimpleQuote(1.0)
+        self.risk_free_curve = ql.YieldTermStructureHandle(ql.FlatForward(todays_date, r, ql.Actual365Fixed()))
+        self.dividend_curve = ql.YieldTermStructureHandle(ql.FlatForward(todays_date, q, ql.Actual365Fixed()))
+        self.process = ql.HestonProcess(
+            self.risk_free_curve,
+            self.dividend_curve,
+            ql.QuoteHandle(self.spot_quote),
+            params['v0'],
+            params['kappa'],
+            params['theta'],
+            params['sigma'],
+            params['rho']
+        )
+        self.model = ql.HestonModel(self.process)
+        self.engine = ql.AnalyticHestonEngine(self.model)
+        self.exercise = ql.EuropeanExercise(exp_date)
+        self.options = {}  # (strike, option type) -> ql.EuropeanOption
+
+    def _option(self, strike, option_type):
+        key = (float(strike), option_type)
+        option = self.options.get(key)
+        if option is None:
+            payoff_type = ql.Option.Call if option_type == 'call' else ql.Option.Put
+            option = ql.EuropeanOption(ql.PlainVanillaPayoff(payoff_type, float(strike)), self.exercise)
+            option.setPricingEngine(self.engine)
+            self.options[key] = option
+        return option
+
+    def price(self, spot, strikes, option_type='call'):
+        """
+        Price every strike at one spot.
+
+        Returns:
+        - np.ndarray: Option prices in the order of `strikes`.
+        """
+        self.spot_quote.setValue(float(spot))
+        return np.array([self._option(K, option_type).NPV() for K in strikes])
+
+    def price_scenarios(self, spots, strikes, option_type='call'):
+        """
+        Price every strike under every spot scenario.
+
+        Returns:
+        - np.ndarray: Prices of shape (len(spots), len(strikes)).
+        """
+        return np.array([self.price(spot, strikes, option_type) for spot in spots]).reshape(len(spots), len(strikes))
+
+
+def build_heston_model(S, params, r, q=0, todays_date=None):
+    """
+    Rebuild a HestonModel from calibrated parameters without calibrating.
+    """
+    todays_date = todays_date or ql.Date.todaysDate()
+    ql.Settings.instance().evaluationDate = todays_date
+    process = ql.HestonProcess(
+        ql.YieldTermStructureHandle(ql.FlatForward(todays_date, r, ql.Actual365Fixed())),
+        ql.YieldTermStructureHandle(ql.FlatForward(todays_date, q, ql.Actual365Fixed())),
+        ql.QuoteHandle(ql.SimpleQuote(S)),
+        params['v0'],
+        params['kappa'],
+        params['theta'],
+        params['sigma'],
+        params['rho']
+    )
+    return ql.HestonModel(process)
+
+
+class HestonCalibrationCache:
+    """
+    Latest calibrated Heston parameters per symbol and expiry, with a hash of their calibration
+    inputs (spot, strikes and IVs). Identical inputs are served without calibrating; otherwise the
+    most recent parameters of the same or the nearest expiry are used as a warm start. Entries of
+    expired expiries or older than `max_age` seconds are dropped. Optionally persisted as JSON so
+    warm starts survive restarts.
+    """
+    def __init__(self, path=None, max_age=CACHE_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.entries = {}  # symbol -> expiry -> {'input_hash', 'params', 'calibrated_at'}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring calibration cache {path}: {e}")
+            if not all(isinstance(expiries, dict) and all(isinstance(e, dict) and 'input_hash' in e for e in expiries.values())
+                       for expiries in self.entries.values()):
+                logger.warning(f"Ignoring calibration cache {path} in an older format.")
+                self.entries = {}
+        self.prune()
+
+    @staticmethod
+    def input_hash(S, K_list, IV_list):
+        """
+        Hash the calibration inputs, rounded so that float noise does not defeat the cache.
+        """
+        digest = hashlib.sha256()
+        digest.update(np.round(float(S), 4).tobytes())
+        digest.update(np.round(np.asarray(K_list, dtype=np.float64), 4).tobytes())
+        digest.update(np.round(np.asarray(IV_list, dtype=np.float64), 6).tobytes())
+        return digest.hexdigest()[:16]
+
+    def prune(self, now=None):
+        """
+        Drop the entries of expiries before today and the entries older than max_age.
+
+        Returns:
+        - int: Number of entries dropped.
+        """
+        now = time.time() if now is None else now
+        today = time.strftime('%Y-%m-%d', time.localtime(now))
+        dropped = 0
+        for symbol in list(self.entries):
+            expiries = self.entries[symbol]
+            for expiry in [e for e, entry in expiries.items()
+                           if e < today or now - entry['calibrated_at'] > self.max_age]:
+                del expiries[expiry]
+                dropped += 1
+            if not expiries:
+                del self.entries[symbol]
+        return dropped
+
+    def get(self, symbol, expiry, input_hash):
+        entry = self.entries.get(symbol, {}).get(expiry)
+        return entry['params'] if entry and entry['input_hash'] == input_hash else None
+
+    def nearest(self, symbol, expiry):
+        """
+        Return the parameters of the same expiry, else of the closest expiry of the symbol, or None.
+
+        Parameters:
+        - expiry (str): Expiration date in 'YYYY-MM-DD' format.
+        """
+        expiries = self.entries.get(symbol)
+        if not expiries:
+            return None
+        target = np.datetime64(expiry)
+        closest = min(expiries, key=lambda e: (abs(int((np.datetime64(e) - target).astype(int))),
+                                               -expiries[e]['calibrated_at']))
+        return expiries[closest]['params']
+
+    def put(self, symbol, expiry, input_hash, params):
+        self.entries.setdefault(symbol, {})[expiry] = {
+            'input_hash': input_hash,
+            'params': {k: float(v) for k, v in params.items()},
+            'calibrated_at': time.time(),
+        }
+        self.prune()
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+def calibrate_heston_model_cached(cache, symbol, expiry, S, K_list, time_to_maturity, r, q, IV_list,
+                                  option_type='call', warm_max_iterations=WARM_MAX_ITERATIONS):
+    """
+    calibrate_heston_model through a HestonCalibrationCache: identical inputs return the cached
+    parameters, other inputs are warm-started from the nearest cached expiry with a smaller
+    iteration budget, and a cold calibration is only run for a symbol seen for the first time.
+
+    Parameters:
+    - cache (HestonCalibrationCache): Calibration cache.
+    - symbol (str): Stock ticker symbol.
+    - expiry (str): Expiration date in 'YYYY-MM-DD' format.
+    - Other parameters as in calibrate_heston_model.
+
+    Returns:
+    - heston_model (HestonModel): The calibrated Heston model.
+    - calibrated_params (dict): Dictionary containing calibrated parameters.
+    """
+    input_hash = cache.input_hash(S, K_list, IV_list)
+    params = cache.get(symbol, expiry, input_hash)
+    if params is not None:
+        logger.info(f"Using cached Heston calibration for {symbol} {expiry}.")
+        return build_heston_model(S, params, r, q), params
+
+    heston_model, params = calibrate_heston_model_warm(S, K_list, time_to_maturity, r, q, IV_list, option_type,
+                                                       cache.nearest(symbol, expiry), warm_max_iterations)
+    cache.put(symbol, expiry, input_hash, params)
+    return heston_model, params
+
+
+def calibrate_heston_model_warm(S, K_list, time_to_maturity, r, q, IV_list, option_type='call',
+                                initial_params=None, warm_max_iterations=WARM_MAX_ITERATIONS):
+    """
+    calibrate_heston_model from `initial_params` with the warm iteration budget, falling back to a
+    cold calibration if the warm start fails. Without `initial_params` this is a cold calibration.
+    """
+    try:
+        budget = warm_max_iterations if initial_params else COLD_MAX_ITERATIONS
+        return calibrate_heston_model(S, K_list, time_to_maturity, r, q, IV_list, option_type,
+                                      initial_params=initial_params, max_iterations=budget)
+    except RuntimeError:
+        if initial_params is None:
+            raise
+        logger.warning("Warm-started calibration failed, retrying from the default guess.")
+        return calibrate_heston_model(S, K_list, time_to_maturity, r, q, IV_list, option_type)
@@ -0,0 +1,255 @@
+# vol_surface.py
+
+from datetime import date, datetime
+import numpy as np
+from pricing_models.implied_vol import chain_implied_volatility
+
+QUOTE_FIELDS = ['strike', 'impliedVolatility', 'bid', 'ask', 'lastPrice']  # compared between polls
+
+
+def group_mean(keys, values, weights=None):
+    """
+    Weighted mean of `values` per unique key, with one bincount pass instead of a scan per key.
+
+    Parameters:
+    - keys (np.ndarray): Group keys, e.g. strikes.
+    - values (np.ndarray): Values to average. NaN values are ignored.
+    - weights (np.ndarray, optional): Non-negative weights, equal weights by default.
+
+    Returns:
+    - (np.ndarray, np.ndarray): Sorted unique keys and their means (NaN where a key has no weight).
+    """
+    keys = np.asarray(keys, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64)
+    weights = np.where(np.isfinite(values), weights, 0.0)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=weights * np.nan_to_num(values), minlength=len(unique_keys))
+    counts = np.bincount(inverse, weights=weights, minlength=len(unique_keys))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return unique_keys, np.where(counts > 0, totals / counts, np.nan)
+
+
+class VolSurface:
+    """
+    Implied volatility surface over log-moneyness log(K / F(T)) and time to maturity.
+
+    Each expiry is a slice of total implied variance w = sigma^2 * T on its sorted log-moneyness
+    nodes, interpolated linearly in log-moneyness (flat beyond the wings). Between expiries total
+    variance is interpolated linearly in T at fixed log-moneyness, after a running maximum over T
+    removes calendar arbitrage; before the first expiry and after the last one the implied vol of
+    the nearest slice is held flat.
+
+    Slices are stored per expiry, so a poll where only some expiries changed only rebuilds those.
+    update_chain compares the raw quotes of every expiry with the previous poll before solving any
+    IV, so unchanged expiries cost one array comparison; their IVs stay fixed in strike when only
+    the spot moves.
+    """
+    def __init__(self, S, r=0.0, q=0.0):
+        """
+        Parameters:
+        - S (float): Spot price.
+        - r (float): Risk-free interest rate.
+        - q (float): Dividend yield.
+        """
+        self.S = float(S)
+        self.r = r
+        self.q = q
+        self.slices = {}  # expiry -> (T, strikes, ivs, log-moneyness nodes, total variance)
+        self._stack = None  # (maturities, slice list) sorted by T, rebuilt lazily
+        self.quotes = {}  # expiry -> (T, raw quotes) of the last update_chain
+
+    def forward(self, T):
+        return self.S * np.exp((self.r - self.q) * np.asarray(T, dtype=np.float64))
+
+    def update_slice(self, expiry, T, strikes, ivs, weights=None):
+        """
+        Replace the quotes of one expiry. Duplicate strikes (e.g. a call and a put) are averaged.
+
+        Parameters:
+        - expiry (str): Expiration date, used as the slice key.
+        - T (float): Time to maturity in years.
+        - strikes, ivs (array-like): Strikes and implied volatilities (decimal). NaN IVs are ignored.
+        - weights (array-like, optional): Weights of the quotes in the average, e.g. volumes.
+
+        Returns:
+        - bool: True if the slice changed.
+        """
+        unique_strikes, mean_ivs = group_mean(strikes, ivs, weights)
+        keep = np.isfinite(mean_ivs) & (mean_ivs > 0)
+        unique_strikes, mean_ivs = unique_strikes[keep], mean_ivs[keep]
+        if T <= 0 or len(unique_strikes) == 0:
+            return self.remove_slice(expiry)
+
+        old = self.slices.get(expiry)
+        if old is not None and old[0] == T and np.array_equal(old[1], unique_strikes) and np.array_equal(old[2], mean_ivs):
+            return False
+        log_moneyness = np.log(unique_strikes / self.forward(T))
+        self.slices[expiry] = (float(T), unique_strikes, mean_ivs, log_moneyness, mean_ivs ** 2 * T)
+        self._stack = None
+        return True
+
+    def remove_slice(self, expiry):
+        removed = self.slices.pop(expiry, None) is not None
+        if removed:
+            self._stack = None
+        return removed
+
+    def update_chain(self, options_data, today=None, sides=('CALL', 'PUT')):
+        """
+        Apply a Finnhub option chain. Expiries whose raw quotes did not change since the previous
+        call are skipped before any IV is solved, and expiries no longer listed are dropped.
+
+        Parameters:
+        - options_data (list): Finnhub chain entries with 'expirationDate' and 'options'.
+        - today (date, optional): Valuation date, today by default.
+        - sides (tuple): Sides of the chain to use.
+
+        Returns:
+        - list: Expiries whose slice changed.
+        """
+        today = today or date.today()
+        changed = []
+        listed = set()
+        for entry in options_data:
+            expiry = entry['expirationDate']
+            listed.add(expiry)
+            T = (datetime.strptime(expiry, "%Y-%m-%d").date() - today).days / 365.0
+            raw = np.array([[i] + [c.get(field) for field in QUOTE_FIELDS]
+                            for i, side in enumerate(sides) for c in entry['options'].get(side) or []],
+                           dtype=np.float64)  # None -> NaN
+            previous = self.quotes.get(expiry)
+            if previous is not None and previous[0] == T and previous[1].shape == raw.shape \
+                    and np.array_equal(previous[1], raw, equal_nan=True):
+                continue
+            self.quotes[expiry] = (T, raw)
+            strikes, ivs = [], []
+            for side in sides:
+                contracts = entry['options'].get(side) or []
+                if not contracts or T <= 0:
+                    continue
+                side_strikes, solved = chain_implied_volatility(contracts, self.S, T, self.r, self.q, side.lower())
+                quoted = np.array([c.get('impliedVolatility') or np.nan for c in contracts], dtype=np.float64) / 100
+                strikes.append(side_strikes)
+                # IV solved from the current quotes first, Finnhub's (often stale) IV where they cannot be inverted
+                ivs.append(np.where(np.isfinite(solved), solved, np.where(quoted > 0, quoted, np.nan)))
+            if strikes and self.update_slice(expiry, T, np.concatenate(strikes), np.concatenate(ivs)):
+                changed.append(expiry)
+            elif not strikes and self.remove_slice(expiry):
+                changed.append(expiry)
+        for expiry in set(self.slices) - listed:
+            self.remove_slice(expiry)
+            changed.append(expiry)
+        for expiry in set(self.quotes) - listed:
+            del self.quotes[expiry]
+        return changed
+
+    def set_spot(self, S):
+        """
+        Move the spot. Quotes are kept in strike, so every slice's log-moneyness is recomputed.
+        """
+        self.S = float(S)
+        for expiry, (T, strikes, ivs, _, w) in self.slices.items():
+            self.slices[expiry] = (T, strikes, ivs, np.log(strikes / self.forward(T)), w)
+        self._stack = None
+
+    def _stacked(self):
+        if self._stack is None:
+            ordered = sorted(self.slices.values(), key=lambda s: s[0])
+            self._stack = (np.array([s[0] for s in ordered]), ordered)
+        return self._stack
+
+    def total_variance(self, K, T):
+        """
+        Total implied variance sigma^2 * T at arbitrary strikes and maturities (broadcast together).
+        """
+        maturities, ordered = self._stacked()
+        if not ordered:
+            raise ValueError("The volatility surface has no slices.")
+        K, T = np.broadcast_arrays(np.asarray(K, dtype=np.float64), np.asarray(T, dtype=np.float64))
+        k = np.log(K / self.forward(T)).ravel()
+        t = T.ravel()
+
+        # total variance of every slice at the requested log-moneyness, shape (slices, points)
+        w = np.array([np.interp(k, s[3], s[4]) for s in ordered])
+        w = np.maximum.accumulate(w, axis=0)
+
+        i = np.clip(np.searchsorted(maturities, t), 1, max(len(maturities) - 1, 1))
+        points = np.arange(len(t))
+        if len(maturities) == 1:
+            result = w[0] * t / maturities[0]
+        else:
+            t0, t1 = maturities[i - 1], maturities[i]
+            w0, w1 = w[i - 1, points], w[i, points]
+            result = w0 + (w1 - w0) * (t - t0) / (t1 - t0)
+            # flat implied vol outside the listed expiries
+            result = np.where(t <= maturities[0], w[0] * t / maturities[0], result)
+            result = np.where(t >= maturities[-1], w[-1] * t / maturities[-1], result)
+        return np.maximum(result, 0.0).reshape(K.shape)
+
+    def implied_vol(self, K, T):
+        """
+        Implied volatilities at arbitrary strikes and maturities (broadcast together), e.g.
+        implied_vol(strikes[None, :], maturities[:, None]) for a whole grid.
+        """
+        T = np.asarray(T, dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.total_variance(K, T) / T)
+
+
+if __name__ == "__main__":
+    # Checks on the fixture surface, run from finhub/: python -m pricing_models.vol_surface
+    import time
+    from pricing_models import surface_fixture as fixture
+
+    surface = VolSurface(fixture.SPOT, fixture.RISK_FREE_RATE, fixture.DIVIDEND_RATE)
+    maturities = fixture.maturities()
+    for expiry, T, ivs in zip(fixture.EXPIRATION_DATES, maturities, fixture.IMPLIED_VOLS):
+        surface.update_slice(expiry.isoformat(), T, fixture.STRIKES, ivs)
+
+    nodes = surface.implied_vol(fixture.STRIKES[None, :], maturities[:, None])
+    print(f"max error at the quotes: {np.abs(nodes - fixture.IMPLIED_VOLS).max():.2e}")
+
+    strikes = np.linspace(0.7, 1.3, 400) * fixture.SPOT
+    T = np.linspace(0.01, 2.5, 250)
+    start = time.perf_counter()
+    w = surface.total_variance(strikes[None, :], T[:, None])
+    print(f"{w.size} grid points in {(time.perf_counter() - start) * 1000:.1f} ms, "
+          f"calendar arbitrage free: {bool(np.all(np.diff(w, axis=0) >= -1e-12))}")
+
+    # duplicate strikes against the per-strike mean loop
+    rng = np.random.default_rng(3)
+    keys = rng.choice(np.arange(50, 500, 2.5), 200_000)
+    values = rng.uniform(0.1, 0.9, keys.size)
+    start = time.perf_counter()
+    unique_keys, means = group_mean(keys, values)
+    bincount_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    inverse = np.unique(keys, return_inverse=True)[1]
+    loop_means = np.array([values[inverse == i].mean() for i in range(len(unique_keys))])
+    loop_seconds = time.perf_counter() - start
+    print(f"group mean of {keys.size} quotes: bincount {bincount_seconds * 1000:.1f} ms, "
+          f"loop {loop_seconds * 1000:.1f} ms, max difference {np.abs(means - loop_means).max():.1e}")
+
+    # an unchanged poll rebuilds nothing
+    changed = [surface.update_slice(expiry.isoformat(), T, fixture.STRIKES, ivs)
+               for expiry, T, ivs in zip(fixture.EXPIRATION_DATES, maturities, fixture.IMPLIED_VOLS)]
+    print(f"slices rebuilt on an unchanged poll: {sum(changed)}")
+
+    # update_chain only solves the expiries whose raw quotes changed
+    from pricing_models.greeks import black_scholes_greeks
+    chain = []
+    for expiry, T, ivs in zip(fixture.EXPIRATION_DATES, maturities, fixture.IMPLIED_VOLS):
+        prices = black_scholes_greeks(fixture.SPOT, fixture.STRIKES, T, ivs, fixture.RISK_FREE_RATE, fixture.DIVIDEND_RATE)['price']
+        chain.append({'expirationDate': expiry.isoformat(),
+                      'options': {'CALL': [{'strike': float(k), 'bid': float(p) * 0.99, 'ask': float(p) * 1.01, 'lastPrice': float(p)}
+                                           for k, p in zip(fixture.STRIKES, prices)]}})
+    chain_surface = VolSurface(fixture.SPOT, fixture.RISK_FREE_RATE, fixture.DIVIDEND_RATE)
+    today = fixture.CALCULATION_DATE
+    for label in ('first poll', 'unchanged poll', 'one expiry changed'):
+        if label == 'one expiry changed':
+            for field in ('bid', 'ask'):
+                chain[3]['options']['CALL'][4][field] *= 1.05
+        start = time.perf_counter()
+        changed = chain_surface.update_chain(chain, today)
+        print(f"update_chain {label}: {len(changed)} slices rebuilt in {(time.perf_counter() - start) * 1000:.1f} ms")
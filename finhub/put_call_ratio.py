@@ -4,11 +4,27 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from engine import FinnhubEngine  # using your existing engine
+from option_flow import option_flow_metrics
 
 # Use a Seaborn theme for a more modern aesthetic.
 sns.set_theme(style="whitegrid")
 
-def analyze_option_chain(symbol, output_path='temp_plot.png'):
+# Figures reused across renders, keyed by (number of chains, figure width)
+_figure_templates = {}
+
+
+def _get_figure(num_chains, width):
+    key = (num_chains, width)
+    if key not in _figure_templates:
+        fig, axs = plt.subplots(num_chains, 1, figsize=(width, width / 2 * num_chains))
+        _figure_templates[key] = (fig, np.atleast_1d(axs))
+    fig, axs = _figure_templates[key]
+    for ax in axs:
+        ax.clear()
+    return fig, axs
+
+
+def analyze_option_chain(symbol, output_path='temp_plot.png', dpi=300):
     engine = FinnhubEngine()
     
     # Retrieve the option chain data from Finnhub API.
@@ -18,82 +34,53 @@ def analyze_option_chain(symbol, output_path='temp_plot.png'):
     except Exception as e:
         print(f"Error retrieving option chain data: {e}")
         return
+    return plot_option_chain(symbol, option_chain_data, output_path, dpi=dpi)
+
+
+def plot_option_chain(symbol, option_chain_data, output_path, dpi=300, width=12):
+    """
+    Plot the call/put volume distribution of the next three option chains.
+
+    Parameters:
+    - symbol (str): Stock ticker symbol.
+    - option_chain_data (list): Option chains as returned by FinnhubEngine.get_option_chain.
+    - output_path (str): PNG file to write.
+    - dpi (int): Resolution of the PNG.
+    - width (float): Figure width in inches, each chain adds a subplot of half that height.
 
+    Returns:
+    - str: output_path
+    """
     # Plot the next three option chain distributions
     chains_to_plot = option_chain_data[:3]
     num_chains = len(chains_to_plot)
     
-    # Create a figure with one subplot per option chain.
-    fig, axs = plt.subplots(num_chains, 1, figsize=(12, 6 * num_chains))
-    if num_chains == 1:
-        axs = [axs]
+    # Reuse a figure with one subplot per option chain.
+    fig, axs = _get_figure(num_chains, width)
     
-    for idx, chain in enumerate(chains_to_plot):
-        ax = axs[idx]
-        
-        # Extract overall stats for display in the subplot title.
-        overall_call_volume = chain.get('callVolume')
-        overall_put_volume = chain.get('putVolume')
-        overall_volume_ratio = chain.get('putCallVolumeRatio')
-        overall_call_open_interest = chain.get('callOpenInterest')
-        overall_put_open_interest = chain.get('putOpenInterest')
-        overall_open_interest_ratio = chain.get('putCallOpenInterestRatio')
-        chain_expiration = chain.get('expirationDate')
-        
-        # Extract the options lists for calls and puts.
-        try:
-            call_list = chain['options']['CALL']
-            put_list = chain['options']['PUT']
-        except KeyError as e:
-            print(f"Missing options data in chain {idx}: {e}")
-            continue
-
-        # Convert lists to DataFrames.
-        call_df = pd.DataFrame(call_list)
-        put_df = pd.DataFrame(put_list)
-
-        # Ensure 'strike' and 'volume' columns are numeric.
-        for col in ['strike', 'volume']:
-            if col in call_df.columns:
-                call_df[col] = pd.to_numeric(call_df[col], errors='coerce')
-            if col in put_df.columns:
-                put_df[col] = pd.to_numeric(put_df[col], errors='coerce')
-
-        # Drop rows with missing values in 'strike' or 'volume' and sort by strike.
-        call_df.dropna(subset=['strike', 'volume'], inplace=True)
-        put_df.dropna(subset=['strike', 'volume'], inplace=True)
-        call_df.sort_values('strike', inplace=True)
-        put_df.sort_values('strike', inplace=True)
-
-        # Filter out strikes with very small volume.
-        call_threshold = 0.05 * call_df['volume'].max() if not call_df.empty else 0
-        put_threshold = 0.05 * put_df['volume'].max() if not put_df.empty else 0
-        call_df_filtered = call_df[call_df['volume'] >= call_threshold].copy()
-        put_df_filtered = put_df[put_df['volume'] >= put_threshold].copy()
-
-        # Compute weighted mean strike price for calls and puts.
-        if call_df_filtered['volume'].sum() > 0:
-            mean_strike_call = (call_df_filtered['strike'] * call_df_filtered['volume']).sum() / call_df_filtered['volume'].sum()
-        else:
-            mean_strike_call = np.nan
+    # All the numbers come from the compute-only analytics; this function only draws them
+    flow = option_flow_metrics(chains_to_plot)
+    strike_rows = flow['strikes']
 
-        if put_df_filtered['volume'].sum() > 0:
-            mean_strike_put = (put_df_filtered['strike'] * put_df_filtered['volume']).sum() / put_df_filtered['volume'].sum()
-        else:
-            mean_strike_put = np.nan
+    for idx, chain_metrics in flow['expiries'].iterrows():
+        ax = axs[idx]
+        chain_expiration = chain_metrics['expirationDate']
+        overall_volume_ratio = chain_metrics['pc_volume_ratio']
+        overall_open_interest_ratio = chain_metrics['pc_oi_ratio']
+        mean_strike_call = chain_metrics['call_mean_strike']
+        mean_strike_put = chain_metrics['put_mean_strike']
 
         print(f"Chain {idx+1} (Expiration {chain_expiration}):")
         print(f"  Weighted mean strike (Call): {mean_strike_call:.2f}")
         print(f"  Weighted mean strike (Put): {mean_strike_put:.2f}")
 
-        # Merge the filtered DataFrames on 'strike'.
-        merged_df = pd.merge(call_df_filtered[['strike', 'volume']], 
-                             put_df_filtered[['strike', 'volume']], 
-                             on='strike', 
-                             how='outer', 
-                             suffixes=('_call', '_put'))
-        merged_df.fillna(0, inplace=True)
-        merged_df.sort_values('strike', inplace=True)
+        # Strikes with enough call or put volume, the other side shown only where it passes the filter too
+        rows = strike_rows[(strike_rows['expiry'] == idx) & (strike_rows['call_active'] | strike_rows['put_active'])]
+        merged_df = pd.DataFrame({
+            'strike': rows['strike'],
+            'volume_call': rows['call_volume'] * rows['call_active'],
+            'volume_put': rows['put_volume'] * rows['put_active'],
+        })
         
         # Plot the call and put volumes as grouped bar charts.
         x = merged_df['strike'].values
@@ -105,8 +92,8 @@ def analyze_option_chain(symbol, output_path='temp_plot.png'):
         ax.set_xlabel("Strike Price")
         ax.set_ylabel("Volume")
         # Format the call/put ratio as a percentage with 1 decimal.
-        vol_ratio_percent = overall_volume_ratio * 100 if overall_volume_ratio is not None else 0
-        overall_open_interest_ratio = overall_open_interest_ratio * 100 if overall_open_interest_ratio is not None else 0
+        vol_ratio_percent = overall_volume_ratio * 100 if np.isfinite(overall_volume_ratio) else 0
+        overall_open_interest_ratio = overall_open_interest_ratio * 100 if np.isfinite(overall_open_interest_ratio) else 0
         title = (f"{symbol} Option Volume Distribution\nExpiration: {chain_expiration}\n"
                  f"Overall Vol Ratio (Put/Call): {vol_ratio_percent:.1f}%, "
                  f"Open Interest Ratio (Put/Call): {overall_open_interest_ratio:.1f}%")
@@ -150,10 +137,9 @@ def analyze_option_chain(symbol, output_path='temp_plot.png'):
         
         ax.legend()
 
-    plt.tight_layout()
+    fig.tight_layout()
     # plt.show()
-    plt.savefig(output_path, dpi=300)
-    plt.close(fig)
+    fig.savefig(output_path, dpi=dpi)
     return output_path
 
 # For standalone testing
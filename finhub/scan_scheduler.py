@@ -0,0 +1,136 @@
+# scan_scheduler.py
+
+import asyncio
+import time
+from buy_signal_bot import BuySignalDetector
+from telemetry import REGISTRY
+
+SCAN_CONCURRENCY = 4  # number of detectors evaluated at the same time
+GOOD_BUY_THRESHOLD = 3  # number of triggered timeframes required for 'Good_Buy'
+
+CYCLE_SECONDS = REGISTRY.histogram('scan_cycle_seconds', 'Duration of a full scan cycle.')
+LAST_CYCLE_SECONDS = REGISTRY.gauge('scan_last_cycle_seconds', 'Duration of the most recent scan cycle.')
+SYMBOL_SECONDS = REGISTRY.histogram('scan_symbol_seconds', 'Time to fetch and evaluate one symbol.')
+SYMBOLS_EVALUATED = REGISTRY.counter('scan_symbols_total', 'Symbols evaluated by the scanner.', ('result',))
+
+
+def closeness_to_good_buy(signal_status):
+    """
+    Score how close a previous signal status was to a 'Good_Buy'.
+
+    Parameters:
+    - signal_status (dict or None): Previous output of multi_resolution_signal.
+
+    Returns:
+    - int: Number of triggered timeframes, capped at the 'Good_Buy' threshold
+      (0 if the symbol was never evaluated).
+    """
+    if not signal_status:
+        return 0
+    if signal_status.get('Good_Buy'):
+        return GOOD_BUY_THRESHOLD
+    triggered = sum(bool(v) for k, v in signal_status.items() if k != 'Good_Buy')
+    return min(triggered, GOOD_BUY_THRESHOLD)
+
+
+class ScanScheduler:
+    """
+    Evaluates every unique symbol of the watchlist once per cycle with bounded concurrency
+    and fans each result out to all channels subscribed to a sector holding that symbol.
+    """
+    def __init__(self, detectors, stocks, max_concurrency=SCAN_CONCURRENCY):
+        """
+        Parameters:
+        - detectors (dict): Stock symbol -> BuySignalDetector.
+        - stocks (dict): Sector name -> list of stock symbols.
+        - max_concurrency (int): Maximum number of detectors running at once. The request
+          budget itself is enforced by the rate limiter of the shared FinnhubEngine.
+        """
+        self.detectors = detectors
+        self.stocks = stocks
+        self.max_concurrency = max_concurrency
+        self.last_status = {}  # symbol -> signal status of the previous evaluation
+        self.last_cycle_duration = None
+
+    def build_subscriptions(self, sector_channels):
+        """
+        Build the unique symbol set of a cycle.
+
+        Parameters:
+        - sector_channels (dict): Sector name -> list of channels monitoring that sector.
+
+        Returns:
+        - dict: Stock symbol -> list of channels to notify, in watchlist order.
+        """
+        subscriptions = {}
+        for sector, channels in sector_channels.items():
+            for stock_symbol in self.stocks.get(sector, []):
+                targets = subscriptions.setdefault(stock_symbol, [])
+                for chan in channels:
+                    if chan not in targets:
+                        targets.append(chan)
+        return subscriptions
+
+    def prioritize(self, symbols):
+        """
+        Order symbols so that those closest to a 'Good_Buy' on the previous cycle go first.
+        The sort is stable, so ties keep their watchlist order.
+        """
+        return sorted(symbols, key=lambda s: -closeness_to_good_buy(self.last_status.get(s)))
+
+    async def run_cycle(self, sector_channels, on_result, on_error=None):
+        """
+        Run one scan cycle.
+
+        Parameters:
+        - sector_channels (dict): Sector name -> list of channels monitoring that sector.
+        - on_result (coroutine function): Awaited as on_result(symbol, signal_status, channels)
+          once per evaluated symbol.
+        - on_error (coroutine function, optional): Awaited as on_error(symbol, error) for every symbol
+          whose evaluation raised.
+
+        Returns:
+        - dict: Stock symbol -> signal status for every symbol evaluated successfully.
+        """
+        start = time.monotonic()
+        subscriptions = self.build_subscriptions(sector_channels)
+        queue = asyncio.Queue()
+        for stock_symbol in self.prioritize(subscriptions):
+            queue.put_nowait(stock_symbol)
+        print(f"Scanning {queue.qsize()} unique symbols with concurrency {self.max_concurrency}.")
+
+        results = {}
+
+        async def worker():
+            while True:
+                try:
+                    stock_symbol = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                detector: BuySignalDetector = self.detectors[stock_symbol]
+                try:
+                    with SYMBOL_SECONDS.time():
+                        signal_status = await asyncio.to_thread(detector.multi_resolution_signal)
+                except Exception as e:
+                    SYMBOLS_EVALUATED.inc(result='error')
+                    print(f"Error assessing buy signal for {stock_symbol}: {e}")
+                    if on_error is not None:
+                        try:
+                            await on_error(stock_symbol, e)
+                        except Exception as report_error:
+                            print(f"Error reporting the failure of {stock_symbol}: {report_error}")
+                    continue
+                SYMBOLS_EVALUATED.inc(result='ok')
+                self.last_status[stock_symbol] = signal_status
+                results[stock_symbol] = signal_status
+                try:
+                    await on_result(stock_symbol, signal_status, subscriptions[stock_symbol])
+                except Exception as e:
+                    print(f"Error dispatching buy signal for {stock_symbol}: {e}")
+
+        await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+        self.last_cycle_duration = time.monotonic() - start
+        CYCLE_SECONDS.observe(self.last_cycle_duration)
+        LAST_CYCLE_SECONDS.set(self.last_cycle_duration)
+        print(f"Scan cycle finished in {self.last_cycle_duration:.1f}s for {len(results)} symbols.")
+        return results
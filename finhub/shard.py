@@ -0,0 +1,324 @@
+# shard.py
+
+import argparse
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from engine import FinnhubEngine, RateLimiter, API_CALLS_PER_MINUTE
+from buy_signal_bot import BuySignalDetector
+from scan_scheduler import ScanScheduler
+from detector_snapshot import DetectorSnapshotStore
+from market_schedule import MarketSessionClock, BAR_MINUTES
+from watchlist import stocks
+
+load_dotenv()
+SHARD_BROKER_FILE = 'shard_broker.db'
+VIRTUAL_NODES = 128  # ring positions per worker, smooths the symbol distribution
+HEARTBEAT_TTL = 120  # seconds without heartbeat before a worker leaves the ring
+HEARTBEAT_INTERVAL = 30
+COLLECT_POLL_INTERVAL = 2.0
+COLLECT_TIMEOUT = 25 * 60  # a cycle must be merged well within the 30-minute bar
+START_GRACE = 60  # seconds the coordinator waits for live workers that have not started the cycle yet
+RESULT_RETENTION = 2 * 24 * 3600  # seconds of cycle results kept in the broker
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cycle_results (
+    symbol TEXT NOT NULL,
+    cycle_key INTEGER NOT NULL,
+    signal_status TEXT,
+    error TEXT,
+    computed_at REAL NOT NULL,
+    worker_id TEXT NOT NULL,
+    PRIMARY KEY (symbol, cycle_key)
+);
+CREATE TABLE IF NOT EXISTS worker_cycles (
+    worker_id TEXT NOT NULL,
+    cycle_key INTEGER NOT NULL,
+    symbols TEXT NOT NULL,
+    finished_at REAL,
+    PRIMARY KEY (worker_id, cycle_key)
+);
+CREATE TABLE IF NOT EXISTS alert_claims (
+    symbol TEXT NOT NULL,
+    cycle_key INTEGER NOT NULL,
+    PRIMARY KEY (symbol, cycle_key)
+);
+"""
+
+
+def cycle_key_at(clock, now=None):
+    """
+    Key of the scan cycle running at `now`: the epoch seconds of the latest bar close, so workers and
+    the coordinator agree on it however far apart they start.
+    """
+    bar_close = clock.previous_bar_close(now or datetime.now(timezone.utc))
+    if bar_close is None:
+        bar_seconds = BAR_MINUTES * 60
+        return int(time.time() // bar_seconds * bar_seconds)
+    return int(bar_close.timestamp())
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping symbols to workers. Adding or removing one of N workers only moves
+    about 1/N of the symbols.
+    """
+    def __init__(self, nodes, virtual_nodes=VIRTUAL_NODES):
+        self.ring = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(virtual_nodes))
+        self.positions = [position for position, _ in self.ring]
+
+    def node_for(self, key):
+        if not self.ring:
+            return None
+        idx = bisect.bisect(self.positions, _hash(key)) % len(self.ring)
+        return self.ring[idx][1]
+
+    def assign(self, keys):
+        """
+        Return a dict node -> list of keys owned by that node.
+        """
+        assignment = {}
+        for key in keys:
+            assignment.setdefault(self.node_for(key), []).append(key)
+        return assignment
+
+
+class ShardBroker:
+    """
+    SQLite broker shared by the workers and the coordinator on one host (WAL mode allows concurrent
+    readers while one process writes). Holds worker heartbeats, the latest signal status per symbol
+    and the alert claims used to deduplicate alerts.
+    """
+    def __init__(self, path=SHARD_BROKER_FILE):
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def heartbeat(self, worker_id):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO workers (worker_id, heartbeat) VALUES (?, ?)",
+                              (worker_id, time.time()))
+
+    def leave(self, worker_id):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def live_workers(self, ttl=HEARTBEAT_TTL):
+        with self.lock:
+            rows = self.conn.execute("SELECT worker_id FROM workers WHERE heartbeat >= ? ORDER BY worker_id",
+                                     (time.time() - ttl,)).fetchall()
+        return [worker_id for worker_id, in rows]
+
+    def publish_result(self, symbol, signal_status, worker_id, cycle_key, error=None):
+        """
+        Publish the outcome of one symbol in a cycle: its signal status, or the error that prevented it.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cycle_results (symbol, cycle_key, signal_status, error, computed_at, worker_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (symbol, cycle_key, None if signal_status is None else json.dumps(signal_status),
+                 None if error is None else str(error), time.time(), worker_id))
+
+    def cycle_results(self, cycle_key):
+        """
+        Return a dict symbol -> (signal status or None, error or None) of every result of a cycle.
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT symbol, signal_status, error FROM cycle_results WHERE cycle_key = ?",
+                                     (cycle_key,)).fetchall()
+        return {symbol: (None if signal_status is None else json.loads(signal_status), error)
+                for symbol, signal_status, error in rows}
+
+    def start_cycle(self, worker_id, cycle_key, symbols):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO worker_cycles (worker_id, cycle_key, symbols, finished_at) "
+                              "VALUES (?, ?, ?, NULL)", (worker_id, cycle_key, json.dumps(symbols)))
+
+    def finish_cycle(self, worker_id, cycle_key):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE worker_cycles SET finished_at = ? WHERE worker_id = ? AND cycle_key = ?",
+                              (now, worker_id, cycle_key))
+            # old cycles are never read again
+            self.conn.execute("DELETE FROM cycle_results WHERE cycle_key < ?", (cycle_key - RESULT_RETENTION,))
+            self.conn.execute("DELETE FROM worker_cycles WHERE cycle_key < ?", (cycle_key - RESULT_RETENTION,))
+
+    def worker_cycles(self, cycle_key):
+        """
+        Return a dict worker_id -> finished (bool) of every worker that started a cycle.
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT worker_id, finished_at FROM worker_cycles WHERE cycle_key = ?",
+                                     (cycle_key,)).fetchall()
+        return {worker_id: finished_at is not None for worker_id, finished_at in rows}
+
+    def claim_alert(self, symbol, cycle_key):
+        """
+        Claim the alert of a symbol for one cycle. Returns False if it was already claimed.
+        """
+        with self.lock, self.conn:
+            cursor = self.conn.execute("INSERT OR IGNORE INTO alert_claims (symbol, cycle_key) VALUES (?, ?)",
+                                       (symbol, cycle_key))
+        return cursor.rowcount == 1
+
+
+def all_symbols(watchlist):
+    return list(dict.fromkeys(symbol for symbols in watchlist.values() for symbol in symbols))
+
+
+class ShardWorker:
+    """
+    Scans the share of the watchlist that the hash ring assigns to this worker, with its own API
+    credential and rate limiter, and publishes every signal status to the broker.
+    """
+    def __init__(self, worker_id, broker, api_key, calls_per_minute=API_CALLS_PER_MINUTE, watchlist=stocks):
+        self.worker_id = worker_id
+        self.broker = broker
+        self.engine = FinnhubEngine(api_key, rate_limiter=RateLimiter(calls_per_minute))
+        self.symbols = all_symbols(watchlist)
+        self.detectors = {}
+        self.clock = MarketSessionClock()
+        self.snapshot_store = DetectorSnapshotStore(f"detector_snapshot_{worker_id}.npz")
+
+    def owned_symbols(self):
+        ring = HashRing(self.broker.live_workers())
+        return ring.assign(self.symbols).get(self.worker_id, [])
+
+    async def run_cycle(self):
+        self.broker.heartbeat(self.worker_id)
+        cycle_key = cycle_key_at(self.clock)
+        symbols = self.owned_symbols()
+        self.broker.start_cycle(self.worker_id, cycle_key, symbols)
+        for symbol in symbols:
+            if symbol not in self.detectors:
+                self.detectors[symbol] = BuySignalDetector(symbol, self.engine, snapshot_store=self.snapshot_store)
+        print(f"Worker {self.worker_id} scanning {len(symbols)}/{len(self.symbols)} symbols.")
+
+        async def publish(symbol, signal_status, channels):
+            await asyncio.to_thread(self.broker.publish_result, symbol, signal_status, self.worker_id, cycle_key)
+
+        async def publish_error(symbol, error):
+            await asyncio.to_thread(self.broker.publish_result, symbol, None, self.worker_id, cycle_key, error)
+
+        scheduler = ScanScheduler(self.detectors, {'shard': symbols})
+        try:
+            await scheduler.run_cycle({'shard': [self.worker_id]}, publish, publish_error)
+        finally:
+            # tells the coordinator not to wait for this worker's symbols any longer
+            await asyncio.to_thread(self.broker.finish_cycle, self.worker_id, cycle_key)
+        await asyncio.to_thread(self.snapshot_store.save, self.detectors)
+
+    async def _keep_alive(self):
+        while True:
+            await asyncio.to_thread(self.broker.heartbeat, self.worker_id)
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    async def run_forever(self):
+        """
+        Scan right after every bar close, like the single-process bot.
+        """
+        keep_alive = asyncio.create_task(self._keep_alive())
+        try:
+            while True:
+                scan_time = self.clock.next_scan_time(datetime.now(timezone.utc))
+                await asyncio.sleep(max(0.0, (scan_time - datetime.now(timezone.utc)).total_seconds()))
+                await self.run_cycle()
+        finally:
+            keep_alive.cancel()
+            self.broker.leave(self.worker_id)
+
+
+class ShardCoordinator(ScanScheduler):
+    """
+    Drop-in replacement of ScanScheduler for the bot process in sharded mode: instead of evaluating
+    detectors itself it merges the results published by the workers and dispatches each symbol once.
+    """
+    def __init__(self, broker, watchlist=stocks, timeout=COLLECT_TIMEOUT):
+        super().__init__({}, watchlist)
+        self.broker = broker
+        self.timeout = timeout
+        self.clock = MarketSessionClock()
+
+    def _workers_done(self, cycle_key, elapsed):
+        """
+        The cycle is complete once every worker that started it has finished or left the ring, and
+        every live worker has started it (or had START_GRACE seconds to do so).
+        """
+        live = set(self.broker.live_workers())
+        started = self.broker.worker_cycles(cycle_key)
+        running = [w for w, finished in started.items() if not finished and w in live]
+        not_started = live - set(started)
+        return not running and (not not_started or elapsed > START_GRACE)
+
+    async def run_cycle(self, sector_channels, on_result, on_error=None):
+        start = time.time()
+        cycle_key = cycle_key_at(self.clock)
+        subscriptions = self.build_subscriptions(sector_channels)
+        pending = set(subscriptions)
+        print(f"Collecting results for {len(pending)} symbols from {len(self.broker.live_workers())} workers.")
+
+        results = {}
+        while pending and time.time() - start < self.timeout:
+            # read the completion state first, so results published just before it are merged below
+            done = await asyncio.to_thread(self._workers_done, cycle_key, time.time() - start)
+            merged = await asyncio.to_thread(self.broker.cycle_results, cycle_key)
+            # highest priority first, like the single-process scan
+            for stock_symbol in self.prioritize([s for s in merged if s in pending]):
+                pending.discard(stock_symbol)
+                signal_status, error = merged[stock_symbol]
+                if signal_status is None:
+                    print(f"Worker failed to assess buy signal for {stock_symbol}: {error}")
+                    continue
+                self.last_status[stock_symbol] = signal_status
+                results[stock_symbol] = signal_status
+                if not await asyncio.to_thread(self.broker.claim_alert, stock_symbol, cycle_key):
+                    continue  # already dispatched by another coordinator
+                try:
+                    await on_result(stock_symbol, signal_status, subscriptions[stock_symbol])
+                except Exception as e:
+                    print(f"Error dispatching buy signal for {stock_symbol}: {e}")
+            if done:
+                break
+            if pending:
+                await asyncio.sleep(COLLECT_POLL_INTERVAL)
+
+        if pending:
+            print(f"No result for {len(pending)} symbols after {time.time() - start:.0f}s: {sorted(pending)}")
+        self.last_cycle_duration = time.time() - start
+        print(f"Merged cycle finished in {self.last_cycle_duration:.1f}s for {len(results)} symbols.")
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one scanning worker of the sharded bot.")
+    parser.add_argument('--worker-id', type=str, required=True, help="Unique worker name")
+    parser.add_argument('--broker', type=str, default=SHARD_BROKER_FILE, help="Broker database file")
+    parser.add_argument('--calls-per-minute', type=int, default=API_CALLS_PER_MINUTE,
+                        help="Request budget of this worker's API key")
+    args = parser.parse_args()
+
+    # each worker uses its own key, e.g. FIN_TOKEN_W1 for --worker-id w1; workers sharing a key would
+    # each spend the full per-key budget and run into 429s
+    key_name = f"FIN_TOKEN_{args.worker_id.upper()}"
+    api_key = os.getenv(key_name)
+    if not api_key:
+        parser.error(f"{key_name} is not set; every worker needs its own Finnhub API key.")
+    worker = ShardWorker(args.worker_id, ShardBroker(args.broker), api_key, args.calls_per_minute)
+    asyncio.run(worker.run_forever())
@@ -0,0 +1,7 @@
+# conftest.py
+
+import os
+import sys
+
+# modules import each other by bare name from finhub/, as when run from that directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,116 @@
+# test_chain_store.py
+
+import numpy as np
+import pytest
+from chain_store import FIELDS, ChainSnapshotStore, contract_id
+
+EXPIRIES = ['2025-01-17', '2025-02-21', '2025-03-21']
+STRIKES = np.arange(100.0, 130.0, 2.5)
+
+
+def make_chain(values, expiries=EXPIRIES):
+    """
+    Chain of the given expiries; values holds the fields of every contract of EXPIRIES in order.
+    """
+    chains = []
+    for expiry in expiries:
+        e = EXPIRIES.index(expiry)
+        options = {}
+        for s, side in enumerate(('CALL', 'PUT')):
+            rows = values[(2 * e + s) * len(STRIKES):(2 * e + s + 1) * len(STRIKES)]
+            options[side] = [{'strike': float(k), **dict(zip(FIELDS, map(float, row)))} for k, row in zip(STRIKES, rows)]
+        chains.append({'expirationDate': expiry, 'options': options})
+    return chains
+
+
+def chain_fields(chain):
+    return np.array([[c[f] for f in FIELDS] for entry in chain for side in ('CALL', 'PUT') for c in entry['options'][side]])
+
+
+@pytest.fixture
+def history(tmp_path):
+    """
+    A store of 12 snapshots with 5 per chunk; the first expiry expires with the second chunk.
+    """
+    rng = np.random.default_rng(9)
+    n = len(EXPIRIES) * 2 * len(STRIKES)
+    values = np.column_stack([rng.integers(0, 500, n), rng.integers(0, 20000, n), rng.uniform(20, 80, n).round(2),
+                              rng.uniform(1, 20, n).round(2), np.zeros(n), np.zeros(n)])
+    store = ChainSnapshotStore(str(tmp_path), keyframe_interval=5)
+    snapshots = []
+    for step in range(12):
+        active = rng.random(n) < 0.2
+        values[active, 0] += rng.integers(1, 50, active.sum())
+        values[active, 3] = (values[active, 3] + 0.05).round(2)
+        chain = make_chain(values, EXPIRIES[int(step >= 5):])
+        store.append('TEST', chain, 1000 + 60 * step)
+        snapshots.append(chain)
+    store.flush()
+    return store, snapshots
+
+
+def test_chain_at_reconstructs_every_snapshot(history, tmp_path):
+    _, snapshots = history
+    reopened = ChainSnapshotStore(str(tmp_path), keyframe_interval=5)
+    assert reopened.chain_at('TEST', 999) is None
+    for step, chain in enumerate(snapshots):
+        df = reopened.chain_at('TEST', 1000 + 60 * step + 30)
+        assert df.attrs['time'] == 1000 + 60 * step
+        np.testing.assert_allclose(df[FIELDS].to_numpy(), chain_fields(chain))
+
+
+def test_contract_series(history, tmp_path):
+    _, snapshots = history
+    reopened = ChainSnapshotStore(str(tmp_path), keyframe_interval=5)
+    cid = contract_id('TEST', EXPIRIES[1], 'PUT', STRIKES[3])
+    series = reopened.contract_series('TEST', cid)
+    expected = [next(c for entry in chain if entry['expirationDate'] == EXPIRIES[1]
+                     for c in entry['options']['PUT'] if c['strike'] == STRIKES[3]) for chain in snapshots]
+    np.testing.assert_allclose(series.to_numpy(), [[c[f] for f in FIELDS] for c in expected])
+    assert len(reopened.contract_series('TEST', cid, start=1000 + 60 * 3, end=1000 + 60 * 6)) == 4
+    with pytest.raises(KeyError):
+        reopened.contract_series('TEST', 'UNKNOWN')
+
+
+def test_new_keyframes_drop_expired_contracts(history):
+    store, snapshots = history
+    expired = contract_id('TEST', EXPIRIES[0], 'CALL', STRIKES[0])
+    tables = {start: store._chunk('TEST', start)['contracts'] for start in store._starts('TEST')}
+    assert [len(t) for t in tables.values()] == [len(STRIKES) * 6, len(STRIKES) * 4, len(STRIKES) * 4]
+    assert all(c['id'] != expired for start, table in tables.items() if start > 1000 for c in table)
+    # the expired contract is still readable from the chunk that listed it
+    assert len(store.contract_series('TEST', expired, end=1000 + 60 * 4)) == 5
+
+
+def test_same_second_snapshot_replaces_the_last_one(history, tmp_path):
+    store, snapshots = history
+    last = 1000 + 60 * 11
+    values = chain_fields(snapshots[-1])
+    values[:, 0] += 7
+    replacement = make_chain(np.vstack([np.zeros((2 * len(STRIKES), len(FIELDS))), values]), EXPIRIES[1:])
+    store.append('TEST', replacement, last)
+    store.flush()
+    reopened = ChainSnapshotStore(str(tmp_path), keyframe_interval=5)
+    df = reopened.chain_at('TEST', last)
+    np.testing.assert_allclose(df[FIELDS].to_numpy(), values)
+    # the snapshot before it is untouched
+    np.testing.assert_allclose(reopened.chain_at('TEST', last - 1)[FIELDS].to_numpy(), chain_fields(snapshots[-2]))
+    with pytest.raises(ValueError):
+        reopened.append('TEST', replacement, last - 1)
+
+
+def test_replacing_a_keyframe(tmp_path):
+    store = ChainSnapshotStore(str(tmp_path))
+    values = np.ones((len(EXPIRIES) * 2 * len(STRIKES), len(FIELDS)))
+    store.append('TEST', make_chain(values), 100)
+    store.append('TEST', make_chain(values * 2, EXPIRIES[1:]), 100)
+    df = store.chain_at('TEST', 100)
+    assert len(df) == len(STRIKES) * 4 and (df['volume'] == 2).all()
+    assert len(store._chunk('TEST', 100)['contracts']) == len(STRIKES) * 4
+
+
+def test_unchanged_snapshots_store_nothing(tmp_path):
+    store = ChainSnapshotStore(str(tmp_path))
+    chain = make_chain(np.ones((len(EXPIRIES) * 2 * len(STRIKES), len(FIELDS))))
+    assert store.append('TEST', chain, 100) > 0
+    assert store.append('TEST', chain, 160) == 0
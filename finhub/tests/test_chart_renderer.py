@@ -0,0 +1,27 @@
+# test_chart_renderer.py
+
+import os
+import time
+from chart_renderer import ChartRenderer
+
+
+def write_png(directory, name, age, now):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(b'png')
+    os.utime(path, (now - age, now - age))
+    return path
+
+
+def test_evict_drops_stale_then_least_recently_used(tmp_path):
+    renderer = ChartRenderer(str(tmp_path), max_workers=1, max_files=3, max_age=3600)
+    try:
+        now = time.time()
+        ages = {'a.png': 10, 'b.png': 20, 'c.png': 30, 'd.png': 40, 'old.png': 7200}
+        for name, age in ages.items():
+            write_png(str(tmp_path), name, age, now)
+        write_png(str(tmp_path), 'e.png.123.tmp.png', 9000, now)  # a render still being written
+        assert renderer.evict(now) == 2
+        assert sorted(os.listdir(tmp_path)) == ['a.png', 'b.png', 'c.png', 'e.png.123.tmp.png']
+    finally:
+        renderer.shutdown()
@@ -0,0 +1,97 @@
+# test_gamma_exposure.py
+
+from datetime import date
+import numpy as np
+import pytest
+from gamma_exposure import CONTRACT_SIZE, SPOT_GRID, chain_gamma_exposure, gamma_exposure, zero_gamma_level
+from pricing_models.greeks import black_scholes_greeks
+from unusual_activity import normalize_chains
+
+TODAY = date(2025, 1, 2)
+EXPIRIES = ['2025-01-17', '2025-02-21', '2025-03-21']
+
+
+def synthetic_chain(rng, spot):
+    chain = []
+    for expiry in EXPIRIES:
+        options = {side: [{'strike': float(k), 'openInterest': int(rng.integers(0, 20000)),
+                           'volume': int(rng.integers(0, 5000)),
+                           'impliedVolatility': float(30 + 40 * abs(np.log(k / spot)))}
+                          for k in np.round(np.linspace(0.7, 1.3, 25) * spot, 1)] for side in ('CALL', 'PUT')}
+        chain.append({'expirationDate': expiry, 'options': options})
+    return chain
+
+
+@pytest.fixture(scope='module')
+def watchlist():
+    rng = np.random.default_rng(9)
+    spots = {'AAA': 100.0, 'BBB': 250.0, 'CCC': 40.0}
+    chains = {symbol: synthetic_chain(rng, spot) for symbol, spot in spots.items()}
+    return chains, spots, gamma_exposure(normalize_chains(chains), spots, TODAY)
+
+
+def brute_net_gex(chain, spot):
+    total = 0.0
+    for entry in chain:
+        T = (np.datetime64(entry['expirationDate']) - np.datetime64(TODAY)).astype(int) / 365.0
+        for side, sign in (('CALL', 1.0), ('PUT', -1.0)):
+            for c in entry['options'][side]:
+                gamma = black_scholes_greeks(spot, c['strike'], T, c['impliedVolatility'] / 100, 0.0463, 0.0)['gamma']
+                total += sign * gamma * c['openInterest'] * CONTRACT_SIZE * spot ** 2 * 0.01
+    return total
+
+
+def test_net_gex_matches_a_per_contract_sum(watchlist):
+    chains, spots, result = watchlist
+    for _, row in result['symbols'].iterrows():
+        assert row['net_gex'] == pytest.approx(brute_net_gex(chains[row['symbol']], spots[row['symbol']]), rel=1e-9)
+        assert row['call_gex'] > 0 > row['put_gex']
+
+
+def test_profile_matches_repricing_at_every_level(watchlist):
+    chains, _, result = watchlist
+    middle = np.argmin(np.abs(SPOT_GRID - 1.0))
+    np.testing.assert_allclose(result['profile'][:, middle], result['symbols']['net_gex'], rtol=1e-9)
+    row = 1
+    symbol = result['symbols']['symbol'][row]
+    levels = result['levels'][row][::20]
+    brute = [chain_gamma_exposure(symbol, chains[symbol], level, TODAY)['symbols']['net_gex'][0] for level in levels]
+    np.testing.assert_allclose(result['profile'][row][::20], brute, rtol=1e-9, atol=1e-6 * np.abs(brute).max())
+
+
+def test_strike_and_expiry_breakdowns_add_up(watchlist):
+    _, _, result = watchlist
+    totals = result['symbols'].set_index('symbol')['net_gex']
+    for table in (result['strikes'], result['expiries']):
+        np.testing.assert_allclose(table.groupby('symbol')['net_gex'].sum().reindex(totals.index), totals, rtol=1e-9)
+    strikes = result['strikes']
+    for _, row in result['symbols'].iterrows():
+        mine = strikes[strikes['symbol'] == row['symbol']]
+        assert row['call_wall'] == mine.loc[mine['call_gex'].idxmax(), 'strike']
+        assert row['put_wall'] == mine.loc[mine['put_gex'].idxmin(), 'strike']
+
+
+def test_symbols_without_a_spot_are_skipped(watchlist):
+    chains, spots, _ = watchlist
+    result = gamma_exposure(normalize_chains(chains), {'AAA': spots['AAA']}, TODAY)
+    assert list(result['symbols']['symbol']) == ['AAA']
+    assert result['profile'].shape == (1, len(SPOT_GRID))
+
+
+def test_missing_ivs_are_solved_from_quotes():
+    spot, strike, T, sigma = 100.0, 105.0, (np.datetime64(EXPIRIES[1]) - np.datetime64(TODAY)).astype(int) / 365.0, 0.3
+    price = float(black_scholes_greeks(spot, strike, T, sigma, 0.0463, 0.0)['price'])
+    quoted = [{'expirationDate': EXPIRIES[1], 'options': {'CALL': [
+        {'strike': strike, 'openInterest': 1000, 'bid': price, 'ask': price, 'impliedVolatility': None}]}}]
+    with_iv = [{'expirationDate': EXPIRIES[1], 'options': {'CALL': [
+        {'strike': strike, 'openInterest': 1000, 'impliedVolatility': sigma * 100}]}}]
+    solved = chain_gamma_exposure('AAA', quoted, spot, TODAY)['symbols']['net_gex'][0]
+    assert solved == pytest.approx(chain_gamma_exposure('AAA', with_iv, spot, TODAY)['symbols']['net_gex'][0], rel=1e-6)
+
+
+def test_zero_gamma_level_interpolates_the_crossing_nearest_the_spot():
+    levels = np.array([[90.0, 95.0, 100.0, 105.0, 110.0], [90.0, 95.0, 100.0, 105.0, 110.0]])
+    profile = np.array([[-2.0, -1.0, 1.0, 2.0, -2.0], [1.0, 2.0, 3.0, 4.0, 5.0]])
+    flip = zero_gamma_level(levels, profile, np.array([99.0, 100.0]))
+    assert flip[0] == pytest.approx(97.5)
+    assert np.isnan(flip[1])
@@ -0,0 +1,76 @@
+# test_greeks.py
+
+import numpy as np
+import pytest
+from pricing_models.black_scholes import black_scholes_price, black_scholes_probability_ITM
+from pricing_models.greeks import black_scholes_greeks, call_flags
+
+R, Q = 0.0463, 0.01
+
+
+@pytest.fixture(scope='module')
+def chain():
+    rng = np.random.default_rng(7)
+    n = 5_000
+    S = rng.uniform(50, 500, n)
+    return {'S': S, 'K': S * rng.uniform(0.5, 1.5, n), 'T': rng.uniform(1 / 365, 2.0, n),
+            'sigma': rng.uniform(0.05, 1.5, n), 'is_call': rng.random(n) < 0.5}
+
+
+def reference_price(S, K, T, sigma, r, is_call):
+    call = black_scholes_price(S, K, T, r, sigma, 'call', Q)
+    put = black_scholes_price(S, K, T, r, sigma, 'put', Q)
+    return np.where(is_call, call, put)
+
+
+def test_price_and_prob_itm_match_black_scholes(chain):
+    greeks = black_scholes_greeks(chain['S'], chain['K'], chain['T'], chain['sigma'], R, Q, chain['is_call'])
+    for option_type, mask in (('call', chain['is_call']), ('put', ~chain['is_call'])):
+        args = (chain['S'][mask], chain['K'][mask], chain['T'][mask], R, chain['sigma'][mask], option_type, Q)
+        np.testing.assert_allclose(greeks['price'][mask], black_scholes_price(*args), rtol=0, atol=1e-10)
+        np.testing.assert_allclose(greeks['prob_itm'][mask], black_scholes_probability_ITM(*args), rtol=0, atol=1e-12)
+
+
+def test_greeks_match_finite_differences(chain):
+    S, K, T, sigma, is_call = chain['S'], chain['K'], chain['T'], chain['sigma'], chain['is_call']
+    greeks = black_scholes_greeks(S, K, T, sigma, R, Q, is_call)
+    h, h_t = 1e-4, 1e-6  # short expiries make theta very curved in T
+
+    def ref(S_=S, T_=T, sigma_=sigma, r_=R):
+        return reference_price(S_, K, T_, sigma_, r_, is_call)
+
+    finite_differences = {
+        'delta': (ref(S_=S * (1 + h)) - ref(S_=S * (1 - h))) / (2 * h * S),
+        'gamma': (ref(S_=S * (1 + h)) - 2 * ref() + ref(S_=S * (1 - h))) / (h * S) ** 2,
+        'vega': (ref(sigma_=sigma + h) - ref(sigma_=sigma - h)) / (2 * h),
+        'theta': -(ref(T_=T + h_t) - ref(T_=T - h_t)) / (2 * h_t),
+        'rho': (ref(r_=R + h) - ref(r_=R - h)) / (2 * h),
+    }
+    for name, estimate in finite_differences.items():
+        scaled_error = np.abs(greeks[name] - estimate) / np.maximum(np.abs(estimate), 1.0)
+        assert scaled_error.max() < 1e-3, name
+
+
+def test_put_call_parity():
+    S, K, T, sigma = 100.0, np.array([80.0, 100.0, 120.0]), 0.5, 0.3
+    call = black_scholes_greeks(S, K, T, sigma, R, Q, 'call')
+    put = black_scholes_greeks(S, K, T, sigma, R, Q, 'put')
+    np.testing.assert_allclose(call['price'] - put['price'], S * np.exp(-Q * T) - K * np.exp(-R * T), atol=1e-10)
+    np.testing.assert_allclose(call['delta'] - put['delta'], np.exp(-Q * T), atol=1e-12)
+    np.testing.assert_allclose(call['gamma'], put['gamma'])
+
+
+def test_expired_and_zero_vol_contracts_get_intrinsic_value():
+    greeks = black_scholes_greeks(100.0, np.array([90.0, 110.0, 90.0]), np.array([0.0, 0.0, 1.0]),
+                                  np.array([0.2, 0.2, 0.0]), 0.0, 0.0, 'call')
+    np.testing.assert_allclose(greeks['price'], [10.0, 0.0, 10.0])
+    np.testing.assert_allclose(greeks['delta'], [1.0, 0.0, 1.0])
+    np.testing.assert_allclose(greeks['prob_itm'], [1.0, 0.0, 1.0])
+    assert np.all(greeks['gamma'] == 0) and np.all(greeks['vega'] == 0)
+
+
+def test_call_flags():
+    np.testing.assert_array_equal(call_flags(['CALL', 'put', 'Call']), [True, False, True])
+    np.testing.assert_array_equal(call_flags([1, 0]), [True, False])
+    with pytest.raises(ValueError):
+        call_flags(['straddle'])
@@ -0,0 +1,42 @@
+# test_heston_fft.py
+
+import numpy as np
+import pytest
+from pricing_models.heston_fft import heston_fft_prices
+
+ql = pytest.importorskip('QuantLib')
+from pricing_models.heston_volatility import HestonPricingContext
+
+S, R, Q = 220.0, 0.0463, 0.0
+PARAMETER_SETS = [
+    {'v0': 0.04, 'kappa': 1.5, 'theta': 0.04, 'sigma': 0.3, 'rho': -0.5},
+    {'v0': 0.09, 'kappa': 3.0, 'theta': 0.05, 'sigma': 0.8, 'rho': -0.8},
+]
+DAYS = np.array([7, 91, 365])
+STRIKES = np.linspace(0.7 * S, 1.3 * S, 25)
+TOLERANCE = np.array([1e-3, 1e-4, 1e-5])  # abs price error per maturity; short expiries are the hardest
+
+
+@pytest.mark.parametrize('option_type', ['call', 'put'])
+def test_matches_quantlib_analytic_engine(option_type):
+    todays_date = ql.Date.todaysDate()
+    reference = np.array([[HestonPricingContext(params, todays_date + int(d), R, Q, todays_date).price(S, STRIKES, option_type)
+                           for d in DAYS] for params in PARAMETER_SETS])
+    stacked = {name: np.array([p[name] for p in PARAMETER_SETS])[:, None] for name in PARAMETER_SETS[0]}
+    prices = heston_fft_prices(S, STRIKES, (DAYS / 365.0)[None, :], R, Q, stacked['v0'], stacked['kappa'],
+                               stacked['theta'], stacked['sigma'], stacked['rho'], option_type=option_type)
+    assert prices.shape == reference.shape
+    error = np.abs(prices - reference).max(axis=(0, 2))
+    assert np.all(error < TOLERANCE), error
+
+
+def test_put_call_parity():
+    T = 0.5
+    calls = heston_fft_prices(S, STRIKES, T, R, Q, 0.04, 1.5, 0.04, 0.3, -0.5)
+    puts = heston_fft_prices(S, STRIKES, T, R, Q, 0.04, 1.5, 0.04, 0.3, -0.5, option_type='put')
+    np.testing.assert_allclose(calls - puts, S * np.exp(-Q * T) - STRIKES * np.exp(-R * T), atol=1e-9)
+
+
+def test_rejects_unknown_option_type():
+    with pytest.raises(ValueError):
+        heston_fft_prices(S, STRIKES, 0.5, R, Q, 0.04, 1.5, 0.04, 0.3, -0.5, option_type='straddle')
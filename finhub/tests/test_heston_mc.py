@@ -0,0 +1,70 @@
+# test_heston_mc.py
+
+import numpy as np
+import pytest
+from scipy.stats import norm
+from pricing_models.greeks import black_scholes_greeks
+from pricing_models.heston_mc import heston_barrier_probabilities, heston_terminal_probability
+
+S, T, R, Q = 100.0, 0.25, 0.04, 0.0
+LADDER = np.arange(80.0, 122.5, 5.0)
+VOL = 0.3
+# near-zero vol of vol and rho = 0 is geometric Brownian motion, where touching is closed form
+GBM = {'v0': VOL ** 2, 'kappa': 1.0, 'theta': VOL ** 2, 'sigma': 1e-4, 'rho': 0.0}
+HESTON = {'v0': 0.06, 'kappa': 2.0, 'theta': 0.07, 'sigma': 0.8, 'rho': -0.7}
+
+
+def gbm_touch_probability(levels):
+    nu = R - Q - 0.5 * VOL ** 2
+    b = np.log(levels / S)
+    sign = np.where(levels > S, 1.0, -1.0)
+    scale = VOL * np.sqrt(T)
+    return norm.cdf((-sign * b + sign * nu * T) / scale) + np.exp(2 * nu * b / VOL ** 2) * norm.cdf((-sign * b - sign * nu * T) / scale)
+
+
+@pytest.fixture(scope='module')
+def heston_result():
+    return heston_barrier_probabilities(S, LADDER, T, R, Q, HESTON, n_paths=20_000, chunk_paths=5_000, seed=2)
+
+
+def test_terminal_probability_in_the_gbm_limit():
+    prob_itm = black_scholes_greeks(S, LADDER, T, VOL, R, Q, 'call')['prob_itm']
+    np.testing.assert_allclose(heston_terminal_probability(S, LADDER, T, R, Q, GBM), prob_itm, atol=1e-4)
+
+
+def test_touch_probability_in_the_gbm_limit():
+    result = heston_barrier_probabilities(S, LADDER, T, R, Q, GBM, n_paths=20_000, seed=1, steps_per_year=1008)
+    error = np.abs(result['touch'] - gbm_touch_probability(LADDER))
+    # statistical error plus what is left of the discrete monitoring bias
+    assert np.all(error <= 4 * result['touch_stderr'] + 2e-3), error
+
+
+def test_touch_bounds(heston_result):
+    np.testing.assert_array_equal(heston_result['barriers'], LADDER)
+    assert heston_result['touch'][LADDER == S] == 1.0  # a level at the spot is touched at the start
+    # ending beyond a level means it was touched on the way
+    assert np.all(heston_result['touch'] >= heston_result['terminal'] - 3 * heston_result['touch_stderr'])
+
+
+def test_lower_first_ordering(heston_result):
+    lower_first = heston_result['lower_first']
+    assert lower_first.shape == (len(heston_result['lower_barriers']), len(heston_result['upper_barriers']))
+    assert np.all((lower_first >= 0) & (lower_first <= 1))
+    # nearer lower levels (first rows) and farther upper levels (last columns) make "lower first" likelier
+    assert np.all(np.diff(lower_first, axis=0) <= 1e-12)
+    assert np.all(np.diff(lower_first, axis=1) >= -1e-12)
+
+
+def test_results_do_not_depend_on_the_number_of_workers(heston_result):
+    parallel = heston_barrier_probabilities(S, LADDER, T, R, Q, HESTON, n_paths=20_000, chunk_paths=5_000, seed=2,
+                                            max_workers=2)
+    np.testing.assert_array_equal(parallel['touch'], heston_result['touch'])
+
+
+def test_variance_reduction(heston_result):
+    plain = heston_barrier_probabilities(S, LADDER, T, R, Q, HESTON, n_paths=20_000, chunk_paths=5_000, seed=2,
+                                         antithetic=False, control_variate=False)
+    inside = LADDER != S
+    ratio = plain['touch_stderr'][inside] ** 2 / heston_result['touch_stderr'][inside] ** 2
+    assert np.median(ratio) > 1.5
+    assert np.all(np.abs(plain['touch'] - heston_result['touch']) <= 4 * plain['touch_stderr'] + 1e-12)
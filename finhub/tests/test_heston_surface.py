@@ -0,0 +1,36 @@
+# test_heston_surface.py
+
+import numpy as np
+import pytest
+from pricing_models.heston_fft import heston_fft_prices
+from pricing_models.heston_surface import PARAM_NAMES, calibrate_heston_surface
+from pricing_models.implied_vol import implied_volatility
+
+S, R, Q = 100.0, 0.03, 0.0
+TRUE_PARAMS = {'v0': 0.05, 'kappa': 2.0, 'theta': 0.06, 'sigma': 0.5, 'rho': -0.6}
+STRIKES = np.linspace(80.0, 120.0, 9)
+MATURITIES = np.array([0.1, 0.25, 0.5, 1.0])
+
+
+def heston_surface_ivs(strikes=STRIKES):
+    prices = heston_fft_prices(S, strikes, MATURITIES, R, Q,
+                               *(TRUE_PARAMS[name] for name in PARAM_NAMES))
+    return implied_volatility(prices, S, strikes, MATURITIES[:, None], R, Q, 'call')
+
+
+@pytest.mark.parametrize('jacobian, max_workers', [('batch', 1), ('batch', 2), ('2-point', 1)])
+def test_recovers_the_parameters_of_a_heston_surface(jacobian, max_workers):
+    IV = heston_surface_ivs()
+    IV[1, 0] = np.nan  # missing quotes are ignored
+    params, info = calibrate_heston_surface(S, STRIKES, MATURITIES, IV, R, Q, jacobian=jacobian, max_workers=max_workers)
+    for name in PARAM_NAMES:
+        assert params[name] == pytest.approx(TRUE_PARAMS[name], abs=1e-3), name
+    assert info['rmse'] < 1e-6
+    assert info['evaluations'] > 0
+
+
+def test_strike_grid_per_expiry():
+    strikes = np.linspace(0.8, 1.2, 9)[None, :] * S * np.sqrt(1 + MATURITIES)[:, None]
+    params, info = calibrate_heston_surface(S, strikes, MATURITIES, heston_surface_ivs(strikes), R, Q)
+    assert params['rho'] == pytest.approx(TRUE_PARAMS['rho'], abs=1e-3)
+    assert info['rmse'] < 1e-6
@@ -0,0 +1,52 @@
+# test_implied_vol.py
+
+import numpy as np
+from pricing_models.greeks import black_scholes_greeks
+from pricing_models.implied_vol import chain_implied_volatility, implied_volatility, quote_prices
+
+R, Q = 0.0463, 0.01
+
+
+def test_round_trip_on_informative_prices():
+    rng = np.random.default_rng(11)
+    n = 20_000
+    S = rng.uniform(50, 500, n)
+    K = S * np.exp(rng.uniform(-0.6, 0.6, n))
+    T = rng.uniform(2 / 365, 2.0, n)
+    sigma = rng.uniform(0.05, 2.0, n)
+    is_call = rng.random(n) < 0.5
+    prices = black_scholes_greeks(S, K, T, sigma, R, Q, is_call)['price']
+
+    iv = implied_volatility(prices, S, K, T, R, Q, is_call)
+
+    # out-of-the-money prices this far below the forward carry hardly any volatility information
+    forward = S * np.exp((R - Q) * T)
+    informative = black_scholes_greeks(S, K, T, sigma, R, Q, K >= forward)['price'] / forward > 1e-8
+    assert np.isfinite(iv[informative]).all()
+    np.testing.assert_allclose(iv[informative], sigma[informative], rtol=0, atol=1e-7)
+    assert np.isfinite(iv).mean() > 0.99
+
+
+def test_arbitrage_and_missing_prices_are_nan():
+    # zero, below intrinsic, above the spot, missing
+    iv = implied_volatility([0.0, 10.0, 200.0, np.nan], 100.0, [100.0, 80.0, 100.0, 100.0], 0.5, R, Q, 'call')
+    assert np.isnan(iv).all()
+
+
+def test_scalar_input():
+    price = black_scholes_greeks(100.0, 105.0, 0.25, 0.35, R, Q, 'put')['price']
+    assert abs(float(implied_volatility(price, 100.0, 105.0, 0.25, R, Q, 'put')) - 0.35) < 1e-8
+
+
+def test_quote_prices_prefers_uncrossed_mid():
+    prices = quote_prices([1.0, 2.0, 0.0, np.nan], [1.2, 1.5, 0.0, np.nan], [1.1, 1.9, 0.5, 0.0])
+    np.testing.assert_allclose(prices, [1.1, 1.9, 0.5, np.nan])
+
+
+def test_chain_implied_volatility():
+    strikes = np.array([90.0, 100.0, 110.0])
+    prices = black_scholes_greeks(100.0, strikes, 0.5, 0.25, R, Q, 'call')['price']
+    contracts = [{'strike': k, 'bid': p - 0.01, 'ask': p + 0.01, 'lastPrice': None} for k, p in zip(strikes, prices)]
+    solved_strikes, iv = chain_implied_volatility(contracts, 100.0, 0.5, R, Q, 'call')
+    np.testing.assert_array_equal(solved_strikes, strikes)
+    np.testing.assert_allclose(iv, 0.25, atol=1e-8)
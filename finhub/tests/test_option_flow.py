@@ -0,0 +1,80 @@
+# test_option_flow.py
+
+import numpy as np
+import pytest
+from option_flow import VOLUME_FILTER, flatten_chain, option_flow_metrics
+
+
+@pytest.fixture(scope='module')
+def chains():
+    rng = np.random.default_rng(5)
+    chains = []
+    for e in range(12):
+        options = {side: [{'strike': float(k), 'volume': int(rng.integers(0, 5000)), 'openInterest': int(rng.integers(0, 20000))}
+                          for k in np.arange(100, 200, 2.5) if rng.random() < 0.9] for side in ('CALL', 'PUT')}
+        chains.append({'expirationDate': f"2025-{e // 4 + 1:02d}-{e % 4 * 7 + 1:02d}", 'options': options})
+    return chains
+
+
+def brute_max_pain(calls, puts):
+    candidates = sorted({c['strike'] for c in calls + puts})
+    pains = [sum(c['openInterest'] * max(p - c['strike'], 0) for c in calls)
+             + sum(c['openInterest'] * max(c['strike'] - p, 0) for c in puts) for p in candidates]
+    return candidates[int(np.argmin(pains))]
+
+
+def brute_mean_strike(contracts):
+    max_volume = max(c['volume'] for c in contracts)
+    active = [c for c in contracts if c['volume'] >= VOLUME_FILTER * max_volume]
+    return sum(c['strike'] * c['volume'] for c in active) / sum(c['volume'] for c in active)
+
+
+def test_per_expiry_metrics_match_brute_force(chains):
+    expiries = option_flow_metrics(chains)['expiries']
+    assert list(expiries['expirationDate']) == [c['expirationDate'] for c in chains]
+    for e, chain in enumerate(chains):
+        calls, puts = chain['options']['CALL'], chain['options']['PUT']
+        row = expiries.iloc[e]
+        assert row['call_volume'] == sum(c['volume'] for c in calls)
+        assert row['put_oi'] == sum(c['openInterest'] for c in puts)
+        assert row['pc_volume_ratio'] == pytest.approx(row['put_volume'] / row['call_volume'])
+        assert row['max_pain'] == brute_max_pain(calls, puts)
+        assert row['call_mean_strike'] == pytest.approx(brute_mean_strike(calls))
+        assert row['put_mean_strike'] == pytest.approx(brute_mean_strike(puts))
+        assert row['call_wall'] == max(calls, key=lambda c: c['openInterest'])['strike']
+        assert row['put_wall'] == max(puts, key=lambda c: c['openInterest'])['strike']
+
+
+def test_aggregate_matches_brute_force(chains):
+    aggregate = option_flow_metrics(chains)['aggregate']
+    calls = [c for chain in chains for c in chain['options']['CALL']]
+    puts = [c for chain in chains for c in chain['options']['PUT']]
+    assert aggregate['call_oi'] == sum(c['openInterest'] for c in calls)
+    assert aggregate['pc_oi_ratio'] == pytest.approx(sum(c['openInterest'] for c in puts) / aggregate['call_oi'])
+    # contracts of the same strike across expiries add up
+    merged = {}
+    for side, contracts in (('CALL', calls), ('PUT', puts)):
+        for c in contracts:
+            merged.setdefault((side, c['strike']), 0)
+            merged[(side, c['strike'])] += c['openInterest']
+    by_side = {side: [{'strike': k, 'openInterest': oi} for (s, k), oi in merged.items() if s == side]
+               for side in ('CALL', 'PUT')}
+    assert aggregate['max_pain'] == brute_max_pain(by_side['CALL'], by_side['PUT'])
+
+
+def test_missing_fields():
+    chain = [{'expirationDate': '2025-01-17', 'options': {
+        'CALL': [{'strike': 100.0, 'volume': None, 'openInterest': 10}, {'strike': None, 'volume': 5}],
+        'PUT': [{'strike': 100.0, 'volume': 3}]}}]
+    flat = flatten_chain(chain)
+    np.testing.assert_array_equal(flat['strike'], [100.0, 100.0])
+    np.testing.assert_array_equal(flat['volume'], [0.0, 3.0])
+    np.testing.assert_array_equal(flat['open_interest'], [10.0, 0.0])
+    row = option_flow_metrics(chain)['expiries'].iloc[0]
+    assert np.isnan(row['pc_volume_ratio']) and row['pc_oi_ratio'] == 0.0
+
+
+def test_empty_chain():
+    result = option_flow_metrics([{'expirationDate': '2025-01-17', 'options': {}}])
+    assert np.isnan(result['expiries']['max_pain'].iloc[0])
+    assert result['strikes'].empty
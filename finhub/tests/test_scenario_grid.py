@@ -0,0 +1,61 @@
+# test_scenario_grid.py
+
+import numpy as np
+import pytest
+from pricing_models.greeks import black_scholes_greeks
+from pricing_models.scenario_grid import heston_scenario_values, reward_risk_grid
+
+S, R, T = 225.0, 0.0463, 0.25
+STRIKES = np.arange(200.0, 252.5, 5.0)
+IVS = 0.28 + 0.4 * np.log(STRIKES / S) ** 2
+PREMIUMS = black_scholes_greeks(S, STRIKES, T, IVS, R)['price']
+PARAMS = {'v0': 0.06, 'kappa': 2.0, 'theta': 0.07, 'sigma': 0.6, 'rho': -0.6}
+TARGETS = np.linspace(0.9, 1.2, 7) * S
+RISK_SPOTS = np.linspace(0.85, 0.99, 4) * S
+HORIZONS = np.array([0.0, 0.1, 0.25, 0.3])  # the last two reach expiry
+VOL_SHIFTS = np.array([-0.05, 0.0, 0.05])
+
+
+def test_black_scholes_grid_matches_pointwise_pricing():
+    grid = reward_risk_grid(STRIKES, PREMIUMS, T, TARGETS, RISK_SPOTS, HORIZONS, VOL_SHIFTS, R, ivs=IVS)
+    assert grid['reward'].shape == (len(TARGETS), len(HORIZONS), len(VOL_SHIFTS), len(STRIKES))
+    assert grid['risk'].shape == (len(RISK_SPOTS), len(HORIZONS), len(VOL_SHIFTS), len(STRIKES))
+    assert grid['rr'].shape == (len(TARGETS), len(RISK_SPOTS), len(HORIZONS), len(VOL_SHIFTS), len(STRIKES))
+    for s, h, v in ((0, 0, 1), (3, 1, 2), (6, 2, 0)):
+        value = black_scholes_greeks(TARGETS[s], STRIKES, max(T - HORIZONS[h], 0.0), IVS + VOL_SHIFTS[v], R)['price']
+        np.testing.assert_allclose(grid['reward'][s, h, v], (value - PREMIUMS) / PREMIUMS, atol=1e-12)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.testing.assert_allclose(grid['rr'], grid['reward'][:, None] / grid['risk'][None, :])
+
+
+def test_expired_horizons_pay_intrinsic_value():
+    for kwargs in ({'ivs': IVS}, {'heston_params': PARAMS}):
+        grid = reward_risk_grid(STRIKES, PREMIUMS, T, TARGETS, RISK_SPOTS, HORIZONS, VOL_SHIFTS, R, **kwargs)
+        intrinsic = np.maximum(TARGETS[:, None] - STRIKES[None, :], 0.0)
+        for h in (2, 3):
+            np.testing.assert_allclose(grid['reward'][:, h, 1], (intrinsic - PREMIUMS) / PREMIUMS, atol=1e-9)
+
+
+def test_heston_values_match_quantlib():
+    ql = pytest.importorskip('QuantLib')
+    from pricing_models.heston_volatility import HestonPricingContext
+    todays_date = ql.Date.todaysDate()
+    days = int(round(T * 365))
+    context = HestonPricingContext(PARAMS, todays_date + days, R, 0, todays_date)
+    for option_type in ('call', 'put'):
+        reference = context.price_scenarios(TARGETS, STRIKES, option_type)
+        values = heston_scenario_values(TARGETS, STRIKES, np.array([days / 365.0]), PARAMS, np.array([0.0]), R,
+                                        option_type=option_type)[:, 0, 0]
+        np.testing.assert_allclose(values, reference, atol=1e-3)
+
+
+def test_vol_shifts_raise_heston_values():
+    values = heston_scenario_values(TARGETS, STRIKES, np.array([T]), PARAMS, VOL_SHIFTS, R)
+    assert np.all(np.diff(values, axis=2) > 0)
+
+
+def test_requires_a_model():
+    with pytest.raises(ValueError):
+        reward_risk_grid(STRIKES, PREMIUMS, T, TARGETS, RISK_SPOTS, HORIZONS)
+    with pytest.raises(ValueError):
+        heston_scenario_values(TARGETS, STRIKES, np.array([T]), PARAMS, VOL_SHIFTS, R, option_type='straddle')
@@ -0,0 +1,61 @@
+# test_trader.py
+
+import json
+import threading
+import time
+import websocket
+from trader import SubscriptionManager
+
+
+class QuietConnection:
+    """
+    Connection on which no trade ever arrives: recv waits for its timeout like a real socket would.
+    """
+    def __init__(self, timeout=0.05):
+        self.timeout = timeout
+        self.sent = []
+        self.closed = threading.Event()
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+    def recv(self):
+        if self.closed.wait(self.timeout):
+            raise websocket.WebSocketConnectionClosedException("closed")
+        raise websocket.WebSocketTimeoutException("timed out")
+
+    def close(self):
+        self.closed.set()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_watchlist_changes_are_sent_on_a_quiet_feed():
+    connection = QuietConnection()
+    manager = SubscriptionManager(['AAPL'], connect=lambda: connection, reconnect=False)
+    manager.start()
+    try:
+        assert wait_for(lambda: {'type': 'subscribe', 'symbol': 'AAPL'} in connection.sent)
+        manager.update_watchlist(['MSFT'])
+        assert wait_for(lambda: len(connection.sent) == 3)
+        assert connection.sent[1:] == [{'type': 'subscribe', 'symbol': 'MSFT'}, {'type': 'unsubscribe', 'symbol': 'AAPL'}]
+    finally:
+        manager.stop()
+    manager.join(2.0)
+    assert not any(thread.is_alive() for thread in manager.threads)
+
+
+def test_stop_returns_even_if_close_does_not_wake_recv():
+    connection = QuietConnection()
+    connection.close = lambda: None  # a socket that ignores close until its recv times out
+    manager = SubscriptionManager(['AAPL'], connect=lambda: connection, reconnect=False)
+    manager.start()
+    assert wait_for(lambda: connection.sent)
+    manager.stop()
+    manager.join(2.0)
+    assert not any(thread.is_alive() for thread in manager.threads)
@@ -0,0 +1,130 @@
+# test_unusual_activity.py
+
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+from unusual_activity import (MAX_FALSE_POSITIVE_RATE, MIN_FLOW, MIN_HISTORY, UnusualActivityScanner, VolumeHistory,
+                              format_hit)
+
+DAY = date(2025, 1, 2)
+STOCKS = {'tech': [f"T{i}" for i in range(25)], 'energy': [f"E{i}" for i in range(25)] + ['T0']}
+
+
+def synthetic_chains(rng):
+    """
+    Chains of every STOCKS symbol: 10 expiries x 40 strikes per side, with OI-proportional volumes.
+    """
+    chains = {}
+    for n, symbol in enumerate(sorted({s for symbols in STOCKS.values() for s in symbols})):
+        spot = 50.0 + 10 * n
+        chain = []
+        for e in range(10):
+            options = {}
+            for side in ('CALL', 'PUT'):
+                contracts = []
+                for strike in np.round(np.linspace(0.6, 1.4, 40) * spot, 1):
+                    oi = int(rng.integers(50, 20000))
+                    mid = max(0.05, (spot - strike if side == 'CALL' else strike - spot) + 2 + rng.random())
+                    contracts.append({'strike': float(strike), 'volume': int(rng.poisson(oi * 0.05)), 'openInterest': oi,
+                                      'bid': mid * 0.97, 'ask': mid * 1.03, 'lastPrice': mid, 'impliedVolatility': 40.0})
+                options[side] = contracts
+            chain.append({'expirationDate': f"2025-{e // 4 + 2:02d}-{e % 4 * 7 + 1:02d}", 'options': options})
+        chains[symbol] = chain
+    return chains
+
+
+def contracts_of(chains):
+    return [c for chain in chains.values() for entry in chain for side in ('CALL', 'PUT') for c in entry['options'][side]]
+
+
+@pytest.fixture(scope='module')
+def noise_sweeps():
+    """
+    MIN_HISTORY + 2 sweeps of pure Poisson noise, each contract trading at its own rate, then a block trade.
+    """
+    rng = np.random.default_rng(7)
+    chains = synthetic_chains(rng)
+    contracts = contracts_of(chains)
+    rates = np.array([c['openInterest'] for c in contracts]) * rng.uniform(0, 0.02, len(contracts))
+    scanner = UnusualActivityScanner(None, STOCKS)
+    for _ in range(MIN_HISTORY + 2):
+        for contract, lots in zip(contracts, rng.poisson(rates)):
+            contract['volume'] += int(lots)
+        noise_hits = scanner.score(chains, DAY)
+    for contract, lots in zip(contracts, rng.poisson(rates)):
+        contract['volume'] += int(lots)
+    block = chains['T3'][0]['options']['CALL'][15]  # in the money, so its premium counts
+    block['volume'] += 5000
+    return scanner, noise_hits, len(contracts), scanner.score(chains, DAY), block
+
+
+def test_false_positive_rate_on_noise(noise_sweeps):
+    _, noise_hits, contracts, _, _ = noise_sweeps
+    assert len(noise_hits) / contracts <= MAX_FALSE_POSITIVE_RATE
+
+
+def test_block_trade_is_ranked_first(noise_sweeps):
+    scanner, _, _, hits, block = noise_sweeps
+    assert hits.iloc[0]['symbol'] == 'T3' and hits.iloc[0]['strike'] == block['strike']
+    assert hits.iloc[0]['z_score'] > 10 and hits.iloc[0]['flow'] >= 5000
+    assert list(hits['flow_premium']) == sorted(hits['flow_premium'], reverse=True)
+    assert 'new' in format_hit(hits.iloc[0])
+
+
+def test_volume_history_flows():
+    history = VolumeHistory(length=20)
+    contracts = np.array(['A', 'B'], dtype=object)
+    flow, z_score = history.update(contracts, np.array([10.0, 5.0]), DAY)
+    assert np.isnan(flow).all() and np.isnan(z_score).all()
+    flow, _ = history.update(contracts, np.array([25.0, 3.0]), DAY)
+    np.testing.assert_array_equal(flow, [15.0, 3.0])  # a corrected print restarts from the volume
+    flow, _ = history.update(contracts, np.array([4.0, 1.0]), date(2025, 1, 3))
+    np.testing.assert_array_equal(flow, [4.0, 1.0])  # volumes restart on a new day
+
+
+def test_z_score_is_robust_to_an_earlier_burst():
+    history = VolumeHistory(length=20)
+    contracts = np.array(['A'], dtype=object)
+    volume = 0.0
+    flows = [100, 104, 96, 5000, 102, 98, 101, 99, 103, 97, 100, 100]
+    history.update(contracts, np.array([volume]), DAY)
+    for i, flow in enumerate(flows):
+        volume += flow
+        _, z_score = history.update(contracts, np.array([volume]), DAY)
+        if i + 1 <= MIN_HISTORY:
+            assert np.isnan(z_score[0])
+    # a second burst right after enough history still stands out despite the first one
+    _, z_score = history.update(contracts, np.array([volume + 400.0]), DAY)
+    assert z_score[0] > 20
+
+
+def one_contract_chain(volume, open_interest, price=5.0):
+    return {'A': [{'expirationDate': '2025-03-21', 'options': {'CALL': [
+        {'strike': 100.0, 'volume': volume, 'openInterest': open_interest, 'bid': price, 'ask': price,
+         'lastPrice': price, 'impliedVolatility': 40.0}]}}]}
+
+
+def test_hits_need_a_minimum_flow():
+    scanner = UnusualActivityScanner(None, {'tech': ['A']})
+    scanner.score(one_contract_chain(0, 100), DAY)
+    # far above the open interest, but too few contracts since the last sweep
+    assert scanner.score(one_contract_chain(MIN_FLOW - 1, 100), DAY).empty
+    # enough new contracts above the open interest is a hit without any history
+    hits = scanner.score(one_contract_chain(3 * MIN_FLOW, 100, price=5.0), DAY)
+    assert len(hits) == 1 and hits.iloc[0]['flow'] == 2 * MIN_FLOW + 1
+
+
+def test_new_hits_and_sector_routing():
+    scanner = UnusualActivityScanner(None, STOCKS)
+    hits = pd.DataFrame({'symbol': ['T0', 'T1', 'E1'], 'contract': ['c0', 'c1', 'c2'],
+                         'premium': [1e6, 2e6, 3e6], 'flow_premium': [3e5, 2e5, 1e5]})
+    assert len(scanner.new_hits(hits, DAY)) == 3
+    assert scanner.new_hits(hits, DAY).empty
+    grown = hits.assign(premium=hits['premium'] * [2.5, 1.5, 1.0])
+    assert list(scanner.new_hits(grown, DAY)['contract']) == ['c0']
+    assert len(scanner.new_hits(hits, date(2025, 1, 3))) == 3
+
+    routed = scanner.hits_by_sector(hits, top=1)
+    assert list(routed['tech']['contract']) == ['c0']
+    assert list(routed['energy']['contract']) == ['c0']  # T0 is listed in both sectors
@@ -0,0 +1,113 @@
+# test_vol_surface.py
+
+import numpy as np
+import pytest
+from pricing_models import surface_fixture as fixture
+from pricing_models.greeks import black_scholes_greeks
+from pricing_models.vol_surface import VolSurface, group_mean
+
+
+def fixture_surface():
+    surface = VolSurface(fixture.SPOT, fixture.RISK_FREE_RATE, fixture.DIVIDEND_RATE)
+    for expiry, T, ivs in zip(fixture.EXPIRATION_DATES, fixture.maturities(), fixture.IMPLIED_VOLS):
+        surface.update_slice(expiry.isoformat(), T, fixture.STRIKES, ivs)
+    return surface
+
+
+def fixture_chain():
+    chain = []
+    for expiry, T, ivs in zip(fixture.EXPIRATION_DATES, fixture.maturities(), fixture.IMPLIED_VOLS):
+        prices = black_scholes_greeks(fixture.SPOT, fixture.STRIKES, T, ivs, fixture.RISK_FREE_RATE,
+                                      fixture.DIVIDEND_RATE)['price']
+        chain.append({'expirationDate': expiry.isoformat(),
+                      'options': {'CALL': [{'strike': float(k), 'bid': float(p) * 0.99, 'ask': float(p) * 1.01,
+                                            'lastPrice': float(p), 'impliedVolatility': 99.0}
+                                           for k, p in zip(fixture.STRIKES, prices)]}})
+    return chain
+
+
+def test_reproduces_the_quotes():
+    surface = fixture_surface()
+    nodes = surface.implied_vol(fixture.STRIKES[None, :], fixture.maturities()[:, None])
+    np.testing.assert_allclose(nodes, fixture.IMPLIED_VOLS, atol=1e-12)
+
+
+def test_total_variance_is_free_of_calendar_arbitrage():
+    surface = fixture_surface()
+    strikes = np.linspace(0.7, 1.3, 80) * fixture.SPOT
+    T = np.linspace(0.01, 2.5, 60)
+    w = surface.total_variance(strikes[None, :], T[:, None])
+    assert w.shape == (len(T), len(strikes))
+    assert np.all(np.diff(w, axis=0) >= -1e-12)
+
+
+def test_flat_vol_outside_the_listed_expiries():
+    # implied vol is held flat at a fixed log-moneyness log(K / F(T))
+    surface = fixture_surface()
+    maturities = fixture.maturities()
+
+    def vol(k, T):
+        return surface.implied_vol(surface.forward(T) * np.exp(k), T)
+
+    for k in (-0.1, 0.0, 0.1):
+        assert vol(k, maturities[0] / 2) == pytest.approx(vol(k, maturities[0]))
+        assert vol(k, maturities[-1] * 2) == pytest.approx(vol(k, maturities[-1]))
+
+
+def test_group_mean_matches_a_loop():
+    rng = np.random.default_rng(3)
+    keys = rng.choice(np.arange(50, 60, 2.5), 500)
+    values = rng.uniform(0.1, 0.9, keys.size)
+    values[::7] = np.nan
+    weights = rng.uniform(0, 3, keys.size)
+    unique_keys, means = group_mean(keys, values, weights)
+    np.testing.assert_array_equal(unique_keys, np.unique(keys))
+    for key, mean in zip(unique_keys, means):
+        mask = (keys == key) & np.isfinite(values)
+        assert mean == pytest.approx(np.average(values[mask], weights=weights[mask]))
+
+
+def test_update_slice_reports_changes():
+    surface = fixture_surface()
+    expiry, T = fixture.EXPIRATION_DATES[0].isoformat(), fixture.maturities()[0]
+    assert not surface.update_slice(expiry, T, fixture.STRIKES, fixture.IMPLIED_VOLS[0])
+    assert surface.update_slice(expiry, T, fixture.STRIKES, fixture.IMPLIED_VOLS[0] * 1.01)
+    assert surface.update_slice(expiry, T, fixture.STRIKES, np.full(len(fixture.STRIKES), np.nan))
+    assert expiry not in surface.slices
+
+
+def test_update_chain_only_rebuilds_changed_expiries():
+    surface = VolSurface(fixture.SPOT, fixture.RISK_FREE_RATE, fixture.DIVIDEND_RATE)
+    chain = fixture_chain()
+    today = fixture.CALCULATION_DATE
+    assert len(surface.update_chain(chain, today)) == len(chain)
+    assert surface.update_chain(chain, today) == []
+    for field in ('bid', 'ask'):
+        chain[3]['options']['CALL'][4][field] *= 1.05
+    assert surface.update_chain(chain, today) == [chain[3]['expirationDate']]
+    # expiries no longer listed are dropped
+    assert surface.update_chain(chain[:-1], today) == [chain[-1]['expirationDate']]
+    assert chain[-1]['expirationDate'] not in surface.slices
+
+
+def test_update_chain_prefers_solved_over_quoted_iv():
+    surface = VolSurface(fixture.SPOT, fixture.RISK_FREE_RATE, fixture.DIVIDEND_RATE)
+    chain = fixture_chain()[:1]
+    chain[0]['options']['CALL'][0].update(bid=None, ask=None, lastPrice=None)  # nothing to solve: quoted IV
+    surface.update_chain(chain, fixture.CALCULATION_DATE)
+    ivs = surface.slices[chain[0]['expirationDate']][2]
+    assert ivs[0] == pytest.approx(0.99)
+    np.testing.assert_allclose(ivs[1:], fixture.IMPLIED_VOLS[0][1:], atol=5e-3)
+
+
+def test_set_spot_keeps_quotes_in_strike():
+    surface = fixture_surface()
+    expiry, T = fixture.EXPIRATION_DATES[5].isoformat(), fixture.maturities()[5]
+    surface.set_spot(fixture.SPOT * 1.1)
+    np.testing.assert_allclose(surface.implied_vol(fixture.STRIKES, T), fixture.IMPLIED_VOLS[5], atol=1e-12)
+    assert surface.slices[expiry][3][0] == pytest.approx(np.log(fixture.STRIKES[0] / surface.forward(T)))
+
+
+def test_empty_surface_raises():
+    with pytest.raises(ValueError):
+        VolSurface(100.0).implied_vol(100.0, 0.5)
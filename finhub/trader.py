@@ -1,36 +1,377 @@
 #https://pypi.org/project/websocket_client/
 import websocket
 import json
+import os
+import queue
+import random
+import threading
+import time
+import numpy as np
+from dotenv import load_dotenv
+from bar_aggregator import TickBarAggregator
 
+try:
+    import orjson
+    decode_message = orjson.loads
+except ImportError:  # fall back to the standard library parser
+    decode_message = json.loads
 
-def on_message(ws, message):
-    """Callback function triggered when a message is received."""
-    data = json.loads(message)
-    print("Received Data:", data)
+load_dotenv()
+API_KEY = os.getenv("FIN_TOKEN")
+TRADE_STREAM_URL = "wss://ws.finnhub.io?token={token}"
 
-def on_error(ws, error):
-    """Callback function triggered on error."""
-    print("Error:", error)
+SUBSCRIBE_BATCH_SIZE = 50  # subscribe/unsubscribe messages sent per burst
+SUBSCRIBE_BATCH_PAUSE = 0.2  # seconds between two bursts
+RING_BUFFER_SIZE = 4096  # trades kept per symbol
+INBOX_SIZE = 100_000  # raw messages waiting to be decoded before new ones are dropped
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 60.0
+RECV_TIMEOUT = 1.0  # seconds a recv waits before pending subscription changes and stop() are checked again
 
-def on_close(ws, close_status_code, close_msg):
-    """Callback function triggered when the connection is closed."""
-    print("Connection closed")
+# compact trade record stored in the ring buffers
+TRADE_DTYPE = np.dtype([('t', 'i8'), ('p', 'f8'), ('v', 'f4')])
+
+
+class TradeRingBuffer:
+    """
+    Fixed-size ring buffer of the most recent trades of one symbol.
+    When full, the oldest trades are overwritten and counted in `overwritten`.
+    """
+    def __init__(self, capacity=RING_BUFFER_SIZE):
+        self.records = np.zeros(capacity, dtype=TRADE_DTYPE)
+        self.capacity = capacity
+        self.head = 0  # index of the next write
+        self.count = 0
+        self.overwritten = 0
+
+    def append(self, t_ms, price, size):
+        self.records[self.head] = (t_ms, price, size)
+        self.head = (self.head + 1) % self.capacity
+        if self.count == self.capacity:
+            self.overwritten += 1
+        else:
+            self.count += 1
+
+    def snapshot(self):
+        """
+        Return the buffered trades in arrival order.
+
+        Returns:
+        - np.ndarray: Structured array with fields t (ms), p (price) and v (size).
+        """
+        if self.count < self.capacity:
+            return self.records[:self.count].copy()
+        return np.concatenate([self.records[self.head:], self.records[:self.head]])
+
+
+class ReplayConnection:
+    """
+    Local stand-in for the Finnhub WebSocket that replays recorded traffic, one raw message per line
+    (as written by SubscriptionManager with `record_path`). Subscribe messages sent to it are kept in
+    `sent` so tests can check the subscription traffic.
+    """
+    def __init__(self, path, speed=None):
+        """
+        Parameters:
+        - path (str): Recorded traffic file.
+        - speed (float): Replay rate in messages per second, None replays as fast as possible.
+        """
+        with open(path, 'rb') as f:
+            self.messages = [line.rstrip(b'\n') for line in f if line.strip()]
+        self.position = 0
+        self.speed = speed
+        self.sent = []
+        self.connected = True
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+    def recv(self):
+        if not self.connected or self.position >= len(self.messages):
+            raise websocket.WebSocketConnectionClosedException("Replay finished")
+        if self.speed:
+            time.sleep(1.0 / self.speed)
+        message = self.messages[self.position]
+        self.position += 1
+        return message
+
+    def close(self):
+        self.connected = False
+
+
+class SubscriptionManager:
+    """
+    Streams trades for a whole watchlist from the Finnhub WebSocket.
+
+    The receive thread only moves raw messages into a bounded inbox; a decode thread parses them into
+    per-symbol ring buffers of (ts, price, size) records and forwards them to the listeners. When the
+    inbox is full new messages are dropped and counted, so a slow consumer never stalls the socket.
+    Lost connections are re-established with exponential backoff and every symbol is resubscribed.
+    """
+    def __init__(self, symbols, api_key=API_KEY, url=TRADE_STREAM_URL, connect=None, listeners=None,
+                 record_path=None, reconnect=True):
+        """
+        Parameters:
+        - symbols (list of str): Initial watchlist.
+        - api_key (str): Finnhub API key.
+        - url (str): WebSocket URL template with a {token} field.
+        - connect (callable): Returns a connection object with send/recv/close, e.g. a
+          ReplayConnection for tests. Defaults to websocket.create_connection on `url` with a
+          RECV_TIMEOUT receive timeout; connections whose recv times out should raise
+          websocket.WebSocketTimeoutException.
+        - listeners (list of callable): Called with every decoded trade message.
+        - record_path (str): If set, every raw message received is appended to this file.
+        - reconnect (bool): Reconnect after the connection is lost.
+        """
+        self.symbols = set()
+        self.pending = queue.Queue()  # (type, symbol) subscription changes to send
+        self.url = url.format(token=api_key)
+        self.connect = connect or (lambda: websocket.create_connection(self.url, timeout=RECV_TIMEOUT))
+        self.listeners = list(listeners or [])
+        self.record_path = record_path
+        self.reconnect = reconnect
+        self.buffers = {}
+        self.inbox = queue.Queue(maxsize=INBOX_SIZE)
+        self.stop_event = threading.Event()
+        self.connection = None
+        self.threads = []
+        self.stats = {
+            'messages': 0,
+            'trades': 0,
+            'dropped_messages': 0,
+            'decode_errors': 0,
+            'malformed_trades': 0,
+            'listener_errors': 0,
+            'reconnects': 0,
+        }
+        self.update_watchlist(symbols)
+
+    def update_watchlist(self, symbols):
+        """
+        Replace the watchlist. Only the difference with the current watchlist is sent, in batches.
+        """
+        symbols = set(symbols)
+        for symbol in sorted(symbols - self.symbols):
+            self.pending.put(('subscribe', symbol))
+        for symbol in sorted(self.symbols - symbols):
+            self.pending.put(('unsubscribe', symbol))
+        self.symbols = symbols
+
+    def _send_pending(self, connection):
+        batch = 0
+        while True:
+            try:
+                message_type, symbol = self.pending.get_nowait()
+            except queue.Empty:
+                return
+            connection.send(json.dumps({"type": message_type, "symbol": symbol}))
+            batch += 1
+            if batch % SUBSCRIBE_BATCH_SIZE == 0:
+                time.sleep(SUBSCRIBE_BATCH_PAUSE)
+
+    def _resubscribe(self, connection):
+        # drop queued changes, the current watchlist is the full state to restore
+        while not self.pending.empty():
+            self.pending.get_nowait()
+        for symbol in sorted(self.symbols):
+            self.pending.put(('subscribe', symbol))
+        self._send_pending(connection)
+
+    def _receive_loop(self):
+        backoff = BACKOFF_INITIAL
+        record_file = open(self.record_path, 'ab') if self.record_path else None
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    self.connection = self.connect()
+                    self._resubscribe(self.connection)
+                    print(f"Subscribed to {len(self.symbols)} symbols")
+                    received = False
+                    while not self.stop_event.is_set():
+                        if not self.pending.empty():
+                            self._send_pending(self.connection)
+                        try:
+                            message = self.connection.recv()
+                        except websocket.WebSocketTimeoutException:
+                            continue  # quiet feed, go back and send whatever is pending
+                        if not received:
+                            backoff = BACKOFF_INITIAL  # the connection is healthy again
+                            received = True
+                        if record_file is not None:
+                            record_file.write((message if isinstance(message, bytes) else message.encode()) + b'\n')
+                        try:
+                            self.inbox.put_nowait(message)
+                        except queue.Full:
+                            self.stats['dropped_messages'] += 1
+                except Exception as e:
+                    print("Error:", e)
+                finally:
+                    if self.connection is not None:
+                        try:
+                            self.connection.close()
+                        except Exception:
+                            pass
+                print("Connection closed")
+                if not self.reconnect or self.stop_event.is_set():
+                    break
+                self.stats['reconnects'] += 1
+                # exponential backoff with jitter
+                self.stop_event.wait(backoff * (0.5 + random.random() / 2))
+                backoff = min(backoff * 2, BACKOFF_MAX)
+        finally:
+            if record_file is not None:
+                record_file.close()
+            self.inbox.put(None)  # wake the decoder up so it can exit
+
+    def _decode_loop(self):
+        while True:
+            message = self.inbox.get()
+            if message is None:
+                return
+            self.stats['messages'] += 1
+            # a bad message or listener must never stop the decoder, or the inbox fills up and drops everything
+            try:
+                self._handle_message(message)
+            except Exception as e:
+                self.stats['decode_errors'] += 1
+                print(f"Failed to handle trade message: {e}")
+
+    def _handle_message(self, message):
+        try:
+            data = decode_message(message)
+        except ValueError:
+            self.stats['decode_errors'] += 1
+            return
+        if not isinstance(data, dict):
+            self.stats['decode_errors'] += 1
+            return
+        if data.get('type') != 'trade':
+            return
+        trades = data.get('data')
+        trades = trades if isinstance(trades, list) else []
+        valid = [trade for trade in trades if isinstance(trade, dict) and all(k in trade for k in ('s', 't', 'p', 'v'))]
+        self.stats['malformed_trades'] += len(trades) - len(valid)
+        for trade in valid:
+            symbol = trade['s']
+            buffer = self.buffers.get(symbol)
+            if buffer is None:
+                buffer = self.buffers[symbol] = TradeRingBuffer()
+            buffer.append(trade['t'], trade['p'], trade['v'])
+        self.stats['trades'] += len(valid)
+        if not valid:
+            return
+        if len(valid) < len(trades):
+            data = {**data, 'data': valid}
+        for listener in self.listeners:
+            try:
+                listener(data)
+            except Exception as e:
+                self.stats['listener_errors'] += 1
+                print(f"Trade listener failed: {e}")
+
+    def start(self):
+        """
+        Start the receive and decode threads.
+        """
+        self.stop_event.clear()
+        self.threads = [
+            threading.Thread(target=self._receive_loop, daemon=True),
+            threading.Thread(target=self._decode_loop, daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Close the connection and stop both threads.
+        """
+        self.stop_event.set()
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+
+    def join(self, timeout=None):
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def drop_counters(self):
+        """
+        Return the messages dropped at the inbox and the trades overwritten in each ring buffer.
+        """
+        return {
+            'dropped_messages': self.stats['dropped_messages'],
+            'overwritten_trades': {s: b.overwritten for s, b in self.buffers.items() if b.overwritten},
+        }
+
+
+def stream_trades(symbols, aggregator: TickBarAggregator, api_key=API_KEY):
+    """
+    Subscribe to the trades of every symbol and feed them into a TickBarAggregator.
+    Blocks until the stream is stopped.
+
+    Parameters:
+    - symbols (list of str): Stock ticker symbols.
+    - aggregator (TickBarAggregator): Receives every trade message.
+    - api_key (str): Finnhub API key.
+    """
+    manager = SubscriptionManager(symbols, api_key=api_key, listeners=[aggregator.on_trade_message])
+    stop_event = threading.Event()
+    threading.Thread(target=aggregator.run_close_timer, args=(stop_event,), daemon=True).start()
+    manager.start()
+    try:
+        manager.join()
+    finally:
+        stop_event.set()
+    return manager
+
+
+def check_malformed_replay():
+    """
+    Replay malformed traffic and check the decoder keeps consuming the messages after it.
+    """
+    import tempfile
+
+    good = {"type": "trade", "data": [{"s": "AAPL", "p": 227.1, "t": 1735828200000, "v": 100}]}
+    messages = [
+        b"not json",
+        b"[1, 2]",
+        json.dumps({"type": "trade", "data": [{"s": "AAPL", "p": 227.0}]}).encode(),  # missing t and v
+        json.dumps({"type": "trade", "data": 5}).encode(),
+        json.dumps({"type": "trade", "data": [{"s": "MSFT", "p": 1.0, "t": 1735828200000, "v": 1}]}).encode(),  # listener raises
+    ] + [json.dumps(good).encode()] * 100
+    with tempfile.NamedTemporaryFile('wb', suffix='.jsonl', delete=False) as f:
+        f.write(b"\n".join(messages) + b"\n")
+
+    received = []
+
+    def listener(data):
+        if data['data'] and data['data'][0]['s'] == 'MSFT':
+            raise RuntimeError("listener failure")
+        received.append(data)
+
+    manager = SubscriptionManager(["AAPL"], connect=lambda: ReplayConnection(f.name), listeners=[listener], reconnect=False)
+    manager.start()
+    manager.join(timeout=10)
+    os.remove(f.name)
+    print(manager.stats)
+    assert len(received) == 100 and manager.stats['trades'] == 101, "decoder stopped on malformed traffic"
+    assert manager.stats['decode_errors'] == 2 and manager.stats['malformed_trades'] == 1
+    assert manager.stats['listener_errors'] == 1
+    print("malformed replay check passed")
 
-def on_open(ws):
-    """Callback function triggered when the connection is opened."""
-    # Subscribe to a symbol (e.g., AAPL for Apple stock)
-    subscribe_message = json.dumps({
-        "type": "subscribe",
-        "symbol": "AAPL"
-    })
-    ws.send(subscribe_message)
-    print("Subscribed to AAPL")
 
 if __name__ == "__main__":
-    websocket.enableTrace(True)
-    ws = websocket.WebSocketApp("wss://ws.finnhub.io?token=cu9bivpr01qnf5nmlh8gcu9bivpr01qnf5nmlh90",
-                              on_message = on_message,
-                              on_error = on_error,
-                              on_close = on_close)
-    ws.on_open = on_open
-    ws.run_forever()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stream trades, or check the decoder on malformed replayed traffic.")
+    parser.add_argument('--check', action='store_true', help="Run the malformed replay check instead of streaming")
+    args = parser.parse_args()
+    if args.check:
+        check_malformed_replay()
+    else:
+        def print_bar(symbol, timeframe, bar):
+            print(f"{symbol} {timeframe} bar closed:", bar)
+
+        stream_trades(["AAPL"], TickBarAggregator(print_bar))
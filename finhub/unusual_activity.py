@@ -0,0 +1,382 @@
+# unusual_activity.py
+
+import asyncio
+import time
+from datetime import date
+import numpy as np
+import pandas as pd
+from chain_store import contract_id
+from telemetry import REGISTRY
+
+SCAN_CONCURRENCY = 4  # chains fetched at the same time; the engine's shared rate limiter sets the actual pace
+HISTORY_LENGTH = 20  # sweeps of volume history kept per contract
+MIN_HISTORY = 10  # sweeps of history needed before a contract's z-score counts
+MIN_FLOW = 250  # contracts traded since the last sweep
+MIN_FLOW_PREMIUM = 100_000  # dollars traded since the last sweep (flow x price x 100)
+VOLUME_OI_THRESHOLD = 1.0  # today's volume above the open interest
+Z_SCORE_THRESHOLD = 4.0  # volume since the last sweep against the median and MAD of the contract's history
+MAD_SCALE = 1.4826  # MAD to standard deviation of normal noise
+MAX_FALSE_POSITIVE_RATE = 1e-4  # hits per contract allowed on a sweep of pure noise (checked in __main__)
+TOP_HITS = 10  # hits sent per sector and sweep
+REALERT_MULTIPLE = 2.0  # a contract already reported today is reported again once its premium doubles
+FIELDS = ['strike', 'volume', 'openInterest', 'bid', 'ask', 'lastPrice', 'impliedVolatility']
+
+SWEEP_SECONDS = REGISTRY.histogram('uoa_sweep_seconds', 'Duration of a full unusual activity sweep.')
+SCORE_SECONDS = REGISTRY.histogram('uoa_score_seconds', 'Time to score the chains of one sweep.')
+HITS = REGISTRY.counter('uoa_hits_total', 'Unusual option activity hits.', ('side',))
+
+
+def normalize_chains(chains):
+    """
+    Flatten the option chains of many symbols into flat arrays, one entry per contract.
+
+    Parameters:
+    - chains (dict): Symbol -> option chains as returned by FinnhubEngine.get_option_chain.
+
+    Returns:
+    - dict: 'symbols' (list of str) and arrays 'symbol' (index into symbols), 'contract' (contract IDs),
+      'expiry' (expiration dates), 'is_call', 'strike', 'volume', 'open_interest', 'bid', 'ask',
+      'last' and 'iv'. Missing volumes and open interest count as 0; contracts without a strike are dropped.
+    """
+    symbols, blocks, ids, expiries = [], [], [], []
+    for symbol, option_chain_data in chains.items():
+        index = len(symbols)
+        symbols.append(symbol)
+        for chain in option_chain_data or []:
+            expiry = chain.get('expirationDate')
+            options = chain.get('options') or {}
+            for side, is_call in (('CALL', 1.0), ('PUT', 0.0)):
+                contracts = [c for c in options.get(side) or [] if c.get('strike') is not None]
+                if not contracts:
+                    continue
+                block = np.array([[c.get(field) for field in FIELDS] for c in contracts], dtype=np.float64)  # None -> NaN
+                blocks.append(np.column_stack([np.full((len(contracts), 2), (index, is_call)), block]))
+                ids += [contract_id(symbol, expiry, side, c['strike'], c) for c in contracts]
+                expiries += [expiry] * len(contracts)
+
+    values = np.concatenate(blocks) if blocks else np.zeros((0, 2 + len(FIELDS)))
+    return {
+        'symbols': symbols,
+        'symbol': values[:, 0].astype(np.int64),
+        'contract': np.array(ids, dtype=object),
+        'expiry': np.array(expiries, dtype=object),
+        'is_call': values[:, 1] > 0,
+        'strike': values[:, 2],
+        'volume': np.nan_to_num(values[:, 3]),
+        'open_interest': np.nan_to_num(values[:, 4]),
+        'bid': values[:, 5],
+        'ask': values[:, 6],
+        'last': values[:, 7],
+        'iv': values[:, 8],
+    }
+
+
+def _row_median(values):
+    """
+    Median of every row of a 2D array, ignoring NaNs (NaN for rows without values).
+    """
+    ordered = np.sort(values, axis=1)  # NaNs sort last
+    count = np.isfinite(values).sum(axis=1)
+    lo = np.take_along_axis(ordered, np.maximum(count - 1, 0)[:, None] // 2, axis=1)[:, 0]
+    hi = np.take_along_axis(ordered, (count // 2)[:, None], axis=1)[:, 0]
+    return np.where(count > 0, (lo + hi) / 2, np.nan)
+
+
+class VolumeHistory:
+    """
+    Rolling history of the volume each contract traded between consecutive sweeps.
+
+    Contracts get a row in a (contracts x HISTORY_LENGTH) ring buffer; every sweep writes one column,
+    so updating and scoring the whole universe are a few array operations. Finnhub reports the day's
+    cumulative volume, so the flow of a sweep is the difference to the previous sweep of the same day.
+    A contract's first sweep has no flow, and rows not seen for a full window are dropped. Flows are
+    scored against the median and MAD of the history, so one earlier burst does not mask the next.
+    """
+    def __init__(self, length=HISTORY_LENGTH):
+        self.length = length
+        self.index = {}  # contract ID -> row
+        self.flows = np.full((0, length), np.nan)
+        self.last_volume = np.zeros(0)  # cumulative volume of the previous sweep, NaN before the first one
+        self.last_seen = np.zeros(0, dtype=np.int64)
+        self.sweeps = 0
+        self.day = None
+
+    def _rows(self, contracts):
+        rows = np.fromiter((self.index.setdefault(c, len(self.index)) for c in contracts),
+                           dtype=np.int64, count=len(contracts))
+        grow = len(self.index) - len(self.last_volume)
+        if grow > 0:
+            self.flows = np.vstack([self.flows, np.full((grow, self.length), np.nan)])
+            self.last_volume = np.append(self.last_volume, np.full(grow, np.nan))
+            self.last_seen = np.append(self.last_seen, np.full(grow, self.sweeps))
+        return rows
+
+    def _compact(self):
+        keep = self.last_seen > self.sweeps - self.length
+        if keep.sum() * 2 > len(keep):
+            return
+        remap = np.cumsum(keep) - 1
+        self.index = {c: int(remap[row]) for c, row in self.index.items() if keep[row]}
+        self.flows, self.last_volume, self.last_seen = self.flows[keep], self.last_volume[keep], self.last_seen[keep]
+
+    def update(self, contracts, volume, day=None):
+        """
+        Record a sweep and score it against the history before it.
+
+        Parameters:
+        - contracts (np.ndarray): Contract IDs of the sweep.
+        - volume (np.ndarray): Cumulative volume of the day per contract.
+        - day (date, optional): Trading day of the sweep, today by default. Volumes restart from 0 on a new day.
+
+        Returns:
+        - (np.ndarray, np.ndarray): Flow since the previous sweep (NaN on a contract's first sweep) and
+          its robust z-score against the contract's history (NaN with fewer than MIN_HISTORY sweeps).
+        """
+        day = day or date.today()
+        if day != self.day:
+            self.last_volume = np.where(np.isnan(self.last_volume), np.nan, 0.0)
+            self.day = day
+        rows = self._rows(contracts)
+
+        flow = volume - self.last_volume[rows]
+        flow = np.where(flow < 0, volume, flow)  # corrected prints
+
+        history = self.flows[rows]
+        count = np.isfinite(history).sum(axis=1)
+        median = _row_median(history)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            spread = MAD_SCALE * _row_median(np.abs(history - median[:, None]))
+            # floor the spread of quiet contracts at Poisson noise so a handful of lots is not an outlier
+            spread = np.maximum(spread, np.sqrt(np.maximum(median, 1.0)))
+            z_score = np.where(count >= MIN_HISTORY, (flow - median) / spread, np.nan)
+
+        column = self.sweeps % self.length
+        self.flows[:, column] = np.nan
+        self.flows[rows, column] = flow
+        self.last_volume[rows] = volume
+        self.sweeps += 1
+        self.last_seen[rows] = self.sweeps
+        self._compact()
+        return flow, z_score
+
+
+def score_contracts(flat, flow, z_score):
+    """
+    Unusual activity metrics of every contract of a sweep.
+
+    Parameters:
+    - flat (dict): Output of normalize_chains.
+    - flow, z_score (np.ndarray): Output of VolumeHistory.update for the same contracts.
+
+    Returns:
+    - pd.DataFrame: One row per contract with 'symbol', 'contract', 'expirationDate', 'side', 'strike',
+      'volume', 'open_interest', 'vol_oi' (volume / max(open interest, 1)), 'flow', 'z_score', 'price'
+      (bid/ask mid, else the last price), 'premium' (volume x price x 100), 'flow_premium'
+      (flow x price x 100), 'iv' and the 'hit' flag. A hit needs at least MIN_FLOW contracts and
+      MIN_FLOW_PREMIUM dollars traded since the last sweep, on top of a high volume/OI or z-score.
+    """
+    bid, ask, volume = flat['bid'], flat['ask'], flat['volume']
+    price = np.where((bid > 0) & (ask >= bid), (bid + ask) / 2, flat['last'])
+    premium = volume * np.nan_to_num(price) * 100
+    flow_premium = np.nan_to_num(flow) * np.nan_to_num(price) * 100
+    vol_oi = volume / np.maximum(flat['open_interest'], 1.0)
+    with np.errstate(invalid='ignore'):
+        unusual = (vol_oi >= VOLUME_OI_THRESHOLD) | (z_score >= Z_SCORE_THRESHOLD)
+        hit = (flow >= MIN_FLOW) & (flow_premium >= MIN_FLOW_PREMIUM) & unusual
+    return pd.DataFrame({
+        'symbol': np.array(flat['symbols'], dtype=object)[flat['symbol']] if flat['symbols'] else [],
+        'contract': flat['contract'],
+        'expirationDate': flat['expiry'],
+        'side': np.where(flat['is_call'], 'CALL', 'PUT'),
+        'strike': flat['strike'],
+        'volume': volume,
+        'open_interest': flat['open_interest'],
+        'vol_oi': vol_oi,
+        'flow': flow,
+        'z_score': z_score,
+        'price': price,
+        'premium': premium,
+        'flow_premium': flow_premium,
+        'iv': flat['iv'],
+        'hit': hit,
+    })
+
+
+def format_hit(row):
+    z_score = f"z {row['z_score']:.1f}" if np.isfinite(row['z_score']) else "z n/a"
+    return (f"**{row['symbol']}** {row['expirationDate']} {row['strike']:g}{row['side'][0]}: "
+            f"{row['flow']:,.0f} new ({z_score}) for ${row['flow_premium'] / 1e6:.2f}M @ {row['price']:.2f}, "
+            f"{row['volume']:,.0f} vol vs {row['open_interest']:,.0f} OI ({row['vol_oi']:.1f}x)")
+
+
+class UnusualActivityScanner:
+    """
+    Sweeps the option chains of a whole watchlist and ranks unusual contract activity.
+
+    Chains are fetched through the shared FinnhubEngine, so the sweep draws on the same request
+    budget as the buy signal scan. Scoring runs once per sweep on the chains of every symbol at once.
+    """
+    def __init__(self, engine, stocks, concurrency=SCAN_CONCURRENCY, history_length=HISTORY_LENGTH):
+        """
+        Parameters:
+        - engine (FinnhubEngine): Engine used to fetch the chains.
+        - stocks (dict): Sector -> list of symbols, as in watchlist.py.
+        - concurrency (int): Chains fetched at the same time.
+        - history_length (int): Sweeps of volume history kept per contract.
+        """
+        self.engine = engine
+        self.sectors = {}  # symbol -> sectors listing it
+        for sector, symbols in stocks.items():
+            for symbol in symbols:
+                self.sectors.setdefault(symbol, []).append(sector)
+        self.concurrency = concurrency
+        self.history = VolumeHistory(history_length)
+        self.reported = {}  # contract ID -> premium when last reported today
+        self.reported_day = None
+        self.last_scores = None
+        self.last_flat = None  # normalized contracts of the last sweep, e.g. for gamma_exposure
+
+    def score(self, chains, day=None):
+        """
+        Score the chains of one sweep.
+
+        Parameters:
+        - chains (dict): Symbol -> option chains.
+        - day (date, optional): Trading day of the sweep, today by default.
+
+        Returns:
+        - pd.DataFrame: Hits of the sweep, largest flow premium first (see score_contracts for the columns).
+        """
+        start = time.perf_counter()
+        flat = normalize_chains(chains)
+        flow, z_score = self.history.update(flat['contract'], flat['volume'], day)
+        scores = score_contracts(flat, flow, z_score)
+        SCORE_SECONDS.observe(time.perf_counter() - start)
+        self.last_flat, self.last_scores = flat, scores
+        hits = scores[scores['hit'].to_numpy()].sort_values('flow_premium', ascending=False, ignore_index=True)
+        for side, count in hits['side'].value_counts().items():
+            HITS.inc(int(count), side=side)
+        return hits
+
+    async def sweep(self, on_chain=None, day=None):
+        """
+        Fetch the chain of every watchlist symbol and score them together.
+
+        Parameters:
+        - on_chain (callable, optional): Called as on_chain(symbol, chain) in a worker thread for every
+          fetched chain, e.g. to record it.
+        - day (date, optional): Trading day of the sweep, today by default.
+
+        Returns:
+        - pd.DataFrame: Hits of the sweep, largest flow premium first.
+        """
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(symbol):
+            async with semaphore:
+                try:
+                    option_chain_data = await asyncio.to_thread(self.engine.get_option_chain, symbol)
+                except Exception as e:
+                    print(f"Failed to fetch the option chain of {symbol}: {e}")
+                    return symbol, None
+            if on_chain is not None and option_chain_data:
+                await asyncio.to_thread(on_chain, symbol, option_chain_data)
+            return symbol, option_chain_data
+
+        results = await asyncio.gather(*(fetch(symbol) for symbol in self.sectors))
+        chains = {symbol: data for symbol, data in results if data}
+        hits = await asyncio.to_thread(self.score, chains, day)
+        SWEEP_SECONDS.observe(time.perf_counter() - start)
+        print(f"Unusual activity sweep: {len(chains)}/{len(self.sectors)} chains, {len(hits)} hits "
+              f"in {time.perf_counter() - start:.1f} s.")
+        return hits
+
+    def new_hits(self, hits, day=None):
+        """
+        Drop the hits already reported today, unless their premium grew REALERT_MULTIPLE times since.
+        """
+        day = day or date.today()
+        if day != self.reported_day:
+            self.reported, self.reported_day = {}, day
+        previous = hits['contract'].map(self.reported).to_numpy(dtype=np.float64)
+        fresh = hits[~(hits['premium'].to_numpy() < REALERT_MULTIPLE * previous)]
+        self.reported.update(zip(fresh['contract'], fresh['premium']))
+        return fresh
+
+    def hits_by_sector(self, hits, top=TOP_HITS):
+        """
+        Route ranked hits to the sectors listing their symbol, keeping the top hits of every sector.
+
+        Returns:
+        - dict: Sector -> pd.DataFrame of at most `top` hits, largest flow premium first.
+        """
+        routed = {}
+        for symbol, group in hits.groupby('symbol', sort=False):
+            for sector in self.sectors.get(symbol, []):
+                routed.setdefault(sector, []).append(group)
+        return {sector: pd.concat(groups).sort_values('flow_premium', ascending=False).head(top)
+                for sector, groups in routed.items()}
+
+
+if __name__ == "__main__":
+    # Scoring time of synthetic full-universe sweeps: python unusual_activity.py
+    from watchlist import stocks
+
+    class SyntheticEngine:
+        def __init__(self, seed=7):
+            self.rng = np.random.default_rng(seed)
+            self.open_interest = {}
+
+        def get_option_chain(self, symbol):
+            rng = self.rng
+            spot = 50 + 10 * (hash(symbol) % 40)
+            chains = []
+            for e in range(12):
+                expiry = f"2025-{e // 4 + 1:02d}-{e % 4 * 7 + 1:02d}"
+                options = {}
+                for side in ('CALL', 'PUT'):
+                    contracts = []
+                    for strike in np.round(np.linspace(0.6, 1.4, 80) * spot, 1):
+                        key = (symbol, expiry, side, strike)
+                        oi = self.open_interest.setdefault(key, int(rng.integers(50, 20000)))
+                        mid = max(0.05, (spot - strike if side == 'CALL' else strike - spot) + 2 + rng.random())
+                        contracts.append({'strike': float(strike), 'volume': int(rng.poisson(oi * 0.05)),
+                                          'openInterest': oi, 'bid': mid * 0.97, 'ask': mid * 1.03,
+                                          'lastPrice': mid, 'impliedVolatility': 30 + 10 * rng.random()})
+                    options[side] = contracts
+                chains.append({'expirationDate': expiry, 'options': options})
+            return chains
+
+    synthetic = SyntheticEngine()
+    scanner = UnusualActivityScanner(synthetic, stocks)
+    chains = {symbol: synthetic.get_option_chain(symbol) for symbol in scanner.sectors}
+    contracts = [contract for option_chain_data in chains.values() for chain in option_chain_data
+                 for side in ('CALL', 'PUT') for contract in chain['options'][side]]
+    # pure noise: every contract trades Poisson lots at its own rate, up to a few hundred per sweep
+    rates = np.array([contract['openInterest'] for contract in contracts]) * synthetic.rng.uniform(0, 0.02, len(contracts))
+    day = date(2025, 1, 2)
+    for sweep in range(MIN_HISTORY + 3):
+        for contract, lots in zip(contracts, synthetic.rng.poisson(rates)):
+            contract['volume'] += int(lots)
+        if sweep == MIN_HISTORY + 2:
+            # one contract sees a block trade on the last sweep
+            chains['NVDA'][0]['options']['CALL'][40]['volume'] += 5000
+        start = time.perf_counter()
+        hits = scanner.score(chains, day)
+        elapsed = time.perf_counter() - start
+        if sweep == MIN_HISTORY + 1:
+            noise_rate = len(hits) / len(contracts)
+            print(f"hits on a sweep of pure noise: {len(hits)} of {len(contracts)} contracts ({noise_rate:.1e})")
+            assert noise_rate <= MAX_FALSE_POSITIVE_RATE, "too many hits on pure noise"
+
+    print(f"{len(contracts)} contracts of {len(chains)} symbols scored in {elapsed:.2f} s, {len(hits)} hits")
+    block = scanner.last_scores[(scanner.last_scores['symbol'] == 'NVDA')].iloc[40]
+    print(f"block trade: flow {block['flow']:.0f}, z-score {block['z_score']:.1f}, hit {bool(block['hit'])}")
+    assert block['hit'] and hits['contract'].iloc[0] == block['contract'], "block trade not ranked first"
+    fresh = scanner.new_hits(hits, day)
+    print(f"new hits on a repeated sweep: {len(scanner.new_hits(hits, day))} of {len(fresh)}")
+    for sector, sector_hits in list(scanner.hits_by_sector(fresh, top=3).items())[:3]:
+        print(sector)
+        for _, row in sector_hits.iterrows():
+            print("  " + format_hit(row))